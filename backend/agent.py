@@ -5,9 +5,13 @@ import asyncio
 import json
 import os
 import logging
+import time
+import uuid
 from datetime import datetime, timedelta
-from typing import Annotated, Literal
-from dotenv import load_dotenv
+from typing import Annotated, Literal, Optional
+
+# Loads .env before the modules below read their tunables
+from settings import get_settings
 
 # Enable debug logging with immediate output
 logging.basicConfig(
@@ -17,14 +21,10 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Print immediately to stdout as well
-print("=" * 60)
-print("SuperBryn Voice Agent - Starting...")
-print("=" * 60)
-
 from livekit import agents, rtc
 from livekit.agents import (
     JobContext,
+    JobProcess,
     WorkerOptions,
     cli,
     llm,
@@ -32,53 +32,75 @@ from livekit.agents import (
 )
 from livekit.agents.voice import Agent, AgentSession
 from livekit.agents.worker import JobRequest
-from livekit.plugins import deepgram, cartesia
 
+from data_publisher import DATA_PUBLISH_STATS, DataPublisher
 from database import Database
-from tools import AppointmentTools
-
-load_dotenv()
-
-# Log startup
-logger.info("=" * 60)
-logger.info("Starting SuperBryn Voice Agent")
-logger.info("=" * 60)
-
-# Check environment variables
-logger.info("Checking environment variables...")
-required_vars = [
-    "LIVEKIT_URL",
-    "LIVEKIT_API_KEY", 
-    "LIVEKIT_API_SECRET",
-    "DEEPGRAM_API_KEY",
-    "CARTESIA_API_KEY",
-    "SUPABASE_URL",
-    "SUPABASE_KEY",
-]
-
-for var in required_vars:
-    value = os.getenv(var)
-    if value:
-        logger.info(f"  ✓ {var}: {'*' * min(len(value), 10)}")
-    else:
-        logger.warning(f"  ✗ {var}: NOT SET")
+from greeting import GREETING_ENABLED, GREETING_STATS, GREETING_TEXT, Greeting, load_greeting
+from filler_speech import FILLER_ENABLED, FILLER_STATS, FillerSpeech, warm_filler_audio
+from speculative import SPECULATIVE_LLM, SpeculativeAgent, speculation_summary
+from tools import IDEMPOTENCY_STATS, PREFETCH_STATS, AppointmentTools
+from tracing import TRACE_STATS, TurnTracer
+from tts_cache import TTS_CACHE_ENABLED, CachedTTS, get_tts_cache, tts_cache_summary
+
+# Importing this module must stay cheap: the worker and every idle job process
+# import it. Provider plugins, the database client and the startup banner are
+# deferred to the first place that needs them (see bench_startup.py).
+_db: Optional[Database] = None
+
+
+def get_db() -> Database:
+    """The process-wide Database, created (and its backend client built) on first use"""
+    global _db
+    if _db is None:
+        try:
+            _db = Database()
+            logger.info("Database initialized successfully")
+        except Exception as e:
+            logger.error(f"Failed to initialize database: {e}")
+            raise
+    return _db
+
+
+def _log_startup():
+    """Startup banner and environment check, printed once by the worker process"""
+    settings = get_settings()
+    print("=" * 60)
+    print("SuperBryn Voice Agent - Starting...")
+    print("=" * 60)
+    logger.info("Checking environment variables...")
+    for var, value in settings.required_status().items():
+        if value:
+            logger.info(f"  ✓ {var}: {'*' * min(len(value), 10)}")
+        else:
+            logger.warning(f"  ✗ {var}: NOT SET")
+    logger.info(f"LLM_PROVIDER: {settings.llm_provider}")
+    logger.info(f"LLM_MODEL: {settings.llm_model}")
+
+
+def _is_caller(participant: rtc.RemoteParticipant) -> bool:
+    """The human in the room, not an avatar worker publishing the agent's audio"""
+    return participant.kind != rtc.ParticipantKind.PARTICIPANT_KIND_AGENT and participant.identity != "bey-avatar-agent"
+
+
+def _create_stt():
+    # Provider plugins are imported on first use, in the job process's main thread
+    from livekit.plugins import deepgram
+    return deepgram.STT()
 
-logger.info(f"LLM_PROVIDER: {os.getenv('LLM_PROVIDER', 'not set')}")
-logger.info(f"LLM_MODEL: {os.getenv('LLM_MODEL', 'not set')}")
 
-# Initialize database
-try:
-    db = Database()
-    logger.info("Database initialized successfully")
-except Exception as e:
-    logger.error(f"Failed to initialize database: {e}")
-    raise
+def _create_tts():
+    from livekit.plugins import cartesia
+    engine = cartesia.TTS()
+    # Recurring phrases (greeting, fillers, TTS_CACHE_PHRASES) come from tts_cache.py;
+    # replies still stream from Cartesia
+    return CachedTTS(engine) if TTS_CACHE_ENABLED else engine
 
 
 def _create_llm(tools: list | None = None):
     """Create LLM instance based on provider"""
-    provider = os.getenv("LLM_PROVIDER", "openai").lower()
-    model = os.getenv("LLM_MODEL", "gpt-4o-mini")
+    settings = get_settings()
+    provider = settings.llm_provider
+    model = settings.llm_model
 
     if provider == "openai":
         from livekit.plugins import openai as openai_plugin
@@ -95,14 +117,10 @@ def _create_llm(tools: list | None = None):
         from livekit.plugins import openai as openai_plugin
         from openai import AsyncAzureOpenAI
 
-        azure_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
-        azure_api_key = os.getenv("AZURE_OPENAI_API_KEY")
-        azure_api_version = os.getenv(
-            "AZURE_OPENAI_API_VERSION", "2024-02-15-preview"
-        )
-        deployment_name = os.getenv(
-            "AZURE_OPENAI_DEPLOYMENT_NAME", model
-        )
+        azure_endpoint = settings.azure_openai_endpoint
+        azure_api_key = settings.azure_openai_api_key
+        azure_api_version = settings.azure_openai_api_version
+        deployment_name = settings.azure_openai_deployment_name or model
 
         if not azure_endpoint or not azure_api_key:
             raise ValueError(
@@ -143,14 +161,14 @@ def _create_llm(tools: list | None = None):
         from livekit.plugins import openai as openai_plugin
         llm_instance = openai_plugin.LLM(
             model=model,
-            api_key=os.getenv("TOGETHER_API_KEY"),
+            api_key=settings.together_api_key,
             base_url="https://api.together.xyz/v1",
         )
     elif provider == "openrouter":
         from livekit.plugins import openai as openai_plugin
         llm_instance = openai_plugin.LLM(
             model=model,
-            api_key=os.getenv("OPENROUTER_API_KEY"),
+            api_key=settings.openrouter_api_key,
             base_url="https://openrouter.ai/api/v1",
         )
     else:
@@ -166,8 +184,13 @@ def _create_llm(tools: list | None = None):
     return llm_instance
 
 
+# The framework cancels the entrypoint 15 s into shutdown; the summary has to be
+# generated and written before then, so the LLM call gets less than that
+SUMMARY_TIMEOUT = float(os.getenv("SUMMARY_TIMEOUT", "8"))
+
+
 async def _generate_summary(conversation_history: list, tool_calls_made: list) -> dict:
-    """Generate conversation summary using LLM"""
+    """Generate conversation summary using LLM (fallback summary after SUMMARY_TIMEOUT)"""
     conversation_text = "\n".join([
         f"{msg['role']}: {msg['content']}"
         for msg in conversation_history[-20:]  # Last 20 messages
@@ -193,12 +216,16 @@ Return only valid JSON."""
     
     # llm.chat() returns an LLMStream (async context manager)
     # We need to iterate over it to collect the response
-    summary_text = ""
-    try:
+    async def collect() -> str:
+        text = ""
         async with llm_instance.chat(chat_ctx=chat_ctx) as stream:
             async for chunk in stream:
                 if chunk.delta and chunk.delta.content:
-                    summary_text += chunk.delta.content
+                    text += chunk.delta.content
+        return text
+
+    try:
+        summary_text = await asyncio.wait_for(collect(), SUMMARY_TIMEOUT)
         
         # Extract JSON from response
         if "```json" in summary_text:
@@ -226,6 +253,29 @@ Return only valid JSON."""
         }
 
 
+def prewarm(proc: JobProcess):
+    """Runs once in every job process, while it sits idle waiting for a job.
+
+    Builds provider clients and opens DB connections ahead of time; set
+    PREWARM_ENABLED=false to compare job-accept-to-first-audio without it.
+    """
+    if not get_settings().prewarm_enabled:
+        return
+    started = time.perf_counter()
+    get_db().warm()
+    try:
+        # Constructing these imports the provider SDKs and builds their HTTP
+        # clients; connections are opened at the start of the job, on its loop
+        proc.userdata["stt"] = _create_stt()
+        proc.userdata["tts"] = _create_tts()
+        # Rendered by an earlier process into the TTS cache; None = the job renders it
+        proc.userdata["greeting"] = load_greeting(proc.userdata["tts"])
+        proc.userdata["llm"] = _create_llm()
+    except Exception as e:
+        logger.warning(f"Prewarm could not create provider clients: {e}")
+    logger.info(f"Process prewarmed in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+
 async def job_request_handler(req: JobRequest) -> None:
     """Called when LiveKit wants to assign a job to this agent"""
     print("\n" + "=" * 60)
@@ -268,6 +318,19 @@ async def job_request_handler(req: JobRequest) -> None:
 
 async def entrypoint(ctx: JobContext):
     """Entry point for the agent"""
+    # Called right after the job is accepted; the clock for accept-to-first-audio
+    job_started = time.monotonic()
+    settings = get_settings()
+    db = get_db()
+    # A job process runs one job, so take the prewarmed clients out of userdata
+    prewarmed = {key: ctx.proc.userdata.pop(key) for key in ("stt", "tts", "llm") if key in ctx.proc.userdata}
+    # Played as soon as the caller's audio is subscribed, while the rest of the session is set up
+    greeting = Greeting(ctx.room, ctx.proc.userdata.pop("greeting", None), job_started)
+    if "tts" in prewarmed:
+        # Open the Cartesia websocket while we connect to the room
+        prewarmed["tts"].prewarm()
+        greeting.attach(prewarmed["tts"])
+    
     logger.info("=" * 60)
     logger.info("🚀 AGENT ENTRYPOINT CALLED!")
     logger.info(f"   Room: {ctx.room.name}")
@@ -287,12 +350,20 @@ async def entrypoint(ctx: JobContext):
         except Exception as e:
             logger.info(f"   Room SID: (could not get: {e})")
         logger.info(f"   Local participant: {ctx.room.local_participant.identity}")
+        greeting.publish()
     except Exception as e:
         logger.error(f"❌ Failed to connect to room: {e}")
         import traceback
         traceback.print_exc()
         raise
     
+    # Flush queued summaries/tool-call logs before the job process goes away
+    ctx.add_shutdown_callback(db.write_queue.aclose)
+    
+    # Tool calls/results and the summary go to the frontend from one task, in order
+    data_publisher = DataPublisher(ctx.room)
+    data_publisher.start()
+    
     # Subscribe to all audio tracks from remote participants
     # Note: Event handlers must be synchronous, use asyncio.create_task for async operations
     def on_track_published(publication: rtc.RemoteTrackPublication, participant: rtc.RemoteParticipant):
@@ -331,6 +402,8 @@ async def entrypoint(ctx: JobContext):
         
         if track.kind == rtc.TrackKind.KIND_AUDIO:
             logger.info("Audio track subscribed - agent should receive audio now")
+            if _is_caller(participant):
+                greeting.play()
         elif track.kind == rtc.TrackKind.KIND_VIDEO:
             logger.info(f"🎥 Video track subscribed from {participant.identity} - frontend should display this")
     
@@ -364,6 +437,8 @@ async def entrypoint(ctx: JobContext):
                 # Check subscription status - subscribed() is a method
                 is_subscribed = publication.subscribed() if hasattr(publication, 'subscribed') and callable(publication.subscribed) else False
                 logger.info(f"Audio track found from {participant.identity}, subscribed={is_subscribed}")
+                if is_subscribed and _is_caller(participant):
+                    greeting.play()
                 if not is_subscribed:
                     try:
                         # set_subscribed is synchronous, not awaitable
@@ -373,7 +448,7 @@ async def entrypoint(ctx: JobContext):
                         logger.warning(f"Could not subscribe to track: {e}")
     
     # Create tools instance
-    tools_instance = AppointmentTools(db)
+    tools_instance = AppointmentTools(db, session_id=ctx.job.id)
     tool_definitions = tools_instance.get_tool_definitions()
     logger.info(f"Created {len(tool_definitions)} tools")
     
@@ -384,7 +459,11 @@ async def entrypoint(ctx: JobContext):
     
     # Create LLM with tools
     # Note: Tools are passed to Agent, and AgentSession will handle tool execution automatically
-    llm_instance = _create_llm(tool_definitions)
+    if "llm" in prewarmed:
+        llm_instance = prewarmed["llm"]
+        llm_instance._tools = tool_definitions
+    else:
+        llm_instance = _create_llm(tool_definitions)
     
     # Verify Deepgram API key is set
     deepgram_key = os.environ.get("DEEPGRAM_API_KEY")
@@ -403,14 +482,15 @@ async def entrypoint(ctx: JobContext):
     # Create voice assistant
     logger.info("Creating VoiceAssistant with STT and TTS...")
     try:
-        stt_instance = deepgram.STT()
+        stt_instance = prewarmed.get("stt") or _create_stt()
         logger.info("Deepgram STT instance created")
     except Exception as e:
         logger.error(f"Failed to create Deepgram STT: {e}")
         raise
     
     try:
-        tts_instance = cartesia.TTS()
+        tts_instance = prewarmed.get("tts") or _create_tts()
+        greeting.attach(tts_instance)
         logger.info("Cartesia TTS instance created")
     except Exception as e:
         logger.error(f"Failed to create Cartesia TTS: {e}")
@@ -433,8 +513,13 @@ Guidelines:
 - Keep responses concise (under 30 seconds of speech)
 - When ending a conversation, summarize what was discussed""",
     )
+    if GREETING_ENABLED:
+        # Spoken by greeting.py before the session starts; the model should know it already said it
+        system_chat_ctx.add_message(role="assistant", content=GREETING_TEXT)
     
-    assistant = Agent(
+    # SPECULATIVE_LLM=true starts the LLM on stable interim transcripts
+    agent_class = SpeculativeAgent if SPECULATIVE_LLM else Agent
+    assistant = agent_class(
         instructions="""You are a friendly and professional appointment booking assistant. 
 Your role is to help users book, retrieve, modify, and cancel appointments.
 
@@ -447,6 +532,8 @@ Guidelines:
   2. Present the available slots to the user
   3. Book the first available slot (or the slot the user prefers)
 - The fetch_slots tool already filters out booked slots, so you can book any slot it returns
+- When the user states preferences, call find_best_slots and offer its top results instead of reading out every slot
+- Pass the user's own words for dates and times (e.g. fetch_slots date "next Tuesday afternoon"); the tools resolve them, so don't work out calendar dates yourself
 - Always confirm the date, time, and any other details before booking
 - Be helpful and empathetic
 - Keep responses concise (under 30 seconds of speech)
@@ -455,7 +542,9 @@ Guidelines:
 Available tools:
 - identify_user: Get user's phone number to identify them
 - fetch_slots: Get available appointment slots (returns ONLY unbooked slots)
+- find_best_slots: Get the top few slots for the user's preferences (days, time of day, range, near an appointment)
 - book_appointment: Book an appointment (use slots from fetch_slots)
+- book_recurring_appointments: Book a daily/weekly/biweekly series in one call
 - retrieve_appointments: Get user's past appointments
 - cancel_appointment: Cancel an appointment
 - modify_appointment: Change appointment details
@@ -479,8 +568,15 @@ Available tools:
         UserInputTranscribedEvent,
         ConversationItemAddedEvent,
         FunctionToolsExecutedEvent,
+        MetricsCollectedEvent,
+        AgentStateChangedEvent,
         AgentEvent,
     )
+    from livekit.agents.metrics import LLMMetrics
+    
+    # Prompt tokens of every LLM request, to see what tool results cost later turns
+    prompt_tokens_per_turn = []
+    first_audio_logged = [False]
     
     # Create AgentSession - don't pass tools here since Agent already has them
     # AgentSession will use tools from the Agent when we call start(agent=assistant)
@@ -492,6 +588,23 @@ Available tools:
         turn_detection="stt",  # Use STT-based turn detection
     )
     
+    # Speak a cached filler phrase when a tool call runs long, and measure dead air
+    filler = FillerSpeech(session)
+    tools_instance.filler = filler
+    
+    # Per-turn latency: end of speech -> STT final -> LLM TTFT -> tools -> TTS first byte -> audio
+    tracer = TurnTracer(session, session_id=ctx.job.id)
+    tools_instance.tracer = tracer
+    
+    def on_user_state(ev):
+        # The caller talking over the greeting wants to answer, not hear the rest
+        if ev.new_state == "speaking":
+            greeting.stop()
+    
+    session.on("user_state_changed", on_user_state)
+    if FILLER_ENABLED:
+        asyncio.create_task(warm_filler_audio(tts_instance))
+    
     # Set up event handlers for conversation tracking BEFORE starting
     def on_event(ev: AgentEvent):
         if isinstance(ev, UserInputTranscribedEvent):
@@ -521,8 +634,24 @@ Available tools:
                         "content": text,
                         "timestamp": datetime.now().isoformat(),
                     })
+        elif isinstance(ev, MetricsCollectedEvent):
+            if isinstance(ev.metrics, LLMMetrics):
+                prompt_tokens_per_turn.append(ev.metrics.prompt_tokens)
+                logger.info(f"LLM turn {len(prompt_tokens_per_turn)}: {ev.metrics.prompt_tokens} prompt tokens")
+        elif isinstance(ev, AgentStateChangedEvent):
+            # With a greeting, its first frame was the first audio (logged by greeting.py)
+            if ev.new_state == "speaking" and not first_audio_logged[0] and greeting.first_audio_at is None:
+                first_audio_logged[0] = True
+                logger.info(
+                    f"Job accept to first audio: {(time.monotonic() - job_started) * 1000:.0f} ms "
+                    f"(prewarmed={bool(prewarmed)})"
+                )
         elif isinstance(ev, FunctionToolsExecutedEvent):
-            # Track tool calls
+            # Frontend messages are built here and sent by the publisher task: all calls,
+            # then all results, so each topic's run goes out as one packet. The raw
+            # argument/result strings are decoded by that task, not on this handler
+            tool_call_messages = []
+            tool_result_messages = []
             for function_call, function_output in ev.zipped():
                 logger.info(f"🔧 TOOL CALL: {function_call.name}")
                 tool_calls_made.append({
@@ -531,174 +660,59 @@ Available tools:
                     "result": function_output.output if function_output else None,
                     "timestamp": datetime.now().isoformat(),
                 })
+                db.log_tool_call(
+                    room=ctx.room.name,
+                    user_phone=tools_instance.user_phone,
+                    name=function_call.name,
+                    args=function_call.arguments,
+                    result=function_output.output if function_output else None,
+                )
                 
-                # Generate unique ID for this tool call
-                import uuid
+                # Lets the frontend match the result to its call
                 tool_call_id = str(uuid.uuid4())
-                
-                # Send tool call info to frontend
-                try:
-                    # Parse arguments if it's a string
-                    args_data = function_call.arguments
-                    if isinstance(args_data, str):
-                        try:
-                            args_data = json.loads(args_data)
-                        except:
-                            pass  # Keep as string if not JSON
-                    
-                    tool_call_data = {
-                        "type": "tool_call",
+                tool_call_messages.append({
+                    "type": "tool_call",
+                    "id": tool_call_id,
+                    "name": function_call.name,
+                    "args": function_call.arguments,
+                })
+                if function_output:
+                    tool_result_messages.append({
+                        "type": "tool_result",
                         "id": tool_call_id,
                         "name": function_call.name,
-                        "args": args_data,
-                    }
-                    logger.info(f"📤 Sending tool_call to frontend: {function_call.name} (ID: {tool_call_id})")
-                    logger.info(f"   Room participants: {len(ctx.room.remote_participants)}")
-                    for pid, participant in ctx.room.remote_participants.items():
-                        logger.info(f"   - Remote participant: {participant.identity}")
-                    
-                    # Send data - publish_data is async, but on_event is sync, so use create_task
-                    try:
-                        data_bytes = json.dumps(tool_call_data).encode('utf-8')
-                        logger.info(f"   📦 Data bytes: {len(data_bytes)} bytes")
-                        logger.info(f"   📦 Data content: {tool_call_data}")
-                        
-                        # Send to each remote participant explicitly
-                        remote_participants_list = list(ctx.room.remote_participants.values())
-                        logger.info(f"   📤 Sending to {len(remote_participants_list)} remote participant(s)")
-                        
-                        if len(remote_participants_list) == 0:
-                            logger.warning("   ⚠️  No remote participants to send data to!")
-                        else:
-                            # Send data once (with topic)
-                            # IMPORTANT: publish_data is async, but on_event is sync, so use create_task
-                            try:
-                                asyncio.create_task(
-                                    ctx.room.local_participant.publish_data(
-                                        data_bytes,
-                                        topic="tool_calls",
-                                        reliable=True,
-                                    )
-                                )
-                                logger.info(f"   ✅ Tool call sent with topic 'tool_calls' (async task created)")
-                            except Exception as e_topic:
-                                logger.error(f"   ❌ Failed to send with topic: {e_topic}")
-                                import traceback
-                                traceback.print_exc()
-                                # Only try fallback if topic send fails
-                                try:
-                                    asyncio.create_task(
-                                        ctx.room.local_participant.publish_data(
-                                            data_bytes,
-                                            reliable=True,
-                                        )
-                                    )
-                                    logger.info(f"   ✅ Tool call sent without topic (fallback)")
-                                except Exception as e2:
-                                    logger.error(f"   ❌ Fallback send also failed: {e2}")
-                                    import traceback
-                                    traceback.print_exc()
-                    except Exception as e:
-                        logger.error(f"   ❌ Error sending tool call: {e}")
-                        import traceback
-                        traceback.print_exc()
-                except Exception as e:
-                    logger.error(f"❌ Error sending tool call to frontend: {e}")
-                    import traceback
-                    traceback.print_exc()
-                
-                # Send tool result to frontend
-                if function_output:
-                    try:
-                        # FunctionCallOutput has 'output' attribute, not 'content'
-                        result_output = function_output.output if hasattr(function_output, 'output') else str(function_output)
-                        # Try to parse as JSON if it's a string
-                        try:
-                            result_output = json.loads(result_output) if isinstance(result_output, str) else result_output
-                        except (json.JSONDecodeError, TypeError):
-                            pass  # Keep as string if not JSON
-                        
-                        tool_result_data = {
-                            "type": "tool_result",
-                            "id": tool_call_id,  # Include the same ID for matching
-                            "name": function_call.name,
-                            "result": result_output,
-                        }
-                        logger.info(f"📤 Sending tool_result to frontend: {function_call.name} (ID: {tool_call_id})")
-                        logger.info(f"   Room participants: {len(ctx.room.remote_participants)}")
-                        for pid, participant in ctx.room.remote_participants.items():
-                            logger.info(f"   - Remote participant: {participant.identity}")
-                        
-                        # Send data - publish_data is synchronous, not async
-                        try:
-                            data_bytes_result = json.dumps(tool_result_data).encode('utf-8')
-                            logger.info(f"   📦 Result bytes: {len(data_bytes_result)} bytes")
-                            logger.info(f"   📦 Result content: {tool_result_data}")
-                            
-                            remote_participants_list = list(ctx.room.remote_participants.values())
-                            logger.info(f"   📤 Sending result to {len(remote_participants_list)} remote participant(s)")
-                            
-                            if len(remote_participants_list) == 0:
-                                logger.warning("   ⚠️  No remote participants to send result to!")
-                            else:
-                                # Send result once (with topic)
-                                # IMPORTANT: publish_data is async, but on_event is sync, so use create_task
-                                try:
-                                    asyncio.create_task(
-                                        ctx.room.local_participant.publish_data(
-                                            data_bytes_result,
-                                            topic="tool_results",
-                                            reliable=True,
-                                        )
-                                    )
-                                    logger.info(f"   ✅ Tool result sent with topic 'tool_results' (async task created)")
-                                except Exception as e_topic:
-                                    logger.error(f"   ❌ Failed to send result with topic: {e_topic}")
-                                    import traceback
-                                    traceback.print_exc()
-                                    # Only try fallback if topic send fails
-                                    try:
-                                        asyncio.create_task(
-                                            ctx.room.local_participant.publish_data(
-                                                data_bytes_result,
-                                                reliable=True,
-                                            )
-                                        )
-                                        logger.info(f"   ✅ Tool result sent without topic (fallback)")
-                                    except Exception as e2:
-                                        logger.error(f"   ❌ Fallback send also failed: {e2}")
-                                        import traceback
-                                        traceback.print_exc()
-                        except Exception as e:
-                            logger.error(f"   ❌ Error sending tool result: {e}")
-                            import traceback
-                            traceback.print_exc()
-                    except Exception as e:
-                        logger.error(f"❌ Error sending tool result to frontend: {e}")
-                        import traceback
-                        traceback.print_exc()
+                        "result": function_output.output,
+                    })
                 
                 # Update user_phone if identify_user was called
                 if function_call.name == "identify_user":
-                    args = json.loads(function_call.arguments) if isinstance(
-                        function_call.arguments, str
-                    ) else function_call.arguments
-                    if "phone" in args:
+                    try:
+                        args = json.loads(function_call.arguments)
+                    except (TypeError, ValueError):
+                        args = None
+                    if isinstance(args, dict) and "phone" in args:
                         user_phone[0] = args["phone"]
                         tools_instance.user_phone = args["phone"]
+            
+            for message in tool_call_messages:
+                data_publisher.publish("tool_calls", message, json_fields=("args",))
+            for message in tool_result_messages:
+                data_publisher.publish("tool_results", message, json_fields=("result",))
     
     # Register event handlers
     session.on("user_input_transcribed", on_event)
     session.on("conversation_item_added", on_event)
     session.on("function_tools_executed", on_event)
+    session.on("metrics_collected", on_event)
+    session.on("agent_state_changed", on_event)
     logger.info("✅ Registered event handlers for conversation tracking")
     
     # Set up avatar - two modes:
     # 1. Separate participant mode (AVATAR_MODE=separate or not set): Avatar joins as separate participant (3 participants)
     # 2. Direct mode (AVATAR_MODE=direct): Agent publishes video directly (2 participants)
     avatar_session = None
-    avatar_mode = os.getenv("AVATAR_MODE", "separate").lower()
-    avatar_provider = os.getenv("AVATAR_PROVIDER", "").lower()
+    avatar_mode = settings.avatar_mode
+    avatar_provider = settings.avatar_provider
     
     logger.info(f"🔍 Avatar provider: '{avatar_provider}', mode: '{avatar_mode}'")
     
@@ -754,8 +768,8 @@ Available tools:
     # This gives you 2 participants: user + agent (agent publishes video)
     if not avatar_session:
         try:
-            enable_avatar_video = os.getenv("ENABLE_AVATAR_VIDEO", "false").lower() == "true"
-            avatar_provider = os.getenv("AVATAR_PROVIDER", "placeholder").lower()
+            enable_avatar_video = settings.enable_avatar_video
+            avatar_provider = settings.avatar_provider or "placeholder"
             
             # If user wanted Beyond Presence/Tavus but it failed, enable placeholder as fallback
             if avatar_provider in ["beyond-presence", "tavus"]:
@@ -849,31 +863,58 @@ Available tools:
         if len(conversation_history) > 0 or len(tool_calls_made) > 0:
             summary = await _generate_summary(conversation_history, tool_calls_made)
             
-            # Save summary to database
+            # Queue summary for the database (written behind)
             if user_phone[0]:
-                await db.save_conversation_summary(
+                db.save_conversation_summary(
                     user_phone=user_phone[0],
                     summary=summary,
                     tool_calls=tool_calls_made,
                 )
             
-            # Send summary to frontend
-            try:
-                await ctx.room.local_participant.publish_data(
-                    json.dumps({
-                        "type": "conversation_summary",
-                        "summary": summary,
-                    }).encode(),
-                    topic="summary",
-                )
-            except Exception as e:
-                print(f"Error sending summary: {e}")
+            # Send summary to frontend, after any tool results still queued
+            data_publisher.publish("summary", {
+                "type": "conversation_summary",
+                "summary": summary,
+            })
+        
+        # Write what is queued (the summary included) before returning; the shutdown
+        # callback only runs once this entrypoint has finished or been cancelled
+        await db.write_queue.aclose()
+        await data_publisher.close()
+        logger.info(f"Data channel: {DATA_PUBLISH_STATS}, session: {data_publisher.stats()}")
+        # Connection reuse and connect/TTFB timings for database calls in this process
+        storage_stats = db.storage.stats()
+        if storage_stats:
+            logger.info(f"Database transport stats: {storage_stats}")
+        logger.info(f"Database cache stats: {db.cache_stats()}")
+        logger.info(f"Database resilience stats: {db.resilience_stats()}")
+        tools_instance.close()
+        logger.info(f"Prefetch stats: {PREFETCH_STATS}")
+        logger.info(f"Idempotent tool replays: {IDEMPOTENCY_STATS}")
+        logger.info(f"Filler speech: {FILLER_STATS}, dead air per tool turn: {filler.stats()}")
+        tracer.close()
+        greeting.stop()
+        await greeting.close()
+        logger.info(f"Greeting: {GREETING_STATS}")
+        logger.info(f"Turn latency (session): {tracer.stats.turn_latency()}")
+        logger.info(f"Turn latency (process): {TRACE_STATS.turn_latency()}")
+        logger.info(f"Turn stages (session): {tracer.stats.snapshot()['stages']}")
+        if TTS_CACHE_ENABLED:
+            logger.info(f"TTS cache: {tts_cache_summary()}, {get_tts_cache().stats()}")
+        if SPECULATIVE_LLM:
+            logger.info(f"Speculative LLM: {speculation_summary()}")
+        if prompt_tokens_per_turn:
+            logger.info(
+                f"Prompt tokens per turn: avg {sum(prompt_tokens_per_turn) / len(prompt_tokens_per_turn):.0f}, "
+                f"max {max(prompt_tokens_per_turn)} over {len(prompt_tokens_per_turn)} turns"
+            )
         
         # Clean up session
         await session.aclose()
 
 
 if __name__ == "__main__":
+    _log_startup()
     print("\n" + "=" * 60)
     print("REGISTERING AGENT ENTRYPOINT")
     print("=" * 60 + "\n")
@@ -885,13 +926,13 @@ if __name__ == "__main__":
     try:
         print("Starting LiveKit agent worker...")
         print("Agent will listen for new connections on LiveKit server")
-        print(f"LiveKit URL: {os.getenv('LIVEKIT_URL', 'NOT SET')}")
+        print(f"LiveKit URL: {get_settings().livekit_url or 'NOT SET'}")
         print("\nWaiting for user connections...")
         print("(The entrypoint will be called when a user connects)\n")
         
         logger.info("Starting LiveKit agent worker...")
         logger.info("Agent will listen for new connections on LiveKit server")
-        logger.info(f"LiveKit URL: {os.getenv('LIVEKIT_URL', 'NOT SET')}")
+        logger.info(f"LiveKit URL: {get_settings().livekit_url or 'NOT SET'}")
         logger.info("Waiting for user connections...")
         logger.info("(The entrypoint will be called when a user connects)")
         
@@ -900,6 +941,7 @@ if __name__ == "__main__":
         agent_name = "voice-agent"  # Set name for explicit dispatch
         worker_opts = WorkerOptions(
             entrypoint_fnc=entrypoint,
+            prewarm_fnc=prewarm,
             request_fnc=job_request_handler,
             agent_name=agent_name,  # Set name for explicit dispatch
         )
@@ -911,6 +953,7 @@ if __name__ == "__main__":
         
         logger.info("Worker options configured:")
         logger.info(f"  - Entrypoint: {entrypoint.__name__}")
+        logger.info(f"  - Prewarm: {'enabled' if get_settings().prewarm_enabled else 'disabled'} (plugins, provider clients, DB connections)")
         logger.info("  - Job request handler: enabled (will log when jobs are received)")
         logger.info("  - Agent will accept jobs and join rooms when participants connect")
         
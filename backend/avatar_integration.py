@@ -4,13 +4,14 @@ Avatar integration using LiveKit's built-in avatar support or direct API integra
 This module provides integration with Tavus and Beyond Presence avatars.
 """
 
-import os
 import asyncio
 import logging
 from typing import Optional
 from livekit import rtc
 from livekit.agents import JobContext
 
+from settings import get_settings
+
 logger = logging.getLogger(__name__)
 
 
@@ -33,7 +34,7 @@ async def setup_avatar_session(
         AvatarSession if successful, None otherwise
     """
     if provider is None:
-        provider = os.getenv("AVATAR_PROVIDER", "").lower()
+        provider = get_settings().avatar_provider
     
     if not provider or provider == "placeholder":
         logger.info("No avatar provider specified, skipping avatar setup")
@@ -73,9 +74,10 @@ async def _setup_tavus_avatar(ctx: JobContext, agent_session) -> Optional[object
     try:
         from livekit.plugins import tavus
         
-        tavus_api_key = os.getenv("TAVUS_API_KEY")
-        replica_id = os.getenv("TAVUS_REPLICA_ID")
-        persona_id = os.getenv("TAVUS_PERSONA_ID")
+        settings = get_settings()
+        tavus_api_key = settings.tavus_api_key
+        replica_id = settings.tavus_replica_id
+        persona_id = settings.tavus_persona_id
         
         if not tavus_api_key or not replica_id:
             logger.warning("TAVUS_API_KEY and TAVUS_REPLICA_ID must be set for Tavus avatar")
@@ -127,8 +129,9 @@ async def _setup_beyond_presence_avatar(ctx: JobContext, agent_session) -> Optio
         from livekit.plugins import bey
         
         # Check both naming conventions for environment variables
-        api_key = os.getenv("BEY_API_KEY") or os.getenv("BEYOND_PRESENCE_API_KEY")
-        avatar_id = os.getenv("BEY_AVATAR_ID") or os.getenv("BEYOND_PRESENCE_AVATAR_ID")
+        settings = get_settings()
+        api_key = settings.bey_api_key
+        avatar_id = settings.bey_avatar_id
         
         if not api_key or not avatar_id:
             logger.warning("BEY_API_KEY (or BEYOND_PRESENCE_API_KEY) and BEY_AVATAR_ID (or BEYOND_PRESENCE_AVATAR_ID) must be set")
@@ -11,14 +11,14 @@ Usage:
     await publish_avatar_video(ctx)
 """
 
-import os
 import asyncio
 import logging
-import numpy as np
 from typing import Optional
 from livekit import rtc
 from livekit.agents import JobContext
 
+from settings import get_settings
+
 logger = logging.getLogger(__name__)
 
 
@@ -41,21 +41,22 @@ async def publish_avatar_video(
     """
     try:
         # Check if avatar is enabled
-        enable_avatar = os.getenv("ENABLE_AVATAR_VIDEO", "false").lower() == "true"
+        settings = get_settings()
+        enable_avatar = settings.enable_avatar_video
         if not enable_avatar:
             logger.info("Avatar video disabled (set ENABLE_AVATAR_VIDEO=true to enable)")
             return None
         
         # Get provider from env or parameter
         if provider is None:
-            provider = os.getenv("AVATAR_PROVIDER", "placeholder").lower()
+            provider = settings.avatar_provider or "placeholder"
         
         # Create video source (adjust resolution as needed)
         # Lower resolution = better performance, less lag
         # Default to 640x360 for better performance
-        width = int(os.getenv("AVATAR_VIDEO_WIDTH", "640"))
-        height = int(os.getenv("AVATAR_VIDEO_HEIGHT", "360"))
-        fps = int(os.getenv("AVATAR_VIDEO_FPS", "15"))  # Lower FPS = less CPU usage
+        width = settings.avatar_video_width
+        height = settings.avatar_video_height
+        fps = settings.avatar_video_fps  # Lower FPS = less CPU usage
         
         logger.info(f"Creating avatar video track: {width}x{height} @ {fps}fps (provider: {provider})")
         
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for the booking path on a local SQLite backend
+
+Each simulated caller runs identify -> fetch slots -> book against one
+Database, with many callers in flight at once. Runs entirely on one box: the
+schema comes from supabase/migrations.sql and nothing talks to Supabase.
+
+Usage:
+    python bench_booking.py [--callers 200] [--concurrency 20] [--db :memory:]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from database import Database, SlotConflictError
+from storage import SQLiteStorage
+
+
+async def _caller(db: Database, caller_id: int, latencies: list, outcomes: dict) -> None:
+    phone = f"+1555{caller_id:07d}"
+    started = time.perf_counter()
+    await db.get_or_create_user(phone)
+    slots = await db.get_available_slots()
+    if not slots:
+        outcomes["no_slots"] += 1
+        return
+    slot = random.choice(slots)
+    try:
+        await db.book_appointment(phone, slot["date"], slot["time"])
+        outcomes["booked"] += 1
+    except SlotConflictError:
+        outcomes["conflict"] += 1
+    latencies.append((time.perf_counter() - started) * 1000)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--callers", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--db", default=None, help="SQLite path (default: temp file in WAL mode)")
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(prefix="bench_booking_"), "bench.db")
+    db = Database(storage=SQLiteStorage(path=path))
+
+    latencies: list = []
+    outcomes = {"booked": 0, "conflict": 0, "no_slots": 0}
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def bounded(caller_id: int):
+        async with semaphore:
+            await _caller(db, caller_id, latencies, outcomes)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(bounded(i) for i in range(args.callers)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print("=" * 60)
+    print(f"Booking path on SQLite ({path})")
+    print("=" * 60)
+    print(f"  callers:        {args.callers} ({args.concurrency} concurrent)")
+    print(f"  booked:         {outcomes['booked']}")
+    print(f"  conflicts:      {outcomes['conflict']}")
+    print(f"  no slots left:  {outcomes['no_slots']}")
+    print(f"  throughput:     {args.callers / elapsed:8.1f} callers/s")
+    if latencies:
+        print(f"  latency p50:    {statistics.median(latencies):8.2f} ms")
+        print(f"  latency p95:    {latencies[round((len(latencies) - 1) * 0.95)]:8.2f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark audio-loop lag while concurrent tool calls hit the database
+
+Runs a 20 ms "audio frame" ticker on the event loop alongside a burst of
+concurrent Database calls and reports how late the ticker fires. The first run
+calls .execute() inline on the loop (the old behaviour), the second goes through
+the storage backend's bounded executor.
+
+A fake supabase client with a fixed round trip is used, so no project or
+credentials are needed.
+
+Usage:
+    python bench_event_loop.py [--calls 20] [--rtt-ms 80]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from database import Database
+from storage import SupabaseStorage
+
+FRAME_SECONDS = 0.02
+
+
+class _FakeResult:
+    def __init__(self):
+        self.data = []
+
+
+class _FakeQuery:
+    """Chainable stand-in for a postgrest query builder with a blocking execute()"""
+
+    def __init__(self, rtt: float):
+        self.rtt = rtt
+
+    def __getattr__(self, name):
+        # select/eq/order/insert/update all just return the builder
+        return lambda *args, **kwargs: self
+
+    def execute(self):
+        time.sleep(self.rtt)
+        return _FakeResult()
+
+
+class _FakeClient:
+    def __init__(self, rtt: float):
+        self.rtt = rtt
+
+    def table(self, name: str) -> _FakeQuery:
+        return _FakeQuery(self.rtt)
+
+
+async def _audio_ticker(stop: asyncio.Event, lags: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(FRAME_SECONDS)
+        lags.append((time.perf_counter() - start - FRAME_SECONDS) * 1000)
+
+
+async def _run(label: str, calls: int, make_call) -> None:
+    lags: list = []
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(_audio_ticker(stop, lags))
+    await asyncio.sleep(FRAME_SECONDS * 5)  # let the ticker settle
+
+    started = time.perf_counter()
+    await asyncio.gather(*(make_call(i) for i in range(calls)))
+    wall_ms = (time.perf_counter() - started) * 1000
+
+    stop.set()
+    await ticker
+
+    lags.sort()
+    p95 = lags[round((len(lags) - 1) * 0.95)]
+    print(f"{label}:")
+    print(f"  tool calls wall time: {wall_ms:8.1f} ms")
+    print(f"  audio frames:         {len(lags):8d}")
+    print(f"  loop lag p50:         {statistics.median(lags):8.1f} ms")
+    print(f"  loop lag p95:         {p95:8.1f} ms")
+    print(f"  loop lag max:         {lags[-1]:8.1f} ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=20, help="concurrent tool calls")
+    parser.add_argument("--rtt-ms", type=float, default=80.0, help="simulated Supabase round trip")
+    args = parser.parse_args()
+    rtt = args.rtt_ms / 1000
+
+    client = _FakeClient(rtt)
+    db = Database(storage=SupabaseStorage(client=client))
+
+    print("=" * 60)
+    print(f"Event loop lag: {args.calls} concurrent calls, {args.rtt_ms:.0f} ms round trip")
+    print("=" * 60)
+
+    async def inline_call(i: int):
+        # What every Database method used to do: block the loop on .execute()
+        client.table("users").select("*").eq("phone", f"+1555000{i:04d}").execute()
+
+    async def executor_call(i: int):
+        await db.get_user_by_phone(f"+1555000{i:04d}")
+
+    await _run("Before (inline .execute())", args.calls, inline_call)
+    await _run("After (bounded executor)", args.calls, executor_call)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
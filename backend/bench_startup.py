@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Worker startup benchmark: import cost of agent.py and time until a job process is ready
+
+Each run is a fresh interpreter that first imports livekit.agents (a job
+process already has the framework loaded), then times `import agent` and
+`agent.get_db()`. One extra run under `python -X importtime` lists the modules
+agent.py pulls in. Exits non-zero if startup regresses:
+
+- a module that should load lazily (provider plugins, supabase) is imported
+  eagerly, or importing agent.py prints anything
+- the median import or time-to-ready exceeds --max-import-ms / --max-ready-ms
+
+Usage:
+    python bench_startup.py [--runs 5] [--backend memory] [--max-import-ms 150] [--max-ready-ms 250]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Must not be imported by `import agent`; they belong to the first job that needs them
+LAZY_MODULES = (
+    "supabase",
+    "livekit.plugins.deepgram",
+    "livekit.plugins.cartesia",
+    "livekit.plugins.openai",
+    "livekit.plugins.anthropic",
+    "livekit.plugins.tavus",
+    "livekit.plugins.bey",
+)
+
+_SNIPPET = """
+import json, time
+import livekit.agents
+started = time.perf_counter()
+import agent
+imported = time.perf_counter()
+agent.get_db()
+ready = time.perf_counter()
+print(json.dumps({"import_ms": (imported - started) * 1000, "ready_ms": (ready - started) * 1000}))
+"""
+
+
+def _run(backend: str, importtime: bool = False) -> subprocess.CompletedProcess:
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", _SNIPPET]
+    env = {**os.environ, "STORAGE_BACKEND": backend}
+    result = subprocess.run(command, cwd=HERE, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        sys.exit(f"Startup run failed:\n{result.stderr[-2000:]}")
+    return result
+
+
+def _import_tree(stderr: str):
+    """(module, cumulative us, depth) for every module `import agent` loaded"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(cumulative), depth))
+    # importtime prints children before their parent; keep agent's subtree only
+    for index, (name, _, depth) in enumerate(rows):
+        if name == "agent" and depth == 0:
+            start = index
+            while start > 0 and rows[start - 1][2] > 0:
+                start -= 1
+            return rows[start:index + 1]
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--backend", default="memory", help="STORAGE_BACKEND for the runs (supabase needs credentials)")
+    parser.add_argument("--max-import-ms", type=float, default=150.0)
+    parser.add_argument("--max-ready-ms", type=float, default=250.0)
+    parser.add_argument("--top", type=int, default=10, help="Slowest direct imports to list")
+    args = parser.parse_args()
+
+    samples = []
+    for _ in range(args.runs):
+        result = _run(args.backend)
+        lines = result.stdout.strip().splitlines()
+        samples.append(json.loads(lines[-1]))
+    import_ms = statistics.median(sample["import_ms"] for sample in samples)
+    ready_ms = statistics.median(sample["ready_ms"] for sample in samples)
+
+    traced = _run(args.backend, importtime=True)
+    tree = _import_tree(traced.stderr)
+    loaded = {name for name, _, _ in tree}
+    direct = sorted((row for row in tree if row[2] == 1), key=lambda row: -row[1])
+
+    print("=" * 60)
+    print(f"Worker startup ({args.runs} runs, STORAGE_BACKEND={args.backend})")
+    print("=" * 60)
+    print(f"  import agent (median):      {import_ms:8.1f} ms")
+    print(f"  time to ready (median):     {ready_ms:8.1f} ms  (import + Database)")
+    print(f"  modules loaded by agent.py: {len(tree):8d}")
+    print(f"  slowest direct imports (-X importtime):")
+    for name, cumulative, _ in direct[:args.top]:
+        print(f"    {name:<36}{cumulative / 1000:8.1f} ms")
+
+    failures = []
+    eager = [module for module in LAZY_MODULES if module in loaded]
+    if eager:
+        failures.append(f"imported eagerly: {', '.join(eager)}")
+    banner = traced.stdout.strip().splitlines()[:-1]
+    if banner:
+        failures.append(f"import printed {len(banner)} line(s) to stdout")
+    if import_ms > args.max_import_ms:
+        failures.append(f"import {import_ms:.1f} ms > {args.max_import_ms:.0f} ms")
+    if ready_ms > args.max_ready_ms:
+        failures.append(f"time to ready {ready_ms:.1f} ms > {args.max_ready_ms:.0f} ms")
+
+    if failures:
+        print("\nSTARTUP REGRESSION:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+    print("\nOK: startup within limits")
+
+
+if __name__ == "__main__":
+    main()
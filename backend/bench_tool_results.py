@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Measure prompt tokens per turn spent on tool results, before and after compaction
+
+Plays a scripted booking conversation against an in-memory SQLite backend and
+tracks how many tokens the accumulated tool results add to each LLM turn, once
+with the old encoding (str() of full slot lists and select * rows) and once
+with tool_results.encode_result. Tokens are estimated at ~4 characters each.
+
+Usage:
+    python bench_tool_results.py [--appointments 5] [--budget 300]
+"""
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+
+from database import Database
+from storage import SQLiteStorage
+from tool_results import estimate_tokens, encode_result, group_slots, project_appointment
+
+PHONE = "+15550000000"
+
+
+async def _script(db: Database, appointments: int):
+    """Yield (tool name, legacy result, compact result) for each turn"""
+    user = await db.get_or_create_user(PHONE)
+    identified = {"success": True, "user": {"phone": user.get("phone"), "name": user.get("name")},
+                  "message": f"User identified: {PHONE}"}
+    yield "identify_user", identified, identified
+
+    # Earlier bookings so retrieve_appointments has something to return
+    start = datetime.now() + timedelta(days=1)
+    for i in range(appointments):
+        day = (start + timedelta(days=i // 4)).strftime("%Y-%m-%d")
+        await db.book_appointment(PHONE, day, ["09:00", "11:00", "14:00", "16:00"][i % 4], notes="Follow-up visit")
+
+    slots = await db.get_available_slots()
+    yield ("fetch_slots",
+           {"success": True, "slots": slots, "count": len(slots)},
+           {"success": True, "slots": group_slots(slots), "count": len(slots)})
+
+    booked = await db.book_appointment(PHONE, slots[-1]["date"], slots[-1]["time"], notes="Booked by bench")
+    message = f"Appointment booked for {slots[-1]['date']} at {slots[-1]['time']}"
+    yield ("book_appointment",
+           {"success": True, "appointment": booked, "message": message},
+           {"success": True, "appointment": project_appointment(booked), "message": message})
+
+    rows = await db.get_user_appointments(PHONE)
+    yield ("retrieve_appointments",
+           {"success": True, "appointments": rows, "count": len(rows)},
+           {"success": True, "appointments": [project_appointment(r) for r in rows], "count": len(rows)})
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--appointments", type=int, default=5)
+    parser.add_argument("--budget", type=int, default=300)
+    args = parser.parse_args()
+
+    db = Database(storage=SQLiteStorage(path=":memory:"))
+    before_total = after_total = 0
+
+    print("=" * 60)
+    print("Tool-result tokens carried into each LLM turn")
+    print("=" * 60)
+    print(f"  {'turn':<24}{'before':>10}{'after':>10}")
+    async for name, legacy, compact in _script(db, args.appointments):
+        # Every later turn re-sends all earlier tool results in the chat context
+        before_total += estimate_tokens(str(legacy))
+        after_total += estimate_tokens(encode_result(compact, budget=args.budget))
+        print(f"  {name:<24}{before_total:>10}{after_total:>10}")
+    saved = 1 - after_total / before_total if before_total else 0.0
+    print(f"  reduction:              {saved:>9.0%}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
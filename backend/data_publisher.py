@@ -0,0 +1,175 @@
+"""
+Per-session data-channel publisher: a bounded queue drained by one task, in order
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from livekit import rtc
+
+from tracing import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+# Messages waiting to be sent per session; publish() drops new messages beyond this
+DATA_QUEUE_SIZE = int(os.getenv("DATA_QUEUE_SIZE", "256"))
+# Coalesced packets stay under this (LiveKit recommends <15 KiB for reliable data)
+DATA_MAX_PACKET_BYTES = int(os.getenv("DATA_MAX_PACKET_BYTES", "14000"))
+# How long close() waits for the queue to drain at session end
+DATA_DRAIN_TIMEOUT = float(os.getenv("DATA_DRAIN_TIMEOUT", "3"))
+
+# Process-wide: messages queued/sent/dropped/failed and the packets they went out in
+DATA_PUBLISH_STATS = {"queued": 0, "sent": 0, "packets": 0, "dropped": 0, "failed": 0}
+
+
+def _parse_json(value: Any) -> Any:
+    """JSON text becomes the object it holds; anything else (or invalid JSON) is sent as-is"""
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            pass
+    return value
+
+
+class _Message:
+    __slots__ = ("topic", "body", "reliable", "json_fields", "queued_at")
+
+    def __init__(self, topic: str, body: Any, reliable: bool, json_fields: Tuple[str, ...]):
+        self.topic = topic
+        self.body = body
+        self.reliable = reliable
+        self.json_fields = json_fields
+        self.queued_at = time.monotonic()
+
+    def encode(self) -> bytes:
+        body = self.body
+        if self.json_fields:
+            body = {**body, **{field: _parse_json(body.get(field)) for field in self.json_fields}}
+        return json.dumps(body).encode("utf-8")
+
+
+class DataPublisher:
+    """Sends data-channel messages for one room from a single background task.
+
+    publish() only appends to a bounded queue, so event handlers on the audio
+    loop never parse, serialize or await anything: fields named in json_fields
+    hold JSON text (e.g. tool arguments) and are decoded by the task. The task sends messages in the
+    order they were queued; a run of queued messages with the same topic goes
+    out as one packet holding a JSON array (a lone message is sent as-is).
+    Failed sends are logged and counted, and queue depth and per-message send
+    latency (queued -> publish_data returned) are kept for stats().
+    """
+
+    def __init__(self, room: rtc.Room, maxsize: int = DATA_QUEUE_SIZE):
+        self.room = room
+        self.maxsize = maxsize
+        self.send_latency = LatencyHistogram()
+        self.max_depth = 0
+        self.last_error: Optional[str] = None
+        self._queue: Deque[_Message] = deque()
+        self._wakeup = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def publish(self, topic: str, message: Any, reliable: bool = True, json_fields: Tuple[str, ...] = ()) -> bool:
+        """Queue a JSON-serializable message; False if it was dropped because the queue is full.
+
+        json_fields names keys of a dict message whose values are JSON text to
+        send as objects.
+        """
+        if len(self._queue) >= self.maxsize:
+            DATA_PUBLISH_STATS["dropped"] += 1
+            logger.warning(f"Data publisher queue full ({self.maxsize}); dropped a '{topic}' message")
+            return False
+        self._queue.append(_Message(topic, message, reliable, json_fields))
+        DATA_PUBLISH_STATS["queued"] += 1
+        self.max_depth = max(self.max_depth, len(self._queue))
+        self._idle.clear()
+        self._wakeup.set()
+        return True
+
+    def _next_packet(self) -> Tuple[List[_Message], bytes]:
+        """Pop the longest same-topic run from the head of the queue that fits in one packet"""
+        first = self._queue.popleft()
+        batch = [first]
+        parts = [first.encode()]
+        size = len(parts[0]) + 2
+        while self._queue:
+            head = self._queue[0]
+            if head.topic != first.topic or head.reliable != first.reliable:
+                break
+            try:
+                encoded = head.encode()
+            except (TypeError, ValueError):
+                break  # fails on its own as the head of the next packet
+            if size + len(encoded) + 1 > DATA_MAX_PACKET_BYTES:
+                break
+            batch.append(self._queue.popleft())
+            parts.append(encoded)
+            size += len(encoded) + 1
+        payload = parts[0] if len(parts) == 1 else b"[" + b",".join(parts) + b"]"
+        return batch, payload
+
+    async def _run(self) -> None:
+        while True:
+            if not self._queue:
+                self._idle.set()
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            try:
+                batch, payload = self._next_packet()
+            except (TypeError, ValueError) as e:
+                # Not JSON-serializable; the message is lost but the queue keeps moving
+                DATA_PUBLISH_STATS["failed"] += 1
+                self.last_error = str(e)
+                logger.error(f"Could not serialize data message: {e}")
+                continue
+            first = batch[0]
+            try:
+                await self.room.local_participant.publish_data(payload, topic=first.topic, reliable=first.reliable)
+            except Exception as e:
+                DATA_PUBLISH_STATS["failed"] += len(batch)
+                self.last_error = str(e)
+                logger.error(f"Failed to publish {len(batch)} '{first.topic}' message(s): {e}")
+                continue
+            sent_at = time.monotonic()
+            for message in batch:
+                self.send_latency.record((sent_at - message.queued_at) * 1000)
+            DATA_PUBLISH_STATS["sent"] += len(batch)
+            DATA_PUBLISH_STATS["packets"] += 1
+            logger.debug(f"Published {len(batch)} '{first.topic}' message(s), {len(payload)} bytes")
+
+    async def close(self, timeout: float = DATA_DRAIN_TIMEOUT) -> None:
+        """Send what is queued (up to timeout), then stop the task"""
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Data publisher closed with {len(self._queue)} message(s) unsent")
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self.send_latency.snapshot()
+        return {
+            "depth": len(self._queue),
+            "max_depth": self.max_depth,
+            "send_ms": {key: snapshot[key] for key in ("count", "p50_ms", "p95_ms", "max_ms") if key in snapshot},
+            "last_error": self.last_error,
+        }
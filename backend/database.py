@@ -1,24 +1,103 @@
 """
-Database operations using Supabase
+Database operations (Supabase by default, see storage.py for backends)
 """
+import atexit
+import json
 import os
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
-from supabase import create_client, Client
+from typing import Optional, List, Dict, Any, Tuple
 from dotenv import load_dotenv
 
+from cache import TTLCache
+from resilience import ResilientCaller
+from slot_index import SLOT_TIMES, BookedSlotIndex, split_datetime
+from storage import SlotTakenError, Storage, create_storage
+from write_behind import WriteBehindQueue
+
 load_dotenv()
 
+# Storage backends run blocking I/O on a bounded thread pool instead of the
+# event loop that drives STT/TTS audio
+DB_MAX_WORKERS = int(os.getenv("DB_MAX_WORKERS", "8"))
+DB_CALL_TIMEOUT = float(os.getenv("DB_CALL_TIMEOUT", "5.0"))
+# How long a loaded day of booked slots is trusted before re-querying
+SLOT_INDEX_TTL = float(os.getenv("SLOT_INDEX_TTL", "60"))
+# Process-wide phone -> user row cache in front of the users table
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "600"))
+# Read-through cache of get_user_appointments keyed by (phone, status)
+APPOINTMENTS_CACHE_SIZE = int(os.getenv("APPOINTMENTS_CACHE_SIZE", "5000"))
+APPOINTMENTS_CACHE_TTL = float(os.getenv("APPOINTMENTS_CACHE_TTL", "120"))
+# Values of the status filter (None = all), matching the appointments CHECK constraint
+APPOINTMENT_STATUSES = (None, "confirmed", "cancelled")
+# Summaries and tool-call logs are written behind the conversation in batches
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "50"))
+WRITE_FLUSH_INTERVAL = float(os.getenv("WRITE_FLUSH_INTERVAL", "2.0"))
+WRITE_MAX_PENDING = int(os.getenv("WRITE_MAX_PENDING", "1000"))
+WRITE_SPILL_PATH = os.getenv("WRITE_SPILL_PATH", "pending_writes.jsonl")
+# Columns that arrive as JSON text but are stored as JSONB objects
+JSON_TEXT_COLUMNS = {"tool_call_logs": ("args", "result")}
+
+
+class SlotConflictError(ValueError):
+    """Raised when a slot is already held by a confirmed appointment"""
+
+    def __init__(self, date: str, time: str):
+        self.date = date
+        self.time = time
+        super().__init__(f"Slot already booked for {date} at {time}")
+
+
+def _decode_json_text(value: Any) -> Any:
+    """Parse a JSON string into the object it holds; anything else is returned as-is"""
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            pass
+    return value
+
+
+def _normalize_slot_time(time: str) -> str:
+    """Normalize "9:00" to "09:00"; raises ValueError unless it is one of SLOT_TIMES"""
+    # Normalize time format (ensure HH:MM format)
+    if ":" not in time:
+        raise ValueError("Invalid time format. Expected HH:MM")
+    
+    time_parts = time.split(":")
+    if len(time_parts) != 2:
+        raise ValueError("Invalid time format. Expected HH:MM")
+    
+    # Ensure time is in HH:MM format
+    hour, minute = time_parts[0].zfill(2), time_parts[1].zfill(2)
+    normalized_time = f"{hour}:{minute}"
+    
+    # Verify this is a valid slot time (9 AM, 11 AM, 2 PM, 4 PM)
+    if normalized_time not in SLOT_TIMES:
+        raise ValueError(f"Invalid time slot. Available times are: {', '.join(SLOT_TIMES)}")
+    return normalized_time
+
 
 class Database:
-    def __init__(self):
-        supabase_url = os.getenv("SUPABASE_URL")
-        supabase_key = os.getenv("SUPABASE_KEY")
-        
-        if not supabase_url or not supabase_key:
-            raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set")
-        
-        self.client: Client = create_client(supabase_url, supabase_key)
+    def __init__(self, storage: Optional[Storage] = None):
+        self.storage: Storage = storage or create_storage(
+            max_workers=DB_MAX_WORKERS,
+            call_timeout=DB_CALL_TIMEOUT,
+        )
+        # Deadlines from the turn budget, hedged reads and the circuit breaker
+        self.resilience = ResilientCaller()
+        self.slot_index = BookedSlotIndex(ttl=SLOT_INDEX_TTL)
+        self.user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+        self.appointments_cache = TTLCache(maxsize=APPOINTMENTS_CACHE_SIZE, ttl=APPOINTMENTS_CACHE_TTL)
+        self.write_queue = WriteBehindQueue(
+            self._insert_rows,
+            max_batch=WRITE_BATCH_SIZE,
+            flush_interval=WRITE_FLUSH_INTERVAL,
+            max_pending=WRITE_MAX_PENDING,
+            spill_path=WRITE_SPILL_PATH,
+        )
+        # Whatever is still queued when the process exits is kept on disk
+        atexit.register(self.write_queue.spill_pending)
         self._ensure_tables()
 
     def _ensure_tables(self):
@@ -27,88 +106,125 @@ class Database:
         # For now, we'll assume tables are created via Supabase dashboard
         pass
 
+    async def _call(self, op: str, fn, *args, idempotent: bool = False):
+        """Call the storage backend under the latency budget and circuit breaker"""
+        return await self.resilience.call(op, fn, *args, idempotent=idempotent)
+
+    def _stale(self, value):
+        """Count and return cached data served because the backend failed"""
+        self.resilience.counters["stale_fallback"] += 1
+        return value
+
     async def get_user_by_phone(self, phone: str) -> Optional[Dict[str, Any]]:
         """Get user by phone number"""
+        user = self.user_cache.get(phone)
+        if user is not None:
+            return user
         try:
-            result = self.client.table("users").select("*").eq("phone", phone).execute()
-            if result.data:
-                return result.data[0]
-            return None
+            user = await self._call("get_user", self.storage.get_user, phone, idempotent=True)
+            if user:
+                self.user_cache.set(phone, user)
+            return user
         except Exception as e:
             print(f"Error getting user: {e}")
-            return None
+            stale = self.user_cache.get_stale(phone)
+            return self._stale(stale) if stale is not None else None
 
     async def create_user(self, phone: str, name: Optional[str] = None) -> Dict[str, Any]:
         """Create a new user"""
         try:
-            result = self.client.table("users").insert({
+            user = await self._call("insert_user", self.storage.insert_user, {
                 "phone": phone,
                 "name": name,
                 "created_at": datetime.now().isoformat(),
-            }).execute()
-            return result.data[0] if result.data else {}
+            }) or {}
+            if user:
+                self.user_cache.set(phone, user)
+            return user
         except Exception as e:
             print(f"Error creating user: {e}")
             # If user already exists, return existing user
             return await self.get_user_by_phone(phone) or {}
 
+    async def get_or_create_user(self, phone: str, name: Optional[str] = None) -> Dict[str, Any]:
+        """Get a user, creating them if needed.
+
+        Repeat callers are served from the identity cache; new callers cost a
+        single upsert that returns the existing or inserted row.
+        """
+        user = self.user_cache.get(phone)
+        if user is not None and (not name or user.get("name") == name):
+            return user
+        
+        # Only send the columns we know, so an existing user's name and
+        # created_at survive the merge
+        row = {"phone": phone}
+        if name:
+            row["name"] = name
+        try:
+            user = await self._call("upsert_user", self.storage.upsert_user, row) or {}
+            if user:
+                self.user_cache.set(phone, user)
+            return user
+        except Exception as e:
+            print(f"Error upserting user: {e}")
+            stale = self.user_cache.get_stale(phone)
+            return self._stale(stale) if stale is not None else {}
+
     async def get_available_slots(self, date: Optional[str] = None) -> List[Dict[str, Any]]:
         """Get available appointment slots - only returns slots that are NOT already booked"""
-        # Hardcoded slot times: 9 AM, 11 AM, 2 PM, 4 PM
-        slot_times = ["09:00", "11:00", "14:00", "16:00"]
-        
         base_date = datetime.now()
         if date:
             try:
                 base_date = datetime.fromisoformat(date.replace("Z", "+00:00"))
-            except:
-                pass
+            except ValueError:
+                raise ValueError(f"Invalid date: {date}. Expected YYYY-MM-DD")
         
-        # Get all booked appointments (confirmed status only)
-        try:
-            booked_result = self.client.table("appointments").select(
-                "appointment_datetime"
-            ).eq("status", "confirmed").execute()
-            
-            # Create a set of booked datetimes for fast lookup
-            booked_datetimes = set()
-            for appointment in booked_result.data or []:
-                booked_datetime = appointment.get("appointment_datetime")
-                if booked_datetime:
-                    # Normalize datetime format to match slot format: YYYY-MM-DDTHH:MM:00
-                    # Handle various formats: "2024-01-01T09:00:00", "2024-01-01T09:00", etc.
-                    if "T" in booked_datetime:
-                        date_part, time_part = booked_datetime.split("T")
-                        # Extract HH:MM from time part (ignore seconds/microseconds/timezone)
-                        time_only = time_part.split(":")[:2]  # Get HH and MM
-                        if len(time_only) == 2:
-                            normalized_dt = f"{date_part}T{time_only[0].zfill(2)}:{time_only[1].zfill(2)}:00"
-                            booked_datetimes.add(normalized_dt)
-        except Exception as e:
-            print(f"Error fetching booked appointments: {e}")
-            booked_datetimes = set()
+        window = [
+            (base_date + timedelta(days=day_offset)).strftime("%Y-%m-%d")
+            for day_offset in range(7)
+        ]
+        return await self._free_slots(window)
+
+    async def get_available_slots_between(self, start: str, end: str) -> List[Dict[str, Any]]:
+        """Free slots on every day from ``start`` to ``end`` (YYYY-MM-DD, inclusive)"""
+        first = datetime.strptime(start, "%Y-%m-%d")
+        days = (datetime.strptime(end, "%Y-%m-%d") - first).days + 1
+        window = [(first + timedelta(days=day_offset)).strftime("%Y-%m-%d") for day_offset in range(max(days, 0))]
+        return await self._free_slots(window)
+
+    async def _free_slots(self, window: List[str]) -> List[Dict[str, Any]]:
+        if not window:
+            return []
+        # Only the requested window is fetched, in one query, and only when the
+        # in-process index doesn't already hold fresh bitmaps for it
+        if not self.slot_index.covers(window):
+            window_end = (datetime.strptime(window[-1], "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+            try:
+                booked = await self._call(
+                    "booked_slots",
+                    self.storage.booked_slots,
+                    f"{window[0]}T00:00:00",
+                    f"{window_end}T00:00:00",
+                    idempotent=True,
+                )
+                self.slot_index.load(window, booked)
+            except Exception as e:
+                print(f"Error fetching booked appointments: {e}")
+                if self.slot_index.known(window):
+                    # Expired bitmaps are still a better answer than "all free"
+                    self.resilience.counters["stale_fallback"] += 1
         
-        # Generate all possible slots for next 7 days
-        all_slots = []
-        for day_offset in range(7):
-            slot_date = base_date + timedelta(days=day_offset)
-            date_str = slot_date.strftime("%Y-%m-%d")
-            
-            # Add slots: 9 AM, 11 AM, 2 PM, 4 PM
-            for time_str in slot_times:
-                datetime_str = f"{date_str}T{time_str}:00"
-                all_slots.append({
+        # Filter out booked slots - only return available ones
+        available_slots = []
+        for date_str in window:
+            for time_str in self.slot_index.free_times(date_str):
+                available_slots.append({
                     "date": date_str,
                     "time": time_str,
-                    "datetime": datetime_str,
+                    "datetime": f"{date_str}T{time_str}:00",
                 })
         
-        # Filter out booked slots - only return available ones
-        available_slots = [
-            slot for slot in all_slots 
-            if slot["datetime"] not in booked_datetimes
-        ]
-        
         return available_slots
 
     async def book_appointment(
@@ -120,75 +236,121 @@ class Database:
     ) -> Dict[str, Any]:
         """Book an appointment - only allows booking available slots"""
         try:
-            # Normalize time format (ensure HH:MM format)
-            if ":" not in time:
-                raise ValueError("Invalid time format. Expected HH:MM")
-            
-            time_parts = time.split(":")
-            if len(time_parts) != 2:
-                raise ValueError("Invalid time format. Expected HH:MM")
-            
-            # Ensure time is in HH:MM format
-            hour, minute = time_parts[0].zfill(2), time_parts[1].zfill(2)
-            normalized_time = f"{hour}:{minute}"
+            normalized_time = _normalize_slot_time(time)
             datetime_str = f"{date}T{normalized_time}:00"
             
-            # Check if slot is already booked (double-check for race conditions)
-            existing = self.client.table("appointments").select("*").eq(
-                "appointment_datetime", datetime_str
-            ).eq("status", "confirmed").execute()
+            # Check-and-insert in one atomic round trip, enforced by the
+            # partial unique index on confirmed slots
+            appointment = await self._call(
+                "book_slot", self.storage.book_slot, user_phone, date, normalized_time, notes
+            )
             
-            if existing.data:
-                raise ValueError(f"Slot already booked for {date} at {normalized_time}")
+            if not appointment:
+                self.slot_index.mark(datetime_str)
+                raise SlotConflictError(date, normalized_time)
             
-            # Verify this is a valid slot time (9 AM, 11 AM, 2 PM, 4 PM)
-            valid_times = ["09:00", "11:00", "14:00", "16:00"]
-            if normalized_time not in valid_times:
-                raise ValueError(f"Invalid time slot. Available times are: {', '.join(valid_times)}")
-            
-            # Create appointment
-            result = self.client.table("appointments").insert({
-                "user_phone": user_phone,
-                "appointment_date": date,
-                "appointment_time": normalized_time,
-                "appointment_datetime": datetime_str,
-                "status": "confirmed",
-                "notes": notes,
-                "created_at": datetime.now().isoformat(),
-            }).execute()
-            
-            return result.data[0] if result.data else {}
+            self._invalidate_appointments(user_phone)
+            self.slot_index.mark(datetime_str, appointment.get("id"))
+            return appointment
         except Exception as e:
             print(f"Error booking appointment: {e}")
             raise
 
+    async def book_appointments(
+        self,
+        user_phone: str,
+        occurrences: List[Tuple[str, str]],
+        notes: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Book several (date, time) slots at once, e.g. a weekly series.
+
+        Slots the index already knows are taken are skipped; the rest go to the
+        database as one conflict-aware bulk insert. Returns one entry per
+        occurrence, in order, with status "booked" (plus the appointment),
+        "conflict" or "invalid" (plus an error).
+        """
+        results: List[Dict[str, Any]] = []
+        to_insert: List[Tuple[str, str]] = []
+        for date, time in occurrences:
+            try:
+                normalized_time = _normalize_slot_time(time)
+            except ValueError as e:
+                results.append({"date": date, "time": time, "status": "invalid", "error": str(e)})
+                continue
+            entry = {"date": date, "time": normalized_time}
+            if (date, normalized_time) in to_insert or self.slot_index.is_booked(date, normalized_time):
+                entry["status"] = "conflict"
+            else:
+                to_insert.append((date, normalized_time))
+            results.append(entry)
+
+        inserted: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        if to_insert:
+            try:
+                rows = await self._call("book_slots", self.storage.book_slots, user_phone, to_insert, notes)
+            except Exception as e:
+                print(f"Error booking appointments: {e}")
+                raise
+            for row in rows:
+                parts = split_datetime(str(row.get("appointment_datetime")))
+                if parts:
+                    inserted[parts] = row
+            if rows:
+                self._invalidate_appointments(user_phone)
+
+        for entry in results:
+            if "status" in entry:
+                continue
+            slot = (entry["date"], entry["time"])
+            datetime_str = f"{slot[0]}T{slot[1]}:00"
+            appointment = inserted.get(slot)
+            if appointment:
+                entry["status"] = "booked"
+                entry["appointment"] = appointment
+                self.slot_index.mark(datetime_str, appointment.get("id"))
+            else:
+                # Taken by someone else between our index and the insert
+                entry["status"] = "conflict"
+                self.slot_index.mark(datetime_str)
+        return results
+
     async def get_user_appointments(
         self,
         user_phone: str,
         status: Optional[str] = None,
     ) -> List[Dict[str, Any]]:
-        """Get user's appointments"""
+        """Get user's appointments (read-through cached per phone and status)"""
+        cache_key = (user_phone, status)
+        cached = self.appointments_cache.get(cache_key)
+        if cached is not None:
+            return list(cached)
         try:
-            query = self.client.table("appointments").select("*").eq("user_phone", user_phone)
-            
-            if status:
-                query = query.eq("status", status)
-            
-            result = query.order("appointment_datetime", desc=True).execute()
-            return result.data or []
+            appointments = await self._call(
+                "list_appointments", self.storage.list_appointments, user_phone, status, idempotent=True
+            )
+            self.appointments_cache.set(cache_key, appointments)
+            return list(appointments)
         except Exception as e:
             print(f"Error getting appointments: {e}")
-            return []
+            stale = self.appointments_cache.get_stale(cache_key)
+            return list(self._stale(stale)) if stale is not None else []
 
     async def cancel_appointment(self, appointment_id: str) -> Dict[str, Any]:
-        """Cancel an appointment"""
+        """Cancel an appointment; an already-cancelled one is returned unchanged"""
         try:
-            result = self.client.table("appointments").update({
+            # Only a confirmed appointment holds its slot, so only that change frees it;
+            # a repeat cancel must not clear a slot someone has since rebooked
+            appointment = await self._call("update_appointment", self.storage.update_appointment, appointment_id, {
                 "status": "cancelled",
                 "updated_at": datetime.now().isoformat(),
-            }).eq("id", appointment_id).execute()
-            
-            return result.data[0] if result.data else {}
+            }, "confirmed")
+            if appointment:
+                self.slot_index.clear(appointment_id, appointment.get("appointment_datetime"))
+                self._invalidate_appointments(appointment.get("user_phone"))
+                return appointment
+            return await self._call(
+                "get_appointment", self.storage.get_appointment, appointment_id, idempotent=True
+            ) or {}
         except Exception as e:
             print(f"Error cancelling appointment: {e}")
             raise
@@ -200,41 +362,120 @@ class Database:
         time: Optional[str] = None,
         notes: Optional[str] = None,
     ) -> Dict[str, Any]:
-        """Modify an appointment"""
+        """Modify an appointment; a new date or time alone is combined with the stored slot"""
         try:
             update_data = {"updated_at": datetime.now().isoformat()}
             
-            if date:
+            datetime_str = None
+            if date or time:
+                if not (date and time):
+                    existing = await self._call(
+                        "get_appointment", self.storage.get_appointment, appointment_id, idempotent=True
+                    )
+                    current = split_datetime(str(existing.get("appointment_datetime") or "")) if existing else None
+                    if current is None:
+                        return {}
+                    date = date or current[0]
+                    time = time or current[1]
+                time = _normalize_slot_time(time)
+                datetime_str = f"{date}T{time}:00"
                 update_data["appointment_date"] = date
-            if time:
                 update_data["appointment_time"] = time
-            if date or time:
-                update_data["appointment_datetime"] = f"{date or ''}T{time or ''}:00"
+                update_data["appointment_datetime"] = datetime_str
             if notes is not None:
                 update_data["notes"] = notes
             
-            result = self.client.table("appointments").update(update_data).eq(
-                "id", appointment_id
-            ).execute()
-            
-            return result.data[0] if result.data else {}
+            try:
+                # A move is checked by the same partial unique index as a booking
+                appointment = await self._call(
+                    "update_appointment", self.storage.update_appointment, appointment_id, update_data
+                ) or {}
+            except SlotTakenError:
+                self.slot_index.mark(datetime_str)
+                raise SlotConflictError(date, time) from None
+            if appointment:
+                self._invalidate_appointments(appointment.get("user_phone"))
+            if appointment and datetime_str:
+                # The old slot is only known if we've seen this appointment before
+                if not self.slot_index.clear(appointment_id):
+                    self.slot_index.invalidate()
+                if appointment.get("status") == "confirmed":
+                    self.slot_index.mark(datetime_str, appointment_id)
+            return appointment
         except Exception as e:
             print(f"Error modifying appointment: {e}")
             raise
 
-    async def save_conversation_summary(
+    async def _insert_rows(self, table: str, rows: List[Dict[str, Any]]):
+        """Bulk insert used by the write-behind queue"""
+        columns = JSON_TEXT_COLUMNS.get(table)
+        if columns:
+            # Decoded here, in the flusher, rather than in the session's event handlers
+            rows = [
+                {key: _decode_json_text(value) if key in columns else value for key, value in row.items()}
+                for row in rows
+            ]
+        await self._call("insert_rows", self.storage.insert_rows, table, rows)
+
+    def _invalidate_appointments(self, user_phone: Optional[str]):
+        """Drop cached appointment lists after a mutation"""
+        if not user_phone:
+            # Can't tell whose list changed, so nothing cached can be trusted
+            self.appointments_cache.clear()
+            return
+        for status in APPOINTMENT_STATUSES:
+            self.appointments_cache.pop((user_phone, status))
+
+    def warm(self):
+        """Open backend connections before the first session needs them"""
+        try:
+            self.storage.warm()
+        except Exception as e:
+            print(f"Error warming database connections: {e}")
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for the in-process caches"""
+        return {
+            "users": self.user_cache.stats(),
+            "appointments": self.appointments_cache.stats(),
+        }
+
+    def resilience_stats(self) -> Dict[str, Any]:
+        """How often hedging, timeouts, the breaker and stale fallbacks fired"""
+        return self.resilience.stats()
+
+    def save_conversation_summary(
         self,
         user_phone: str,
         summary: Dict[str, Any],
         tool_calls: List[Dict[str, Any]],
     ):
-        """Save conversation summary"""
-        try:
-            self.client.table("conversation_summaries").insert({
-                "user_phone": user_phone,
-                "summary": summary,
-                "tool_calls": tool_calls,
-                "created_at": datetime.now().isoformat(),
-            }).execute()
-        except Exception as e:
-            print(f"Error saving summary: {e}")
+        """Queue a conversation summary for the next batched insert"""
+        self.write_queue.enqueue("conversation_summaries", {
+            "user_phone": user_phone,
+            "summary": summary,
+            "tool_calls": tool_calls,
+            "created_at": datetime.now().isoformat(),
+        })
+
+    def log_tool_call(
+        self,
+        room: str,
+        user_phone: Optional[str],
+        name: str,
+        args: Any,
+        result: Any,
+    ):
+        """Queue an audit row for an executed tool call.
+
+        args and result may be the JSON strings the LLM produced; they are
+        stored as objects.
+        """
+        self.write_queue.enqueue("tool_call_logs", {
+            "room": room,
+            "user_phone": user_phone,
+            "tool_name": name,
+            "args": args,
+            "result": result,
+            "created_at": datetime.now().isoformat(),
+        })
@@ -0,0 +1,269 @@
+"""
+Deterministic resolution of spoken dates, times and dayparts
+"""
+import re
+from datetime import date as date_type
+from datetime import datetime, timedelta
+from typing import FrozenSet, List, NamedTuple, Optional, Tuple
+
+from dateutil import parser as date_parser
+from dateutil.relativedelta import relativedelta, weekday as relative_weekday
+from dateutil.relativedelta import MO, TU, WE, TH, FR, SA, SU
+
+from slot_index import SLOT_TIMES
+
+# Half-open HH:MM ranges each daypart covers
+DAYPARTS = {
+    "morning": ("00:00", "12:00"),
+    "afternoon": ("12:00", "17:00"),
+    "evening": ("17:00", "24:00"),
+}
+
+_WEEKDAYS = {
+    "monday": MO, "mon": MO,
+    "tuesday": TU, "tue": TU, "tues": TU,
+    "wednesday": WE, "wed": WE,
+    "thursday": TH, "thu": TH, "thur": TH, "thurs": TH,
+    "friday": FR, "fri": FR,
+    "saturday": SA, "sat": SA,
+    "sunday": SU, "sun": SU,
+}
+_NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10,
+}
+_MONTH_NAMES = re.compile(
+    r"\b(jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\b"
+)
+_ISO_DATE = re.compile(r"\b(\d{4}-\d{1,2}-\d{1,2})\b")
+# "the 9th", "the 9", "9th"; a bare "9" is an hour, not a day of the month
+_DAY_OF_MONTH = re.compile(r"(?:on\s+)?(?:the\s+(\d{1,2})(?:st|nd|rd|th)?|(\d{1,2})(?:st|nd|rd|th))")
+_BARE_NUMBER = re.compile(r"(?:on\s+)?\d{1,2}")
+_RELATIVE = re.compile(r"\bin\s+(\d+|[a-z]+)\s+(day|week)s?\b")
+_WEEKDAY = re.compile(r"\b(?:(this|next|coming)\s+)?(" + "|".join(_WEEKDAYS) + r")\b")
+_TIME = re.compile(
+    r"\b(?:at\s+)?(\d{1,2})(?::(\d{2}))?\s*(a\.?m\.?|p\.?m\.?|o'?clock)?(?=\s|$|[,.;!?])"
+)
+_FILLER = re.compile(r"\b(on|at|the|for|of|around|about|please|any|time|slot|slots|sometime)\b")
+
+
+class DateParseError(ValueError):
+    """The text could not be resolved to a date or time"""
+
+
+class When(NamedTuple):
+    """A resolved request: a date (None = no date given) and the slot times it allows.
+
+    end is the last day when the text names a week or weekend, else None.
+    """
+
+    date: Optional[date_type]
+    times: Optional[List[str]]
+    daypart: Optional[str] = None
+    end: Optional[date_type] = None
+
+
+def _today(today: Optional[date_type]) -> date_type:
+    return today or datetime.now().date()
+
+
+def _count(token: str) -> Optional[int]:
+    return int(token) if token.isdigit() else _NUMBER_WORDS.get(token)
+
+
+def _day(day: date_type) -> Tuple[date_type, date_type]:
+    return day, day
+
+
+def _next_day_of_month(today: date_type, day: int) -> date_type:
+    """The first date on or after today that falls on ``day`` of its month"""
+    first = today.replace(day=1)
+    for offset in range(13):
+        month = first + relativedelta(months=offset)
+        try:
+            candidate = month.replace(day=day)
+        except ValueError:
+            continue  # e.g. the 31st in a 30-day month
+        if candidate >= today:
+            return candidate
+    raise DateParseError(f"Invalid day of the month: {day}")
+
+
+def resolve_date(text: str, today: Optional[date_type] = None) -> date_type:
+    """Resolve "2024-05-07", "tomorrow", "next Tuesday", "in 3 days", "May 7th", ...
+
+    Weekday names ("Tuesday", "this/next Tuesday") mean the next such day after
+    today. Dates without a year that have already passed roll over to next year;
+    a bare day of the month ("the 5th") rolls over to next month. A week or
+    weekend resolves to its first day (see resolve_range).
+    """
+    return resolve_range(text, today)[0]
+
+
+def resolve_range(text: str, today: Optional[date_type] = None) -> Tuple[date_type, date_type]:
+    """Resolve text to its first and last day (inclusive); the same day unless it names a week or weekend.
+
+    "this week" runs from today to Sunday, "next week" from next Monday to
+    Sunday, and "this/next weekend" is the coming Saturday and Sunday (the
+    rest of it when today is already the weekend, for "weekend"/"this weekend").
+    """
+    today = _today(today)
+    phrase = text.strip().lower()
+    if not phrase:
+        raise DateParseError("Empty date")
+
+    iso = _ISO_DATE.search(phrase)
+    if iso:
+        try:
+            return _day(date_type.fromisoformat("-".join(part.zfill(2) for part in iso.group(1).split("-"))))
+        except ValueError:
+            raise DateParseError(f"Invalid date: {iso.group(1)}")
+
+    if "day after tomorrow" in phrase:
+        return _day(today + timedelta(days=2))
+    if re.search(r"\btomorrow\b", phrase):
+        return _day(today + timedelta(days=1))
+    if re.search(r"\b(today|tonight)\b", phrase):
+        return _day(today)
+
+    relative = _RELATIVE.search(phrase)
+    if relative and _count(relative.group(1)) is not None:
+        amount = _count(relative.group(1))
+        return _day(today + timedelta(days=amount * (7 if relative.group(2) == "week" else 1)))
+
+    weekday = _WEEKDAY.search(phrase)
+    if weekday:
+        target: relative_weekday = _WEEKDAYS[weekday.group(2)]
+        return _day(today + relativedelta(days=1, weekday=target(+1)))
+
+    if re.search(r"\bthis week\b", phrase):
+        return today, today + relativedelta(weekday=SU(+1))
+    if re.search(r"\bnext week\b", phrase):
+        monday = today + relativedelta(days=1, weekday=MO(+1))
+        return monday, monday + timedelta(days=6)
+    weekend = re.search(r"\b(this |next )?weekend\b", phrase)
+    if weekend:
+        if today.weekday() >= 5 and weekend.group(1) != "next ":
+            first = today
+        else:
+            first = today + relativedelta(days=1, weekday=SA(+1))
+        return first, first + relativedelta(weekday=SU(+1))
+
+    day_of_month = _DAY_OF_MONTH.fullmatch(phrase)
+    if day_of_month:
+        day = int(day_of_month.group(1) or day_of_month.group(2))
+        if not 1 <= day <= 31:
+            raise DateParseError(f"Invalid day of the month: {day}")
+        return _day(_next_day_of_month(today, day))
+
+    if _BARE_NUMBER.fullmatch(phrase):
+        raise DateParseError(f"Could not tell whether '{text}' is a day or a time; say e.g. 'the 9th' or '9am'")
+
+    # Absolute dates like "May 7", "7th of May", "5/7"; fuzzy parsing would turn
+    # unrelated words into today's date, so require a month name or a number
+    if _MONTH_NAMES.search(phrase) or re.search(r"\d", phrase):
+        default = datetime(today.year, today.month, today.day)
+        try:
+            parsed = date_parser.parse(phrase, fuzzy=True, default=default).date()
+        except (ValueError, OverflowError):
+            raise DateParseError(f"Could not understand the date '{text}'")
+        if parsed < today and not re.search(r"\b\d{4}\b", phrase):
+            parsed += relativedelta(years=1)
+        return _day(parsed)
+
+    raise DateParseError(f"Could not understand the date '{text}'")
+
+
+def parse_weekdays(text: str) -> FrozenSet[int]:
+    """Parse "tuesday, thu and Fri" into {1, 3, 4} (datetime.weekday() numbers); "weekdays" is Mon-Fri"""
+    phrase = text.strip().lower()
+    days = set()
+    if re.search(r"\bweekdays\b", phrase):
+        days.update(range(5))
+    if re.search(r"\bweekends?\b", phrase):
+        days.update((5, 6))
+    for token in re.findall(r"[a-z]+", phrase):
+        if token.rstrip("s") in _WEEKDAYS:
+            token = token.rstrip("s")
+        if token in _WEEKDAYS:
+            days.add(_WEEKDAYS[token].weekday)
+    if not days:
+        raise DateParseError(f"Could not understand the weekdays '{text}'")
+    return frozenset(days)
+
+
+def _match_time(phrase: str, daypart: Optional[str]) -> Optional[Tuple[str, Tuple[int, int]]]:
+    """First clock time in ``phrase`` as (HH:MM, span of the matched text)"""
+    noon = re.search(r"\b(noon|midday)\b", phrase)
+    if noon:
+        return "12:00", noon.span()
+    for match in _TIME.finditer(phrase):
+        hour_text, minute_text, suffix = match.groups()
+        # A bare number is a day of the month ("the 21st" never matches; "21" might)
+        if not minute_text and not suffix and not match.group(0).startswith("at"):
+            continue
+        hour, minute = int(hour_text), int(minute_text or 0)
+        if hour > 23 or minute > 59:
+            continue
+        suffix = (suffix or "").replace(".", "")
+        if suffix == "pm" or (not suffix.startswith("a") and daypart in ("afternoon", "evening")):
+            if hour < 12:
+                hour += 12
+        elif suffix == "am" and hour == 12:
+            hour = 0
+        elif not suffix.startswith("a") and not daypart and 1 <= hour <= 7:
+            # "at 2" during business hours means 2 PM
+            hour += 12
+        return f"{hour:02d}:{minute:02d}", match.span()
+    return None
+
+
+def resolve_time(text: str) -> str:
+    """Resolve "14:00", "2pm", "2:30 p.m.", "2 in the afternoon", "noon" to HH:MM"""
+    phrase = text.strip().lower()
+    daypart = next((name for name in DAYPARTS if name in phrase), None)
+    if re.match(r"\d{1,2}\b", phrase):
+        # On its own, a leading number is the hour ("2", "2 in the afternoon")
+        phrase = f"at {phrase}"
+    resolved = _match_time(phrase, daypart)
+    if resolved is None:
+        raise DateParseError(f"Could not understand the time '{text}'")
+    return resolved[0]
+
+
+def parse_when(text: Optional[str], today: Optional[date_type] = None) -> When:
+    """Resolve a free-form request like "next Tuesday afternoon" or "tomorrow at 2pm".
+
+    Returns the date (None if the text only names a daypart or time), the
+    SLOT_TIMES it allows (None = any time) and, for a week or weekend, its last day.
+    """
+    if not text or not text.strip():
+        return When(None, None)
+    phrase = text.strip().lower()
+
+    daypart = next((name for name in DAYPARTS if re.search(rf"\b{name}s?\b", phrase)), None)
+    times: Optional[List[str]] = None
+    if daypart:
+        start, end = DAYPARTS[daypart]
+        times = [slot for slot in SLOT_TIMES if start <= slot < end]
+        # "this afternoon" is today's afternoon
+        phrase = re.sub(rf"\bthis\s+{daypart}s?\b", " today ", phrase)
+        phrase = re.sub(rf"\b(in the\s+)?{daypart}s?\b", " ", phrase)
+
+    # "the 9" is a day of the month; keep it one once the filler "the" is dropped
+    phrase = re.sub(r"\bthe\s+(\d{1,2})\b(?![:.]\d)", r"\1th", phrase)
+    if re.fullmatch(r"\d{1,2}", phrase.strip()):
+        # On its own, a number is the hour ("9", "9 in the evening"), as in resolve_time
+        phrase = f"at {phrase.strip()}"
+
+    exact = _match_time(phrase, daypart)
+    if exact:
+        times = [exact[0]]
+        start, end = exact[1]
+        phrase = f"{phrase[:start]} {phrase[end:]}"
+
+    remainder = _FILLER.sub(" ", phrase).strip(" ,.")
+    if not remainder:
+        return When(None, times, daypart)
+    start, end = resolve_range(remainder, today)
+    return When(start, times, daypart, end if end != start else None)
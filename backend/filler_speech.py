@@ -0,0 +1,137 @@
+"""
+Filler speech that masks slow tool calls, and a dead-air measurement per turn
+"""
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+from livekit import rtc
+from livekit.agents import RunContext, tts
+from livekit.agents.voice import AgentSession, SpeechHandle
+
+from tts_cache import register_phrases
+
+logger = logging.getLogger(__name__)
+
+FILLER_ENABLED = os.getenv("FILLER_ENABLED", "true").lower() == "true"
+# Seconds of silence during a tool call before a filler phrase is spoken
+FILLER_DELAY = float(os.getenv("FILLER_DELAY", "0.4"))
+FILLER_PHRASES = [
+    phrase.strip()
+    for phrase in os.getenv(
+        "FILLER_PHRASES",
+        "Let me check that for you.|One moment.|Just a second while I look that up.",
+    ).split("|")
+    if phrase.strip()
+]
+register_phrases(FILLER_PHRASES)
+
+# Process-wide: fillers spoken, and fillers cut off because the result arrived
+FILLER_STATS = {"played": 0, "interrupted": 0}
+
+# phrase -> synthesized frames, shared by every session in the worker
+_FILLER_AUDIO: Dict[str, List[rtc.AudioFrame]] = {}
+
+
+async def warm_filler_audio(tts_engine: tts.TTS) -> None:
+    """Synthesize the filler phrases once per process so playing one costs no TTS round trip"""
+    for phrase in FILLER_PHRASES:
+        if phrase in _FILLER_AUDIO:
+            continue
+        try:
+            frames = []
+            async with tts_engine.synthesize(phrase) as stream:
+                async for audio in stream:
+                    frames.append(audio.frame)
+            _FILLER_AUDIO[phrase] = frames
+        except Exception as e:
+            logger.warning(f"Could not pre-synthesize filler '{phrase}': {e}")
+
+
+async def _replay(frames: List[rtc.AudioFrame]):
+    for frame in frames:
+        yield frame
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[round((len(ordered) - 1) * pct)]
+
+
+class FillerSpeech:
+    """Speaks a short cached phrase when tool calls leave the user in silence.
+
+    Also measures dead air: for every turn that runs tools, the time from the
+    first tool starting until the agent is audible again (filler or answer).
+    """
+
+    def __init__(self, session: AgentSession):
+        self.session = session
+        self.dead_air: List[float] = []
+        self._agent_state: Optional[str] = None
+        self._silence_started: Optional[float] = None
+        self._active = 0
+        self._handles: List[SpeechHandle] = []
+        self._next_phrase = 0
+        session.on("agent_state_changed", self._on_agent_state)
+
+    def _on_agent_state(self, ev) -> None:
+        self._agent_state = ev.new_state
+        if ev.new_state == "speaking" and self._silence_started is not None:
+            self.dead_air.append(time.monotonic() - self._silence_started)
+            self._silence_started = None
+
+    def _say_filler(self, step: int) -> Optional[SpeechHandle]:
+        if self._handles:
+            # One filler per turn, even with several tools in flight
+            return None
+        phrase = FILLER_PHRASES[self._next_phrase % len(FILLER_PHRASES)]
+        self._next_phrase += 1
+        options = {
+            "allow_interruptions": True,
+            # The model shouldn't see (or imitate) the filler
+            "add_to_chat_ctx": False,
+        }
+        frames = _FILLER_AUDIO.get(phrase)
+        if frames:
+            options["audio"] = _replay(frames)
+        handle = self.session.say(phrase, **options)
+        self._handles.append(handle)
+        FILLER_STATS["played"] += 1
+        return handle
+
+    @asynccontextmanager
+    async def masking(self, context: Optional[RunContext]):
+        """Wrap a tool call: speak a filler if it runs past FILLER_DELAY, stop it when done"""
+        if self._silence_started is None and self._agent_state != "speaking":
+            self._silence_started = time.monotonic()
+        if context is None or not FILLER_ENABLED or not FILLER_PHRASES:
+            yield
+            return
+
+        self._active += 1
+        try:
+            async with context.with_filler(self._say_filler, delay=FILLER_DELAY):
+                yield
+        finally:
+            self._active -= 1
+            if self._active == 0:
+                # The result is in; don't make the user sit through the rest of the filler
+                for handle in self._handles:
+                    if not handle.done():
+                        handle.interrupt()
+                        FILLER_STATS["interrupted"] += 1
+                self._handles.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """Dead air per tool turn for this session, in milliseconds"""
+        if not self.dead_air:
+            return {}
+        return {
+            "turns": len(self.dead_air),
+            "p50_ms": round(_percentile(self.dead_air, 0.5) * 1000),
+            "p95_ms": round(_percentile(self.dead_air, 0.95) * 1000),
+            "max_ms": round(max(self.dead_air) * 1000),
+        }
@@ -0,0 +1,170 @@
+"""
+Pre-rendered greeting, played on its own track as soon as the caller's audio is subscribed
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Optional, Tuple
+
+from livekit import rtc
+from livekit.agents import tts
+
+from tts_cache import CachedTTS, cache_key, normalize_text, register_phrases
+
+logger = logging.getLogger(__name__)
+
+GREETING_ENABLED = os.getenv("GREETING_ENABLED", "true").lower() == "true"
+GREETING_TEXT = os.getenv(
+    "GREETING_TEXT",
+    "Hi, thanks for calling! I can book, change or cancel an appointment for you. What's your phone number?",
+)
+if GREETING_ENABLED:
+    register_phrases([GREETING_TEXT])
+
+# Process-wide: greetings played, cut off by the caller, and where their audio came from
+GREETING_STATS = {"played": 0, "interrupted": 0, "from_prewarm": 0, "from_tts": 0}
+
+# 10 ms frames, like the framework's own audio output
+_FRAME_MS = 10
+
+
+def load_greeting(engine: tts.TTS) -> Optional[bytes]:
+    """The greeting's PCM from the TTS cache's disk store, if any process has rendered it before.
+
+    Called from prewarm, where there is no event loop; None means the job
+    renders it (and the cache keeps it for the next process).
+    """
+    if not GREETING_ENABLED or not isinstance(engine, CachedTTS):
+        return None
+    return engine.cache.load(cache_key(engine.wrapped, normalize_text(GREETING_TEXT)))
+
+
+class Greeting:
+    """Plays GREETING_TEXT once per session on a dedicated audio track.
+
+    play() returns immediately; the audio is published from a task so it runs
+    alongside the rest of session setup (LLM, avatar, session.start). Without
+    pre-rendered audio the greeting is synthesized with the attached TTS.
+    stop() cuts it off, e.g. when the caller starts talking.
+    """
+
+    def __init__(self, room: rtc.Room, audio: Optional[bytes], job_started: float):
+        self.room = room
+        self.audio = audio
+        self.job_started = job_started
+        # Set by play() and by the first frame, for time-to-first-audio
+        self.triggered_at: Optional[float] = None
+        self.first_audio_at: Optional[float] = None
+        self._engine: Optional[tts.TTS] = None
+        self._engine_ready = asyncio.Event()
+        self._published: Optional[asyncio.Task] = None
+        self._task: Optional[asyncio.Task] = None
+        self._source: Optional[rtc.AudioSource] = None
+        self._stopped = False
+
+    def attach(self, engine: tts.TTS) -> None:
+        """The session's TTS: the greeting's audio format, and its renderer if it wasn't loaded at prewarm"""
+        self._engine = engine
+        self._engine_ready.set()
+
+    def publish(self) -> None:
+        """Publish the (silent) greeting track now, so play() doesn't wait for the round trip"""
+        if GREETING_ENABLED and self._published is None:
+            self._published = asyncio.create_task(self._publish())
+
+    def play(self) -> None:
+        if not GREETING_ENABLED or self._task is not None:
+            return
+        self.triggered_at = time.monotonic()
+        self.publish()
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None and not self._task.done() and not self._stopped:
+            self._stopped = True
+            GREETING_STATS["interrupted"] += 1
+            if self._source is not None:
+                # Drop what is queued; this also ends wait_for_playout()
+                self._source.clear_queue()
+
+    async def _publish(self) -> Tuple[rtc.AudioSource, rtc.LocalTrackPublication]:
+        # Attached before connecting when prewarmed, otherwise once the job builds its TTS;
+        # the greeting was rendered by (and cached for) this TTS, so it has the same format
+        await self._engine_ready.wait()
+        source = rtc.AudioSource(self._engine.sample_rate, self._engine.num_channels)
+        track = rtc.LocalAudioTrack.create_audio_track("greeting", source)
+        try:
+            publication = await self.room.local_participant.publish_track(
+                track, rtc.TrackPublishOptions(source=rtc.TrackSource.SOURCE_MICROPHONE)
+            )
+        except Exception:
+            await source.aclose()
+            raise
+        return source, publication
+
+    async def _render(self) -> bytes:
+        chunks = []
+        async with self._engine.synthesize(GREETING_TEXT) as stream:
+            async for audio in stream:
+                chunks.append(audio.frame.data.tobytes())
+        return b"".join(chunks)
+
+    async def _run(self) -> None:
+        prerendered = self.audio is not None
+        try:
+            source, _ = await self._published
+            pcm = self.audio if prerendered else await self._render()
+        except Exception as e:
+            logger.warning(f"Could not prepare the greeting: {e}")
+            return
+        if self._stopped or not pcm:
+            return
+        GREETING_STATS["from_prewarm" if prerendered else "from_tts"] += 1
+        GREETING_STATS["played"] += 1
+
+        self._source = source
+        sample_rate, num_channels = source.sample_rate, source.num_channels
+        frame_bytes = sample_rate * _FRAME_MS // 1000 * num_channels * 2
+        try:
+            for offset in range(0, len(pcm), frame_bytes):
+                if self._stopped:
+                    break
+                data = pcm[offset:offset + frame_bytes]
+                await source.capture_frame(
+                    rtc.AudioFrame(data, sample_rate, num_channels, len(data) // (2 * num_channels))
+                )
+                if self.first_audio_at is None:
+                    self._log_first_audio(prerendered)
+            else:
+                await source.wait_for_playout()
+        except Exception as e:
+            logger.warning(f"Greeting playback failed: {e}")
+        finally:
+            self._source = None
+            await self.close()
+
+    async def close(self) -> None:
+        """Unpublish the greeting track; called when the greeting ends and at session end"""
+        published, self._published = self._published, None
+        if published is None:
+            return
+        if not published.done():
+            published.cancel()
+        try:
+            source, publication = await published
+        except (asyncio.CancelledError, Exception):
+            return
+        try:
+            await self.room.local_participant.unpublish_track(publication.sid)
+        except Exception as e:
+            logger.warning(f"Could not unpublish the greeting track: {e}")
+        await source.aclose()
+
+    def _log_first_audio(self, prerendered: bool) -> None:
+        self.first_audio_at = time.monotonic()
+        logger.info(
+            f"Job accept to first audio: {(self.first_audio_at - self.job_started) * 1000:.0f} ms "
+            f"(greeting, prerendered={prerendered}, "
+            f"{(self.first_audio_at - self.triggered_at) * 1000:.0f} ms after the caller's track was subscribed)"
+        )
@@ -0,0 +1,148 @@
+"""
+Shared, pooled HTTP transport for Supabase with per-request timing
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() == "true"
+
+
+class _RequestTrace:
+    """httpcore trace callback collecting stage timestamps for one request"""
+
+    def __init__(self):
+        self.events: Dict[str, float] = {}
+
+    def __call__(self, name: str, info: Dict[str, Any]) -> None:
+        # e.g. "connection.connect_tcp.started", "http11.receive_response_headers.complete"
+        self.events[name] = time.perf_counter()
+
+    def _span(self, stage: str) -> float:
+        started = self.events.get(f"{stage}.started")
+        completed = self.events.get(f"{stage}.complete")
+        if started is None or completed is None:
+            return 0.0
+        return (completed - started) * 1000
+
+    @property
+    def reused(self) -> bool:
+        return "connection.connect_tcp.started" not in self.events
+
+    @property
+    def connect_ms(self) -> float:
+        """TCP connect plus TLS handshake; 0 on a reused connection"""
+        return self._span("connection.connect_tcp") + self._span("connection.start_tls")
+
+    @property
+    def ttfb_ms(self) -> float:
+        """From sending request headers to receiving response headers"""
+        for protocol in ("http11", "http2"):
+            sent = self.events.get(f"{protocol}.send_request_headers.started")
+            received = self.events.get(f"{protocol}.receive_response_headers.complete")
+            if sent is not None and received is not None:
+                return (received - sent) * 1000
+        return 0.0
+
+
+class TransportStats:
+    """Connection reuse and connect/TTFB timings across all pooled requests"""
+
+    def __init__(self, window: int = 500):
+        self._lock = threading.Lock()
+        self._connect_ms: Deque[float] = deque(maxlen=window)
+        self._ttfb_ms: Deque[float] = deque(maxlen=window)
+        self.requests = 0
+        self.new_connections = 0
+        self.errors = 0
+
+    def record(self, trace: _RequestTrace) -> None:
+        with self._lock:
+            self.requests += 1
+            if not trace.reused:
+                self.new_connections += 1
+                self._connect_ms.append(trace.connect_ms)
+            self._ttfb_ms.append(trace.ttfb_ms)
+
+    def record_error(self) -> None:
+        with self._lock:
+            self.errors += 1
+
+    @staticmethod
+    def _percentile(samples, pct: float) -> float:
+        if not samples:
+            return 0.0
+        ordered = sorted(samples)
+        return round(ordered[round((len(ordered) - 1) * pct)], 2)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            reused = self.requests - self.new_connections
+            return {
+                "requests": self.requests,
+                "new_connections": self.new_connections,
+                "reuse_rate": round(reused / self.requests, 3) if self.requests else 0.0,
+                "errors": self.errors,
+                "connect_ms_p50": self._percentile(self._connect_ms, 0.5),
+                "connect_ms_p95": self._percentile(self._connect_ms, 0.95),
+                "ttfb_ms_p50": self._percentile(self._ttfb_ms, 0.5),
+                "ttfb_ms_p95": self._percentile(self._ttfb_ms, 0.95),
+            }
+
+
+class TimedTransport(httpx.HTTPTransport):
+    """HTTPTransport that attaches an httpcore trace to every request"""
+
+    def __init__(self, stats: TransportStats, **kwargs):
+        super().__init__(**kwargs)
+        self.stats = stats
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        trace = _RequestTrace()
+        request.extensions["trace"] = trace
+        try:
+            response = super().handle_request(request)
+        except Exception:
+            self.stats.record_error()
+            raise
+        # Response headers are in by now; the body is read afterwards
+        self.stats.record(trace)
+        logger.debug(
+            f"{request.method} {request.url.path}: "
+            f"{'reused' if trace.reused else f'connect {trace.connect_ms:.1f} ms'}, "
+            f"ttfb {trace.ttfb_ms:.1f} ms"
+        )
+        return response
+
+
+def create_http_client(timeout: float, stats: Optional[TransportStats] = None) -> httpx.Client:
+    """Build the pooled client shared by every Supabase call in this process"""
+    http2 = HTTP2_ENABLED
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            print("HTTP2_ENABLED is set but the h2 package is missing; using HTTP/1.1")
+            http2 = False
+
+    limits = httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+    transport = TimedTransport(stats or TransportStats(), http2=http2, limits=limits)
+    return httpx.Client(
+        transport=transport,
+        timeout=timeout,
+        follow_redirects=True,
+    )
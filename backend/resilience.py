@@ -0,0 +1,206 @@
+"""
+Latency budgets, hedged reads and a circuit breaker for database calls
+"""
+import asyncio
+import os
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+# Budget for everything a single tool call may spend on the database
+TURN_LATENCY_BUDGET = float(os.getenv("TURN_LATENCY_BUDGET", "2.5"))
+# Idempotent reads slower than this op's p95 get a second, racing request
+DB_HEDGE_ENABLED = os.getenv("DB_HEDGE_ENABLED", "true").lower() == "true"
+DB_HEDGE_MIN_SAMPLES = int(os.getenv("DB_HEDGE_MIN_SAMPLES", "20"))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "15"))
+
+_turn_deadline: ContextVar[Optional[float]] = ContextVar("turn_deadline", default=None)
+
+
+class StorageUnavailableError(RuntimeError):
+    """Raised without calling the backend while the circuit breaker is open"""
+
+
+class RejectedError(Exception):
+    """The backend answered but refused the request (e.g. a unique constraint); not a health problem"""
+
+
+class BudgetExhaustedError(TimeoutError):
+    """Raised when the turn's latency budget is already spent"""
+
+
+@contextmanager
+def latency_budget(seconds: float = TURN_LATENCY_BUDGET):
+    """Give every database call inside the block a share of one deadline.
+
+    Nested budgets never extend an outer one.
+    """
+    deadline = time.monotonic() + seconds
+    outer = _turn_deadline.get()
+    token = _turn_deadline.set(deadline if outer is None else min(outer, deadline))
+    try:
+        yield
+    finally:
+        _turn_deadline.reset(token)
+
+
+def call_deadline(default_timeout: float) -> float:
+    """Seconds the next call may take: the per-call timeout, capped by the turn budget"""
+    deadline = _turn_deadline.get()
+    if deadline is None:
+        return default_timeout
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise BudgetExhaustedError("Turn latency budget exhausted")
+    return min(default_timeout, remaining)
+
+
+class LatencyTracker:
+    """Rolling per-operation latency samples"""
+
+    def __init__(self, window: int = 200):
+        self._samples: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=window))
+
+    def record(self, op: str, seconds: float) -> None:
+        self._samples[op].append(seconds)
+
+    def p95(self, op: str, min_samples: int = DB_HEDGE_MIN_SAMPLES) -> Optional[float]:
+        samples = self._samples.get(op)
+        if not samples or len(samples) < min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[round((len(ordered) - 1) * 0.95)]
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive failures.
+
+    While open every call fails fast; after ``reset_timeout`` seconds one trial
+    call is let through (half-open) and its outcome closes or re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURE_THRESHOLD, reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def release_trial(self) -> None:
+        """The half-open trial ended without a verdict (cancelled, or our own budget ran out)"""
+        self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self) -> bool:
+        """Returns True if this failure opened the breaker"""
+        self.failures += 1
+        was_open = self.opened_at is not None
+        self._trial_in_flight = False
+        if was_open or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            return not was_open
+        return False
+
+
+class ResilientCaller:
+    """Runs storage calls under the turn budget, hedging reads and tripping the breaker"""
+
+    def __init__(self):
+        self.breaker = CircuitBreaker()
+        self.latency = LatencyTracker()
+        self.counters: Dict[str, int] = defaultdict(int)
+
+    async def call(
+        self,
+        op: str,
+        fn: Callable[..., Awaitable[Any]],
+        *args,
+        idempotent: bool = False,
+    ) -> Any:
+        self.counters["calls"] += 1
+        trial = self.breaker.state == "half_open"
+        if not self.breaker.allow():
+            self.counters["breaker_fast_fail"] += 1
+            raise StorageUnavailableError("Database temporarily unavailable")
+
+        started = time.monotonic()
+        try:
+            hedge_after = self.latency.p95(op) if idempotent and DB_HEDGE_ENABLED else None
+            if hedge_after is None:
+                result = await fn(*args)
+            else:
+                result = await self._hedged(fn, args, hedge_after)
+        except RejectedError:
+            # The backend is up and said no; don't let normal conflicts open the breaker
+            self.counters["rejected"] += 1
+            self.breaker.record_success()
+            raise
+        except BudgetExhaustedError:
+            # Our own budget ran out; says nothing about backend health
+            self.counters["budget_exhausted"] += 1
+            raise
+        except Exception as e:
+            self.counters["timeouts" if isinstance(e, TimeoutError) else "failures"] += 1
+            if self.breaker.record_failure():
+                self.counters["breaker_opened"] += 1
+            raise
+        finally:
+            # A trial that was cancelled (tool timeout, discarded prefetch) or ran out of
+            # budget leaves the breaker half-open, so the next call gets to be the trial
+            if trial:
+                self.breaker.release_trial()
+
+        self.breaker.record_success()
+        self.latency.record(op, time.monotonic() - started)
+        return result
+
+    async def _hedged(self, fn: Callable[..., Awaitable[Any]], args: tuple, hedge_after: float) -> Any:
+        primary = asyncio.ensure_future(fn(*args))
+        done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+        if done:
+            return primary.result()
+
+        self.counters["hedged"] += 1
+        backup = asyncio.ensure_future(fn(*args))
+        pending = {primary, backup}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            self.counters["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "breaker": self.breaker.state}
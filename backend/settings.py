@@ -0,0 +1,94 @@
+"""
+Agent settings, read from the environment once per process
+"""
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Optional
+
+from dotenv import load_dotenv
+
+# Before any module reads its tunables, so values in .env apply everywhere
+load_dotenv()
+
+REQUIRED_VARS = (
+    "LIVEKIT_URL",
+    "LIVEKIT_API_KEY",
+    "LIVEKIT_API_SECRET",
+    "DEEPGRAM_API_KEY",
+    "CARTESIA_API_KEY",
+    "SUPABASE_URL",
+    "SUPABASE_KEY",
+)
+
+
+def _flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() == "true"
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Everything agent.py and the avatar modules configure from the environment.
+
+    Module-level tunables (database caches, tool timeouts, write-behind, ...)
+    stay next to the code they tune; see backend/README.md.
+    """
+
+    livekit_url: Optional[str]
+    llm_provider: str
+    llm_model: str
+    azure_openai_endpoint: Optional[str]
+    azure_openai_api_key: Optional[str]
+    azure_openai_api_version: str
+    azure_openai_deployment_name: Optional[str]
+    together_api_key: Optional[str]
+    openrouter_api_key: Optional[str]
+    avatar_mode: str
+    avatar_provider: str
+    enable_avatar_video: bool
+    avatar_video_width: int
+    avatar_video_height: int
+    avatar_video_fps: int
+    tavus_api_key: Optional[str]
+    tavus_replica_id: Optional[str]
+    tavus_persona_id: Optional[str]
+    bey_api_key: Optional[str]
+    bey_avatar_id: Optional[str]
+    prewarm_enabled: bool
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        return cls(
+            livekit_url=os.getenv("LIVEKIT_URL"),
+            llm_provider=os.getenv("LLM_PROVIDER", "openai").lower(),
+            llm_model=os.getenv("LLM_MODEL", "gpt-4o-mini"),
+            azure_openai_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+            azure_openai_api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+            azure_openai_api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview"),
+            azure_openai_deployment_name=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME"),
+            together_api_key=os.getenv("TOGETHER_API_KEY"),
+            openrouter_api_key=os.getenv("OPENROUTER_API_KEY"),
+            avatar_mode=os.getenv("AVATAR_MODE", "separate").lower(),
+            avatar_provider=os.getenv("AVATAR_PROVIDER", "").lower(),
+            enable_avatar_video=_flag("ENABLE_AVATAR_VIDEO", "false"),
+            avatar_video_width=int(os.getenv("AVATAR_VIDEO_WIDTH", "640")),
+            avatar_video_height=int(os.getenv("AVATAR_VIDEO_HEIGHT", "360")),
+            avatar_video_fps=int(os.getenv("AVATAR_VIDEO_FPS", "15")),
+            tavus_api_key=os.getenv("TAVUS_API_KEY"),
+            tavus_replica_id=os.getenv("TAVUS_REPLICA_ID"),
+            tavus_persona_id=os.getenv("TAVUS_PERSONA_ID"),
+            bey_api_key=os.getenv("BEY_API_KEY") or os.getenv("BEYOND_PRESENCE_API_KEY"),
+            bey_avatar_id=os.getenv("BEY_AVATAR_ID") or os.getenv("BEYOND_PRESENCE_AVATAR_ID"),
+            prewarm_enabled=_flag("PREWARM_ENABLED", "true"),
+        )
+
+    @staticmethod
+    def required_status() -> Dict[str, Optional[str]]:
+        """REQUIRED_VARS -> value (None if unset), for the startup check"""
+        return {name: os.getenv(name) for name in REQUIRED_VARS}
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """The process-wide settings, parsed on first use"""
+    return Settings.from_env()
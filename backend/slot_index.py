@@ -0,0 +1,113 @@
+"""
+In-process index of booked appointment slots
+"""
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Hardcoded slot times: 9 AM, 11 AM, 2 PM, 4 PM
+SLOT_TIMES = ["09:00", "11:00", "14:00", "16:00"]
+_SLOT_POSITIONS = {slot_time: position for position, slot_time in enumerate(SLOT_TIMES)}
+
+
+def split_datetime(value: str) -> Optional[Tuple[str, str]]:
+    """Split a stored appointment_datetime into (YYYY-MM-DD, HH:MM).
+
+    Handles the formats Postgres and our own inserts produce, e.g.
+    "2024-01-01T09:00:00", "2024-01-01T09:00" and "2024-01-01T09:00:00+00:00".
+    """
+    if not value:
+        return None
+    value = value.replace(" ", "T", 1)
+    if "T" not in value:
+        return None
+    date_part, time_part = value.split("T", 1)
+    time_only = time_part.split(":")[:2]
+    if len(time_only) != 2:
+        return None
+    return date_part, f"{time_only[0].zfill(2)}:{time_only[1][:2].zfill(2)}"
+
+
+class BookedSlotIndex:
+    """Per-day bitmap of booked slot positions (bit i set = SLOT_TIMES[i] taken).
+
+    Days are loaded from the database as a window and stay fresh for ``ttl``
+    seconds; local bookings, cancellations and modifications update the bitmaps
+    in place so repeat availability lookups need no round trip. The TTL bounds
+    how long a booking made by another worker process can go unseen.
+    """
+
+    def __init__(self, ttl: float = 60.0):
+        self.ttl = ttl
+        self._booked: Dict[str, int] = {}
+        self._loaded_at: Dict[str, float] = {}
+        # appointment id -> (date, time), so cancel/modify by id can clear the old bit
+        self._slot_by_id: Dict[str, Tuple[str, str]] = {}
+
+    def covers(self, dates: Iterable[str]) -> bool:
+        """True if every day is loaded and still fresh"""
+        now = time.monotonic()
+        for date in dates:
+            loaded_at = self._loaded_at.get(date)
+            if loaded_at is None or now - loaded_at > self.ttl:
+                return False
+        return True
+
+    def known(self, dates: Iterable[str]) -> bool:
+        """True if every day has a bitmap, fresh or not"""
+        return all(date in self._booked for date in dates)
+
+    def load(self, dates: Iterable[str], rows: List[Dict[str, str]]) -> None:
+        """Replace the bitmaps for ``dates`` with the confirmed rows fetched for them"""
+        now = time.monotonic()
+        for date in dates:
+            self._booked[date] = 0
+            self._loaded_at[date] = now
+        for row in rows:
+            self.mark(row.get("appointment_datetime"), row.get("id"))
+
+    def is_booked(self, date: str, slot_time: str) -> bool:
+        position = _SLOT_POSITIONS.get(slot_time)
+        if position is None:
+            return False
+        return bool(self._booked.get(date, 0) >> position & 1)
+
+    def free_times(self, date: str) -> List[str]:
+        """Slot times on ``date`` that are not booked"""
+        booked = self._booked.get(date, 0)
+        return [slot_time for position, slot_time in enumerate(SLOT_TIMES) if not booked >> position & 1]
+
+    def mark(self, appointment_datetime: Optional[str], appointment_id: Optional[str] = None) -> None:
+        """Record a confirmed booking"""
+        parts = split_datetime(appointment_datetime)
+        if not parts:
+            return
+        date, slot_time = parts
+        position = _SLOT_POSITIONS.get(slot_time)
+        if position is None:
+            return
+        if appointment_id:
+            self._slot_by_id[str(appointment_id)] = parts
+        # Only days we have loaded carry a bitmap; others are fetched on demand
+        if date in self._booked:
+            self._booked[date] |= 1 << position
+
+    def clear(self, appointment_id: Optional[str] = None, appointment_datetime: Optional[str] = None) -> bool:
+        """Free a slot by appointment id or datetime. Returns False if the slot was unknown."""
+        parts = None
+        if appointment_id:
+            parts = self._slot_by_id.pop(str(appointment_id), None)
+        if parts is None:
+            parts = split_datetime(appointment_datetime)
+        if not parts:
+            return False
+        date, slot_time = parts
+        position = _SLOT_POSITIONS.get(slot_time)
+        if position is not None and date in self._booked:
+            self._booked[date] &= ~(1 << position)
+        return True
+
+    def invalidate(self) -> None:
+        """Forget everything; the next lookup reloads from the database"""
+        self._booked.clear()
+        self._loaded_at.clear()
+        self._slot_by_id.clear()
@@ -0,0 +1,89 @@
+"""
+Rank free appointment slots against caller constraints
+"""
+from datetime import datetime
+from typing import Any, Dict, FrozenSet, List, NamedTuple, Optional
+
+from date_parsing import DAYPARTS
+
+# find_best_slots never returns more than this many slots
+MAX_RANKED_SLOTS = 10
+
+
+class SlotConstraints(NamedTuple):
+    """Hard filters plus the point slots are ranked towards.
+
+    ``weekdays`` uses datetime.weekday() numbers (Monday = 0). ``near`` ranks
+    slots by distance to that moment (e.g. an existing appointment) instead of
+    by how soon they are.
+    """
+
+    earliest: Optional[datetime] = None
+    latest: Optional[datetime] = None
+    weekdays: Optional[FrozenSet[int]] = None
+    dayparts: Optional[FrozenSet[str]] = None
+    near: Optional[datetime] = None
+
+
+def _in_dayparts(slot_time: str, dayparts: FrozenSet[str]) -> bool:
+    return any(DAYPARTS[name][0] <= slot_time < DAYPARTS[name][1] for name in dayparts)
+
+
+def _matches(slot: Dict[str, Any], when: datetime, constraints: SlotConstraints) -> bool:
+    if constraints.earliest and when < constraints.earliest:
+        return False
+    if constraints.latest and when > constraints.latest:
+        return False
+    if constraints.weekdays is not None and when.weekday() not in constraints.weekdays:
+        return False
+    if constraints.dayparts and not _in_dayparts(slot["time"], constraints.dayparts):
+        return False
+    return True
+
+
+def rank_slots(
+    slots: List[Dict[str, Any]],
+    constraints: SlotConstraints,
+    k: int = 3,
+    now: Optional[datetime] = None,
+) -> List[Dict[str, Any]]:
+    """Top ``k`` free slots that satisfy ``constraints``, best first.
+
+    Slots are scored by hours from ``constraints.near`` if given, otherwise by
+    hours from now (soonest first). The top picks are spread over different
+    days where possible so the caller hears real alternatives, not three
+    times on the same morning.
+    """
+    now = now or datetime.now()
+    anchor = constraints.near or now
+    scored = []
+    for slot in slots:
+        when = datetime.fromisoformat(slot["datetime"])
+        if when <= now or not _matches(slot, when, constraints):
+            continue
+        scored.append((abs((when - anchor).total_seconds()) / 3600, when, slot))
+    scored.sort(key=lambda item: (item[0], item[1]))
+
+    k = max(1, min(k, MAX_RANKED_SLOTS))
+    picked, seen_days = [], set()
+    for item in scored:
+        if len(picked) == k:
+            break
+        if item[2]["date"] not in seen_days:
+            picked.append(item)
+            seen_days.add(item[2]["date"])
+    for item in scored:
+        if len(picked) == k:
+            break
+        if item not in picked:
+            picked.append(item)
+    picked.sort(key=lambda item: (item[0], item[1]))
+
+    return [
+        {
+            "date": slot["date"],
+            "time": slot["time"],
+            "weekday": when.strftime("%A"),
+        }
+        for _, when, slot in picked
+    ]
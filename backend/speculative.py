@@ -0,0 +1,263 @@
+"""
+Speculative LLM generation on stable interim transcripts (opt-in: SPECULATIVE_LLM=true)
+"""
+import asyncio
+import logging
+import os
+import re
+import time
+from typing import Any, AsyncIterable, List, Optional, Tuple
+
+from livekit.agents import llm
+from livekit.agents.utils import is_given
+from livekit.agents.voice import Agent, ModelSettings
+
+from tool_results import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+SPECULATIVE_LLM = os.getenv("SPECULATIVE_LLM", "false").lower() == "true"
+# How long an interim transcript must stay unchanged before we speculate on it
+SPECULATIVE_STABLE_MS = float(os.getenv("SPECULATIVE_STABLE_MS", "250"))
+
+# Process-wide: speculations started, used (hits) or thrown away (misses),
+# tokens spent on thrown-away requests, and how far ahead hits started
+SPECULATION_STATS = {"started": 0, "hits": 0, "misses": 0, "wasted_tokens": 0, "head_start_ms": 0.0}
+
+
+def speculation_summary() -> dict:
+    """SPECULATION_STATS with hit rate and average head start"""
+    decided = SPECULATION_STATS["hits"] + SPECULATION_STATS["misses"]
+    hits = SPECULATION_STATS["hits"]
+    return {
+        **SPECULATION_STATS,
+        "head_start_ms": round(SPECULATION_STATS["head_start_ms"]),
+        "hit_rate": round(hits / decided, 3) if decided else 0.0,
+        "avg_head_start_ms": round(SPECULATION_STATS["head_start_ms"] / hits) if hits else 0,
+    }
+
+
+def _normalize(text: str) -> str:
+    """Compare transcripts the way the LLM would read them: case, punctuation and spacing don't matter"""
+    return " ".join(re.sub(r"[^\w\s']", " ", text.lower()).split())
+
+
+def _item_key(item: Any) -> Tuple:
+    if item.type == "message":
+        return ("message", item.role, item.text_content)
+    if item.type == "function_call":
+        return ("function_call", item.name, item.arguments)
+    if item.type == "function_call_output":
+        return ("function_call_output", item.call_id, item.output)
+    return (item.type, getattr(item, "id", None))
+
+
+def _history_key(chat_ctx: llm.ChatContext) -> Tuple:
+    """Everything before the final user message, by content"""
+    return tuple(_item_key(item) for item in chat_ctx.items[:-1])
+
+
+def _tool_names(tools: List[Any]) -> Tuple[str, ...]:
+    return tuple(sorted(getattr(getattr(tool, "info", None), "name", repr(tool)) for tool in tools))
+
+
+class _Speculation:
+    """One in-flight LLM request on a partial transcript, buffering its chunks"""
+
+    def __init__(self, text: str, history: Tuple, tools: Tuple[str, ...]):
+        self.text = text
+        self.history = history
+        self.tools = tools
+        self.started = time.monotonic()
+        self.chunks: List[llm.ChatChunk] = []
+        self.finished = False
+        self.error: Optional[BaseException] = None
+        self.prompt_text = ""
+        self._changed = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def push(self, chunk: llm.ChatChunk) -> None:
+        self.chunks.append(chunk)
+        self._changed.set()
+
+    def close(self) -> None:
+        self.finished = True
+        self._changed.set()
+
+    async def replay(self) -> AsyncIterable[llm.ChatChunk]:
+        """Everything generated so far, then the rest as it arrives"""
+        index = 0
+        while True:
+            while index < len(self.chunks):
+                yield self.chunks[index]
+                index += 1
+            if self.finished:
+                if self.error is not None:
+                    raise self.error
+                return
+            self._changed.clear()
+            await self._changed.wait()
+
+    def tokens_spent(self) -> int:
+        """Tokens billed for this request: from usage if the stream finished, else estimated"""
+        for chunk in reversed(self.chunks):
+            if chunk.usage is not None:
+                return chunk.usage.total_tokens
+        generated = "".join(
+            (chunk.delta.content or "") + "".join(call.arguments or "" for call in chunk.delta.tool_calls)
+            for chunk in self.chunks
+            if chunk.delta
+        )
+        return estimate_tokens(self.prompt_text) + estimate_tokens(generated)
+
+
+class SpeculativeAgent(Agent):
+    """Agent that starts the LLM on a stable interim transcript.
+
+    When an interim transcript (plus any finals already received this turn)
+    stays unchanged for SPECULATIVE_STABLE_MS, the LLM is called with it as the
+    user message and its output is buffered. When the real reply is generated,
+    the buffered stream is used if the final transcript, the rest of the
+    history and the tools all match; otherwise it is cancelled and the LLM is
+    called normally. Tools only run after llm_node yields, so a discarded
+    speculation never has side effects.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._finals: List[str] = []
+        self._interim = ""
+        self._stable_timer: Optional[asyncio.TimerHandle] = None
+        self._speculation: Optional[_Speculation] = None
+        self._last_tools: Optional[List[llm.Tool]] = None
+
+    async def on_enter(self) -> None:
+        await super().on_enter()
+        self.session.on("user_input_transcribed", self._on_transcript)
+
+    # --- transcript tracking -------------------------------------------------
+
+    def _pending_text(self) -> str:
+        return " ".join(part for part in self._finals + [self._interim] if part)
+
+    def _on_transcript(self, ev) -> None:
+        if ev.is_final:
+            self._finals.append(ev.transcript)
+            self._interim = ""
+        else:
+            self._interim = ev.transcript
+        if self._stable_timer is not None:
+            self._stable_timer.cancel()
+        speculation = self._speculation
+        if speculation is not None and _normalize(self._pending_text()) != speculation.text:
+            # The user said more (or Deepgram revised the words): this guess is dead
+            self._discard()
+        self._stable_timer = asyncio.get_running_loop().call_later(
+            SPECULATIVE_STABLE_MS / 1000, self._on_stable
+        )
+
+    def _on_stable(self) -> None:
+        self._stable_timer = None
+        text = self._pending_text()
+        if not _normalize(text) or self._speculation is not None:
+            return
+        try:
+            self._start(text)
+        except Exception as e:
+            logger.warning(f"Could not start speculative LLM request: {e}")
+
+    # --- speculation lifecycle -----------------------------------------------
+
+    def _start(self, text: str) -> None:
+        model = self.llm
+        if not isinstance(model, llm.LLM):
+            return
+        chat_ctx = self.chat_ctx.copy()
+        chat_ctx.add_message(role="user", content=text)
+        tools = self._last_tools if self._last_tools is not None else llm.ToolContext(self.tools).flatten()
+
+        speculation = _Speculation(_normalize(text), _history_key(chat_ctx), _tool_names(tools))
+        speculation.prompt_text = " ".join(item.text_content or "" for item in chat_ctx.items if item.type == "message")
+        conn_options = self.session.conn_options.llm_conn_options
+
+        async def generate():
+            try:
+                async with model.chat(chat_ctx=chat_ctx, tools=tools, conn_options=conn_options) as stream:
+                    async for chunk in stream:
+                        speculation.push(chunk)
+            except Exception as e:
+                # Surfaces through replay() if this speculation is used, otherwise it's just a miss
+                speculation.error = e
+            finally:
+                speculation.close()
+
+        speculation.task = asyncio.create_task(generate())
+        self._speculation = speculation
+        SPECULATION_STATS["started"] += 1
+
+    def _discard(self) -> None:
+        speculation, self._speculation = self._speculation, None
+        if speculation is None:
+            return
+        if speculation.task is not None and not speculation.task.done():
+            speculation.task.cancel()
+        SPECULATION_STATS["misses"] += 1
+        SPECULATION_STATS["wasted_tokens"] += speculation.tokens_spent()
+
+    def _matches(
+        self, speculation: _Speculation, chat_ctx: llm.ChatContext, tools: List[llm.Tool], model_settings: ModelSettings
+    ) -> bool:
+        """Would the real request have sent the LLM exactly what we speculated with?"""
+        return (
+            speculation.error is None
+            and _normalize(chat_ctx.items[-1].text_content or "") == speculation.text
+            and _history_key(chat_ctx) == speculation.history
+            and _tool_names(tools) == speculation.tools
+            # Speculation never forces a tool choice
+            and not (model_settings and is_given(model_settings.tool_choice))
+        )
+
+    async def llm_node(
+        self,
+        chat_ctx: llm.ChatContext,
+        tools: List[llm.Tool],
+        model_settings: ModelSettings,
+    ) -> AsyncIterable[llm.ChatChunk]:
+        self._last_tools = list(tools)
+        last = chat_ctx.items[-1] if chat_ctx.items else None
+        if last is None or last.type != "message" or last.role != "user":
+            # A follow-up after tool output; any speculation waits for its own turn
+            async for chunk in Agent.default.llm_node(self, chat_ctx, tools, model_settings):
+                yield chunk
+            return
+
+        # This turn's words are committed; start collecting the next one
+        self._finals, self._interim = [], ""
+        if self._stable_timer is not None:
+            self._stable_timer.cancel()
+            self._stable_timer = None
+
+        speculation = self._speculation
+        if speculation is not None and self._matches(speculation, chat_ctx, tools, model_settings):
+            self._speculation = None
+            SPECULATION_STATS["hits"] += 1
+            SPECULATION_STATS["head_start_ms"] += (time.monotonic() - speculation.started) * 1000
+            try:
+                async for chunk in speculation.replay():
+                    yield chunk
+            finally:
+                # Interrupted mid-reply: stop generating
+                if speculation.task is not None and not speculation.task.done():
+                    speculation.task.cancel()
+            return
+
+        self._discard()
+        async for chunk in Agent.default.llm_node(self, chat_ctx, tools, model_settings):
+            yield chunk
+
+    async def on_exit(self) -> None:
+        self.session.off("user_input_transcribed", self._on_transcript)
+        if self._stable_timer is not None:
+            self._stable_timer.cancel()
+        self._discard()
+        await super().on_exit()
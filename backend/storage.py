@@ -0,0 +1,424 @@
+"""
+Storage backends behind Database
+
+``Database`` owns validation and the in-process caches; a storage backend only
+moves rows. Pick one with STORAGE_BACKEND:
+
+- ``supabase`` (default): hosted Postgres via supabase-py
+- ``sqlite``: local file in WAL mode at SQLITE_PATH, schema applied from
+  supabase/migrations.sql
+- ``memory``: the same SQLite backend on an in-memory database
+"""
+import asyncio
+import json
+import os
+import re
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from http_transport import TransportStats, create_http_client
+from resilience import BudgetExhaustedError, RejectedError, call_deadline
+
+MIGRATIONS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "supabase", "migrations.sql")
+
+# Postgres unique_violation, e.g. idx_appointments_confirmed_slot
+_PG_UNIQUE_VIOLATION = "23505"
+
+
+class SlotTakenError(RejectedError):
+    """An update would put a second confirmed appointment in the same slot"""
+
+
+class Storage:
+    """Row-level operations used by Database.
+
+    Backends run their blocking I/O on ``executor`` so the event loop never
+    waits on it, and every call is bounded by ``call_timeout`` seconds.
+    """
+
+    def __init__(self, executor: ThreadPoolExecutor, call_timeout: float):
+        self._executor = executor
+        self.call_timeout = call_timeout
+
+    async def _run(self, fn: Callable[..., Any], *args, timeout: Optional[float] = None) -> Any:
+        """Run a blocking call off the event loop with a deadline.
+
+        The deadline is the per-call timeout, capped by whatever is left of the
+        current turn's latency budget. It covers time spent queued for a worker
+        thread as well as the call itself. A timed-out call is abandoned, not
+        interrupted, so its thread stays busy until it returns.
+        """
+        deadline = timeout if timeout is not None else call_deadline(self.call_timeout)
+        loop = asyncio.get_running_loop()
+        try:
+            return await asyncio.wait_for(loop.run_in_executor(self._executor, fn, *args), deadline)
+        except asyncio.TimeoutError:
+            if deadline < self.call_timeout:
+                raise BudgetExhaustedError(f"Turn latency budget ran out after {deadline:.2f}s") from None
+            raise TimeoutError(f"Database call exceeded {deadline:.1f}s deadline") from None
+
+    async def get_user(self, phone: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def insert_user(self, row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def upsert_user(self, row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Insert or merge on phone, touching only the given columns; returns the row"""
+        raise NotImplementedError
+
+    async def booked_slots(self, start: str, end: str) -> List[Dict[str, Any]]:
+        """id and appointment_datetime of confirmed appointments in [start, end)"""
+        raise NotImplementedError
+
+    async def book_slot(
+        self, user_phone: str, date: str, time: str, notes: Optional[str]
+    ) -> Optional[Dict[str, Any]]:
+        """Atomically insert a confirmed appointment; None if the slot is taken"""
+        raise NotImplementedError
+
+    async def book_slots(
+        self, user_phone: str, slots: List[Tuple[str, str]], notes: Optional[str]
+    ) -> List[Dict[str, Any]]:
+        """Insert confirmed appointments for (date, time) slots in one statement.
+
+        Slots that are already taken are skipped; returns the inserted rows.
+        """
+        raise NotImplementedError
+
+    async def list_appointments(self, user_phone: str, status: Optional[str]) -> List[Dict[str, Any]]:
+        """A user's appointments, newest appointment_datetime first"""
+        raise NotImplementedError
+
+    async def get_appointment(self, appointment_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def update_appointment(
+        self, appointment_id: str, fields: Dict[str, Any], if_status: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Update one appointment; raises SlotTakenError if it would move into a held slot.
+
+        With if_status, only an appointment currently in that status is updated
+        (None is returned otherwise).
+        """
+        raise NotImplementedError
+
+    async def insert_rows(self, table: str, rows: List[Dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+    def warm(self) -> None:
+        """Open connections ahead of the first call; blocking, run from the worker's prewarm hook"""
+
+    def stats(self) -> Dict[str, Any]:
+        """Backend-specific counters for logging"""
+        return {}
+
+
+class SupabaseStorage(Storage):
+    """Supabase (PostgREST) backend; supabase-py is synchronous, so calls go through the executor.
+
+    All calls share one pooled httpx client (see http_transport.py), so
+    connections are kept alive and reused across every session in the process.
+    """
+
+    def __init__(self, client=None, max_workers: int = 8, call_timeout: float = 5.0):
+        super().__init__(
+            ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="supabase"),
+            call_timeout,
+        )
+        self.transport_stats: Optional[TransportStats] = None
+        if client is None:
+            from supabase import ClientOptions, create_client
+
+            supabase_url = os.getenv("SUPABASE_URL")
+            supabase_key = os.getenv("SUPABASE_KEY")
+
+            if not supabase_url or not supabase_key:
+                raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set")
+
+            self.transport_stats = TransportStats()
+            http_client = create_http_client(timeout=call_timeout, stats=self.transport_stats)
+            client = create_client(
+                supabase_url,
+                supabase_key,
+                options=ClientOptions(httpx_client=http_client),
+            )
+        self.client = client
+
+    async def _execute(self, query, timeout: Optional[float] = None):
+        return await self._run(query.execute, timeout=timeout)
+
+    async def get_user(self, phone: str) -> Optional[Dict[str, Any]]:
+        result = await self._execute(self.client.table("users").select("*").eq("phone", phone))
+        return result.data[0] if result.data else None
+
+    async def insert_user(self, row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        result = await self._execute(self.client.table("users").insert(row))
+        return result.data[0] if result.data else None
+
+    async def upsert_user(self, row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        result = await self._execute(self.client.table("users").upsert(row, on_conflict="phone"))
+        return result.data[0] if result.data else None
+
+    async def booked_slots(self, start: str, end: str) -> List[Dict[str, Any]]:
+        result = await self._execute(
+            self.client.table("appointments")
+            .select("id, appointment_datetime")
+            .eq("status", "confirmed")
+            .gte("appointment_datetime", start)
+            .lt("appointment_datetime", end)
+        )
+        return result.data or []
+
+    async def book_slot(
+        self, user_phone: str, date: str, time: str, notes: Optional[str]
+    ) -> Optional[Dict[str, Any]]:
+        # book_appointment_slot inserts against the partial unique index on
+        # confirmed slots and returns no row if another caller holds the slot
+        result = await self._execute(self.client.rpc("book_appointment_slot", {
+            "p_user_phone": user_phone,
+            "p_date": date,
+            "p_time": time,
+            "p_notes": notes,
+        }))
+        return result.data[0] if result.data else None
+
+    async def book_slots(
+        self, user_phone: str, slots: List[Tuple[str, str]], notes: Optional[str]
+    ) -> List[Dict[str, Any]]:
+        # book_appointment_slots does one INSERT ... ON CONFLICT DO NOTHING for the whole batch
+        result = await self._execute(self.client.rpc("book_appointment_slots", {
+            "p_user_phone": user_phone,
+            "p_slots": [{"date": date, "time": time} for date, time in slots],
+            "p_notes": notes,
+        }))
+        return result.data or []
+
+    async def list_appointments(self, user_phone: str, status: Optional[str]) -> List[Dict[str, Any]]:
+        query = self.client.table("appointments").select("*").eq("user_phone", user_phone)
+        if status:
+            query = query.eq("status", status)
+        result = await self._execute(query.order("appointment_datetime", desc=True))
+        return result.data or []
+
+    async def get_appointment(self, appointment_id: str) -> Optional[Dict[str, Any]]:
+        result = await self._execute(self.client.table("appointments").select("*").eq("id", appointment_id))
+        return result.data[0] if result.data else None
+
+    async def update_appointment(
+        self, appointment_id: str, fields: Dict[str, Any], if_status: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        query = self.client.table("appointments").update(fields).eq("id", appointment_id)
+        if if_status is not None:
+            query = query.eq("status", if_status)
+        try:
+            result = await self._execute(query)
+        except Exception as e:
+            # postgrest's APIError carries the SQLSTATE in .code
+            if getattr(e, "code", None) == _PG_UNIQUE_VIOLATION:
+                raise SlotTakenError(str(e)) from e
+            raise
+        return result.data[0] if result.data else None
+
+    async def insert_rows(self, table: str, rows: List[Dict[str, Any]]) -> None:
+        await self._execute(self.client.table(table).insert(rows))
+
+    def warm(self) -> None:
+        # A one-row read opens the pooled TLS connection and starts an executor thread
+        query = self.client.table("users").select("phone").limit(1)
+        self._executor.submit(query.execute).result(timeout=self.call_timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.transport_stats.snapshot() if self.transport_stats else {}
+
+
+def _sqlite_schema(sql: str) -> List[str]:
+    """Translate the Postgres migrations into SQLite statements.
+
+    Functions are dropped (SQLiteStorage implements book_slot directly) and
+    Postgres-only types and defaults are mapped to SQLite equivalents.
+    """
+    sql = re.sub(r"--[^\n]*", "", sql)
+    sql = re.sub(r"CREATE OR REPLACE FUNCTION.*?\$\$.*?\$\$\s*;", "", sql, flags=re.S | re.I)
+    sql = re.sub(
+        r"UUID PRIMARY KEY DEFAULT gen_random_uuid\(\)",
+        "TEXT PRIMARY KEY DEFAULT (lower(hex(randomblob(16))))",
+        sql,
+    )
+    sql = re.sub(r"DEFAULT NOW\(\)", "DEFAULT CURRENT_TIMESTAMP", sql, flags=re.I)
+    sql = re.sub(r"\b(TIMESTAMPTZ|JSONB|UUID|DATE|TIME)\b(?!\s*\()", "TEXT", sql)
+    return [statement.strip() for statement in sql.split(";") if statement.strip()]
+
+
+class SQLiteStorage(Storage):
+    """Local SQLite backend (WAL mode) for development and single-box load tests.
+
+    All access goes through one dedicated thread, which is also what lets a
+    single ``:memory:`` connection be shared safely.
+    """
+
+    # Columns stored as JSON text
+    _JSON_COLUMNS = {"summary", "tool_calls", "args", "result"}
+    # Matches the partial unique index on confirmed slots
+    _SLOT_CONFLICT = "ON CONFLICT (appointment_datetime) WHERE status = 'confirmed' DO NOTHING"
+
+    def __init__(self, path: str = "voice_agent.db", call_timeout: float = 5.0):
+        super().__init__(ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite"), call_timeout)
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._executor.submit(self._connect).result()
+
+    def _connect(self) -> None:
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        if self.path != ":memory:":
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        with open(MIGRATIONS_PATH, encoding="utf-8") as f:
+            for statement in _sqlite_schema(f.read()):
+                conn.execute(statement)
+        self._conn = conn
+
+    def _encode(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            key: json.dumps(value, default=str) if key in self._JSON_COLUMNS and value is not None else value
+            for key, value in row.items()
+        }
+
+    def _query(self, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        return [dict(row) for row in self._conn.execute(sql, params).fetchall()]
+
+    def _insert_returning(self, table: str, row: Dict[str, Any], conflict: str = "") -> List[Dict[str, Any]]:
+        return self._insert_many_returning(table, [row], conflict)
+
+    def _insert_many_returning(self, table: str, rows: List[Dict[str, Any]], conflict: str = "") -> List[Dict[str, Any]]:
+        """Multi-row INSERT ... RETURNING as a single statement; rows must share their columns"""
+        rows = [self._encode(row) for row in rows]
+        columns = ", ".join(rows[0])
+        placeholders = ", ".join(["(" + ", ".join("?" for _ in rows[0]) + ")"] * len(rows))
+        return self._query(
+            f"INSERT INTO {table} ({columns}) VALUES {placeholders} {conflict} RETURNING *",
+            tuple(value for row in rows for value in row.values()),
+        )
+
+    @staticmethod
+    def _appointment_row(user_phone: str, date: str, time: str, notes: Optional[str]) -> Dict[str, Any]:
+        return {
+            "user_phone": user_phone,
+            "appointment_date": date,
+            "appointment_time": time,
+            "appointment_datetime": f"{date}T{time}:00",
+            "status": "confirmed",
+            "notes": notes,
+        }
+
+    async def get_user(self, phone: str) -> Optional[Dict[str, Any]]:
+        rows = await self._run(self._query, "SELECT * FROM users WHERE phone = ?", (phone,))
+        return rows[0] if rows else None
+
+    async def insert_user(self, row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        rows = await self._run(self._insert_returning, "users", row)
+        return rows[0] if rows else None
+
+    async def upsert_user(self, row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        # Same merge semantics as PostgREST: only the given columns are updated
+        updates = ", ".join(f"{column} = excluded.{column}" for column in row)
+        rows = await self._run(
+            self._insert_returning, "users", row, f"ON CONFLICT (phone) DO UPDATE SET {updates}"
+        )
+        return rows[0] if rows else None
+
+    async def booked_slots(self, start: str, end: str) -> List[Dict[str, Any]]:
+        return await self._run(
+            self._query,
+            "SELECT id, appointment_datetime FROM appointments "
+            "WHERE status = 'confirmed' AND appointment_datetime >= ? AND appointment_datetime < ?",
+            (start, end),
+        )
+
+    async def book_slot(
+        self, user_phone: str, date: str, time: str, notes: Optional[str]
+    ) -> Optional[Dict[str, Any]]:
+        rows = await self._run(
+            self._insert_returning,
+            "appointments",
+            self._appointment_row(user_phone, date, time, notes),
+            self._SLOT_CONFLICT,
+        )
+        return rows[0] if rows else None
+
+    async def book_slots(
+        self, user_phone: str, slots: List[Tuple[str, str]], notes: Optional[str]
+    ) -> List[Dict[str, Any]]:
+        if not slots:
+            return []
+        return await self._run(
+            self._insert_many_returning,
+            "appointments",
+            [self._appointment_row(user_phone, date, time, notes) for date, time in slots],
+            self._SLOT_CONFLICT,
+        )
+
+    async def list_appointments(self, user_phone: str, status: Optional[str]) -> List[Dict[str, Any]]:
+        sql = "SELECT * FROM appointments WHERE user_phone = ?"
+        params: tuple = (user_phone,)
+        if status:
+            sql += " AND status = ?"
+            params += (status,)
+        return await self._run(self._query, sql + " ORDER BY appointment_datetime DESC", params)
+
+    async def get_appointment(self, appointment_id: str) -> Optional[Dict[str, Any]]:
+        rows = await self._run(self._query, "SELECT * FROM appointments WHERE id = ?", (appointment_id,))
+        return rows[0] if rows else None
+
+    async def update_appointment(
+        self, appointment_id: str, fields: Dict[str, Any], if_status: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        fields = self._encode(fields)
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        where, params = "id = ?", (appointment_id,)
+        if if_status is not None:
+            where, params = "id = ? AND status = ?", (appointment_id, if_status)
+        try:
+            rows = await self._run(
+                self._query,
+                f"UPDATE appointments SET {assignments} WHERE {where} RETURNING *",
+                tuple(fields.values()) + params,
+            )
+        except sqlite3.IntegrityError as e:
+            if "appointment_datetime" in str(e):
+                raise SlotTakenError(str(e)) from e
+            raise
+        return rows[0] if rows else None
+
+    def _insert_many(self, table: str, rows: List[Dict[str, Any]]) -> None:
+        columns = sorted({column for row in rows for column in row})
+        placeholders = ", ".join("?" for _ in columns)
+        encoded = [self._encode(row) for row in rows]
+        # One transaction per batch; the connection is otherwise in autocommit mode
+        self._conn.execute("BEGIN")
+        try:
+            self._conn.executemany(
+                f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+                [tuple(row.get(column) for column in columns) for row in encoded],
+            )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    async def insert_rows(self, table: str, rows: List[Dict[str, Any]]) -> None:
+        await self._run(self._insert_many, table, rows)
+
+
+def create_storage(max_workers: int = 8, call_timeout: float = 5.0) -> Storage:
+    """Build the backend selected by STORAGE_BACKEND"""
+    backend = os.getenv("STORAGE_BACKEND", "supabase").lower()
+    if backend == "supabase":
+        return SupabaseStorage(max_workers=max_workers, call_timeout=call_timeout)
+    if backend in ("sqlite", "memory"):
+        path = ":memory:" if backend == "memory" else os.getenv("SQLITE_PATH", "voice_agent.db")
+        return SQLiteStorage(path=path, call_timeout=call_timeout)
+    raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
@@ -29,8 +29,63 @@ CREATE TABLE IF NOT EXISTS conversation_summaries (
     created_at TIMESTAMPTZ DEFAULT NOW()
 );
 
+-- Tool call audit log (written in batches by the agent)
+CREATE TABLE IF NOT EXISTS tool_call_logs (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    room TEXT,
+    user_phone TEXT,
+    tool_name TEXT NOT NULL,
+    args JSONB,
+    result JSONB,
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
 -- Indexes for performance
 CREATE INDEX IF NOT EXISTS idx_appointments_user_phone ON appointments(user_phone);
 CREATE INDEX IF NOT EXISTS idx_appointments_datetime ON appointments(appointment_datetime);
 CREATE INDEX IF NOT EXISTS idx_appointments_status ON appointments(status);
 CREATE INDEX IF NOT EXISTS idx_conversation_summaries_user_phone ON conversation_summaries(user_phone);
+CREATE INDEX IF NOT EXISTS idx_tool_call_logs_user_phone ON tool_call_logs(user_phone);
+
+-- At most one confirmed appointment per slot. Cancelled rows don't count, so a
+-- freed slot can be booked again. Resolve any existing duplicate confirmed
+-- bookings before running this.
+CREATE UNIQUE INDEX IF NOT EXISTS idx_appointments_confirmed_slot
+    ON appointments(appointment_datetime) WHERE status = 'confirmed';
+
+-- Atomic booking in a single round trip (called via RPC from database.py).
+-- Returns the inserted row, or no rows if the slot is already taken.
+CREATE OR REPLACE FUNCTION book_appointment_slot(
+    p_user_phone TEXT,
+    p_date DATE,
+    p_time TIME,
+    p_notes TEXT DEFAULT NULL
+) RETURNS SETOF appointments
+LANGUAGE sql
+AS $$
+    INSERT INTO appointments (
+        user_phone, appointment_date, appointment_time, appointment_datetime, status, notes
+    )
+    VALUES (p_user_phone, p_date, p_time, p_date + p_time, 'confirmed', p_notes)
+    ON CONFLICT (appointment_datetime) WHERE status = 'confirmed' DO NOTHING
+    RETURNING *;
+$$;
+
+-- Bulk booking (e.g. a weekly series) in one statement. p_slots is a JSON
+-- array of {"date": "YYYY-MM-DD", "time": "HH:MM"}; slots that are already
+-- taken are skipped, so only the rows actually inserted come back.
+CREATE OR REPLACE FUNCTION book_appointment_slots(
+    p_user_phone TEXT,
+    p_slots JSONB,
+    p_notes TEXT DEFAULT NULL
+) RETURNS SETOF appointments
+LANGUAGE sql
+AS $$
+    INSERT INTO appointments (
+        user_phone, appointment_date, appointment_time, appointment_datetime, status, notes
+    )
+    SELECT p_user_phone, s.date, s.time, s.date + s.time, 'confirmed', p_notes
+    FROM jsonb_to_recordset(p_slots) AS s(date DATE, time TIME)
+    ON CONFLICT (appointment_datetime) WHERE status = 'confirmed' DO NOTHING
+    RETURNING *;
+$$;
@@ -0,0 +1,107 @@
+"""Checks for data-channel message ordering and coalescing (python test_data_publisher.py, or pytest)"""
+import asyncio
+import json
+
+import data_publisher
+from data_publisher import DataPublisher
+
+
+class _FakeParticipant:
+    def __init__(self, fail_topics=()):
+        self.packets = []
+        self.fail_topics = set(fail_topics)
+
+    async def publish_data(self, payload, topic, reliable):
+        if topic in self.fail_topics:
+            raise ConnectionError("data channel closed")
+        self.packets.append((topic, json.loads(payload)))
+
+
+class _FakeRoom:
+    def __init__(self, fail_topics=()):
+        self.local_participant = _FakeParticipant(fail_topics)
+
+
+async def _publish_all(room, messages, maxsize=256):
+    publisher = DataPublisher(room, maxsize=maxsize)
+    # Queue everything before the task runs, as a burst of events would
+    results = [publisher.publish(*message) for message in messages]
+    publisher.start()
+    await publisher.close()
+    return publisher, results
+
+
+def test_same_topic_runs_coalesce_in_order():
+    async def run():
+        room = _FakeRoom()
+        await _publish_all(room, [
+            ("tool_calls", {"id": 1}),
+            ("tool_calls", {"id": 2}),
+            ("tool_results", {"id": 1}),
+            ("tool_results", {"id": 2}),
+            ("summary", {"summary": "done"}),
+        ])
+        assert room.local_participant.packets == [
+            ("tool_calls", [{"id": 1}, {"id": 2}]),
+            ("tool_results", [{"id": 1}, {"id": 2}]),
+            # A lone message is sent as-is, not as a one-element array
+            ("summary", {"summary": "done"}),
+        ]
+    asyncio.run(run())
+
+
+def test_topic_change_breaks_a_run():
+    async def run():
+        room = _FakeRoom()
+        await _publish_all(room, [("a", 1), ("b", 2), ("a", 3)])
+        assert room.local_participant.packets == [("a", 1), ("b", 2), ("a", 3)]
+    asyncio.run(run())
+
+
+def test_packets_stay_under_the_size_limit():
+    async def run():
+        room = _FakeRoom()
+        limit, data_publisher.DATA_MAX_PACKET_BYTES = data_publisher.DATA_MAX_PACKET_BYTES, 100
+        try:
+            await _publish_all(room, [("t", "x" * 40) for _ in range(5)])
+        finally:
+            data_publisher.DATA_MAX_PACKET_BYTES = limit
+        # Each message encodes to 42 bytes, so two fit in a packet (plus brackets and a comma)
+        packets = [packet for _, packet in room.local_participant.packets]
+        assert packets == [["x" * 40] * 2, ["x" * 40] * 2, "x" * 40]
+    asyncio.run(run())
+
+
+def test_json_fields_are_decoded_by_the_task():
+    async def run():
+        room = _FakeRoom()
+        publisher = DataPublisher(room)
+        publisher.publish("tool_calls", {"args": '{"phone": "555"}'}, json_fields=("args",))
+        publisher.publish("tool_calls", {"args": "not json"}, json_fields=("args",))
+        publisher.start()
+        await publisher.close()
+        assert room.local_participant.packets == [
+            ("tool_calls", [{"args": {"phone": "555"}}, {"args": "not json"}]),
+        ]
+    asyncio.run(run())
+
+
+def test_full_queue_drops_and_failures_are_counted():
+    async def run():
+        room = _FakeRoom(fail_topics={"broken"})
+        stats = dict(data_publisher.DATA_PUBLISH_STATS)
+        publisher, results = await _publish_all(room, [("t", 1), ("t", 2), ("t", 3)], maxsize=2)
+        assert results == [True, True, False]
+        assert room.local_participant.packets == [("t", [1, 2])]
+        await _publish_all(room, [("broken", 1)])
+        assert data_publisher.DATA_PUBLISH_STATS["dropped"] == stats["dropped"] + 1
+        assert data_publisher.DATA_PUBLISH_STATS["failed"] == stats["failed"] + 1
+        assert publisher.stats()["max_depth"] == 2
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    for name, check in list(globals().items()):
+        if name.startswith("test_") and callable(check):
+            check()
+            print(f"✅ {name}")
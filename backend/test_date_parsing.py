@@ -0,0 +1,104 @@
+"""Checks for spoken date/time resolution (python test_date_parsing.py, or pytest)"""
+from datetime import date
+
+from date_parsing import DateParseError, parse_weekdays, parse_when, resolve_date, resolve_range, resolve_time
+
+# A Saturday
+TODAY = date(2026, 10, 17)
+
+
+def test_relative_days():
+    assert resolve_date("today", TODAY) == TODAY
+    assert resolve_date("tomorrow", TODAY) == date(2026, 10, 18)
+    assert resolve_date("day after tomorrow", TODAY) == date(2026, 10, 19)
+    assert resolve_date("in 3 days", TODAY) == date(2026, 10, 20)
+    assert resolve_date("in two weeks", TODAY) == date(2026, 10, 31)
+
+
+def test_weekdays_are_the_next_one_after_today():
+    assert resolve_date("tuesday", TODAY) == date(2026, 10, 20)
+    assert resolve_date("next tuesday", TODAY) == date(2026, 10, 20)
+    assert resolve_date("saturday", TODAY) == date(2026, 10, 24)
+
+
+def test_absolute_dates():
+    assert resolve_date("2026-11-03", TODAY) == date(2026, 11, 3)
+    assert resolve_date("November 3rd", TODAY) == date(2026, 11, 3)
+    # Already passed this year
+    assert resolve_date("May 7", TODAY) == date(2027, 5, 7)
+
+
+def test_day_of_month_rolls_to_next_month():
+    assert resolve_date("the 5th", TODAY) == date(2026, 11, 5)
+    assert resolve_date("the 20th", TODAY) == date(2026, 10, 20)
+    # November has no 31st
+    assert resolve_date("the 31st", date(2026, 11, 17)) == date(2026, 12, 31)
+
+
+def test_bare_number_is_a_time_not_a_day():
+    assert parse_when("9", TODAY) == (None, ["09:00"], None, None)
+    assert parse_when("9 in the evening", TODAY).times == ["21:00"]
+    assert parse_when("the 9", TODAY).date == date(2026, 11, 9)
+    assert parse_when("the 9th", TODAY).date == date(2026, 11, 9)
+    try:
+        resolve_date("9", TODAY)
+    except DateParseError:
+        pass
+    else:
+        raise AssertionError("a bare number resolved as a date")
+
+
+def test_week_and_weekend_ranges():
+    assert resolve_range("this week", TODAY) == (TODAY, date(2026, 10, 18))
+    assert resolve_range("next week", TODAY) == (date(2026, 10, 19), date(2026, 10, 25))
+    assert resolve_range("this weekend", TODAY) == (TODAY, date(2026, 10, 18))
+    assert resolve_range("next weekend", TODAY) == (date(2026, 10, 24), date(2026, 10, 25))
+    # From a Wednesday
+    assert resolve_range("this week", date(2026, 10, 14)) == (date(2026, 10, 14), date(2026, 10, 18))
+    assert resolve_range("weekend", date(2026, 10, 14)) == (date(2026, 10, 17), date(2026, 10, 18))
+    # A named day wins over the week it is in
+    assert resolve_range("tuesday next week", TODAY) == (date(2026, 10, 20), date(2026, 10, 20))
+
+
+def test_parse_when():
+    when = parse_when("next tuesday afternoon", TODAY)
+    assert when.date == date(2026, 10, 20) and when.daypart == "afternoon" and when.end is None
+    assert all("12:00" <= slot < "17:00" for slot in when.times)
+
+    assert parse_when("tomorrow at 2pm", TODAY).times == ["14:00"]
+    assert parse_when("this afternoon", TODAY).date == TODAY
+
+    week = parse_when("sometime next week", TODAY)
+    assert (week.date, week.end, week.times) == (date(2026, 10, 19), date(2026, 10, 25), None)
+
+    assert parse_when("", TODAY) == (None, None, None, None)
+
+
+def test_times():
+    assert resolve_time("14:00") == "14:00"
+    assert resolve_time("2pm") == "14:00"
+    assert resolve_time("2:30 p.m.") == "14:30"
+    assert resolve_time("noon") == "12:00"
+    assert resolve_time("10 in the morning") == "10:00"
+    assert resolve_time("2") == "14:00"
+
+
+def test_weekday_lists():
+    assert parse_weekdays("tuesday, thu and Fri") == {1, 3, 4}
+    assert parse_weekdays("weekdays") == {0, 1, 2, 3, 4}
+
+
+def test_unparseable():
+    for text in ("", "whenever", "the 32nd"):
+        try:
+            resolve_date(text, TODAY)
+        except DateParseError:
+            continue
+        raise AssertionError(f"{text!r} resolved")
+
+
+if __name__ == "__main__":
+    for name, check in list(globals().items()):
+        if name.startswith("test_") and callable(check):
+            check()
+            print(f"✅ {name}")
@@ -0,0 +1,91 @@
+"""Checks for per-session idempotency of mutating tools (python test_idempotency.py, or pytest)"""
+import asyncio
+
+from tools import IDEMPOTENCY_STATS, TOOL_SPECS, AppointmentTools, idempotency_key
+
+
+class _FakeDatabase:
+    """Counts bookings instead of writing them"""
+
+    def __init__(self, delay: float = 0):
+        self.bookings = 0
+        self.delay = delay
+
+    async def book_appointment(self, user_phone, date, time, notes=None):
+        self.bookings += 1
+        await asyncio.sleep(self.delay)
+        return {
+            "id": str(self.bookings),
+            "user_phone": user_phone,
+            "appointment_datetime": f"{date}T{time}:00",
+            "status": "confirmed",
+            "notes": notes,
+        }
+
+
+def _tools(db: _FakeDatabase, session_id: str = "session") -> AppointmentTools:
+    tools = AppointmentTools(db, session_id=session_id)
+    tools.user_phone = "+15550100"
+    return tools
+
+
+def test_key_ignores_empty_arguments_and_whitespace():
+    base = idempotency_key("s", "book_appointment", {"date": "2026-10-20", "time": "14:00"})
+    assert idempotency_key("s", "book_appointment", {"date": " 2026-10-20 ", "time": "14:00", "notes": None}) == base
+    assert idempotency_key("s", "book_appointment", {"time": "14:00", "date": "2026-10-20", "notes": "  "}) == base
+
+
+def test_key_separates_sessions_tools_and_values():
+    kwargs = {"date": "2026-10-20", "time": "14:00"}
+    base = idempotency_key("s", "book_appointment", kwargs)
+    assert idempotency_key("other", "book_appointment", kwargs) != base
+    assert idempotency_key("s", "modify_appointment", kwargs) != base
+    assert idempotency_key("s", "book_appointment", {**kwargs, "time": "16:00"}) != base
+
+
+def test_spoken_and_canonical_arguments_share_a_key():
+    spec = TOOL_SPECS["book_appointment"]
+    spoken, error = spec.validate({"date": "2026-10-20", "time": "2pm"})
+    assert error is None
+    canonical, _ = spec.validate({"date": "2026-10-20", "time": "14:00"})
+    assert idempotency_key("s", spec.name, spoken) == idempotency_key("s", spec.name, canonical)
+
+
+def test_retry_replays_the_first_result():
+    async def run():
+        db = _FakeDatabase()
+        tools = _tools(db)
+        spec = TOOL_SPECS["book_appointment"]
+        replayed = IDEMPOTENCY_STATS["replayed"]
+        first = await tools._dispatch(spec, {"date": "2026-10-20", "time": "14:00"})
+        again = await tools._dispatch(spec, {"date": "2026-10-20", "time": "2pm", "notes": ""})
+        assert first["success"] and again == first
+        assert db.bookings == 1
+        assert IDEMPOTENCY_STATS["replayed"] == replayed + 1
+
+        # A different slot, or the same call from another session, is a new booking
+        await tools._dispatch(spec, {"date": "2026-10-20", "time": "16:00"})
+        await _tools(db, "other")._dispatch(spec, {"date": "2026-10-20", "time": "14:00"})
+        assert db.bookings == 3
+    asyncio.run(run())
+
+
+def test_concurrent_duplicate_joins_the_running_call():
+    async def run():
+        db = _FakeDatabase(delay=0.05)
+        tools = _tools(db)
+        spec = TOOL_SPECS["book_appointment"]
+        first, second = await asyncio.gather(
+            tools._dispatch(spec, {"date": "2026-10-20", "time": "14:00"}),
+            tools._dispatch(spec, {"date": "2026-10-20", "time": "14:00"}),
+        )
+        assert first == second
+        assert db.bookings == 1
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    for name, check in list(globals().items()):
+        if name.startswith("test_") and callable(check):
+            check()
+            print(f"✅ {name}")
@@ -0,0 +1,159 @@
+"""Checks for the database circuit breaker state machine (python test_resilience.py, or pytest)"""
+import asyncio
+import time
+
+from resilience import (
+    BudgetExhaustedError,
+    CircuitBreaker,
+    RejectedError,
+    ResilientCaller,
+    StorageUnavailableError,
+    latency_budget,
+)
+
+
+def _caller(threshold: int = 2, reset_timeout: float = 0.05) -> ResilientCaller:
+    caller = ResilientCaller()
+    caller.breaker = CircuitBreaker(failure_threshold=threshold, reset_timeout=reset_timeout)
+    return caller
+
+
+async def _ok():
+    return "ok"
+
+
+async def _fail():
+    raise ConnectionError("backend down")
+
+
+async def _open(caller: ResilientCaller) -> None:
+    for _ in range(caller.breaker.failure_threshold):
+        try:
+            await caller.call("op", _fail)
+        except ConnectionError:
+            pass
+    assert caller.breaker.state == "open"
+
+
+def test_opens_after_threshold_and_fails_fast():
+    async def run():
+        caller = _caller()
+        await _open(caller)
+        try:
+            await caller.call("op", _ok)
+        except StorageUnavailableError:
+            pass
+        else:
+            raise AssertionError("open breaker let a call through")
+        assert caller.counters["breaker_opened"] == 1
+    asyncio.run(run())
+
+
+def test_half_open_trial_closes_or_reopens():
+    async def run():
+        caller = _caller()
+        await _open(caller)
+        time.sleep(0.06)
+        assert caller.breaker.state == "half_open"
+        try:
+            await caller.call("op", _fail)
+        except ConnectionError:
+            pass
+        assert caller.breaker.state == "open"
+
+        time.sleep(0.06)
+        assert await caller.call("op", _ok) == "ok"
+        assert caller.breaker.state == "closed"
+    asyncio.run(run())
+
+
+def test_only_one_trial_while_half_open():
+    async def run():
+        caller = _caller()
+        await _open(caller)
+        time.sleep(0.06)
+        release = asyncio.Event()
+
+        async def slow():
+            await release.wait()
+            return "ok"
+
+        trial = asyncio.create_task(caller.call("op", slow))
+        await asyncio.sleep(0)
+        try:
+            await caller.call("op", _ok)
+        except StorageUnavailableError:
+            pass
+        else:
+            raise AssertionError("second call ran alongside the half-open trial")
+        release.set()
+        assert await trial == "ok"
+        assert caller.breaker.state == "closed"
+    asyncio.run(run())
+
+
+def test_cancelled_trial_releases_half_open():
+    async def run():
+        caller = _caller()
+        await _open(caller)
+        time.sleep(0.06)
+
+        async def hang():
+            await asyncio.sleep(10)
+
+        trial = asyncio.create_task(caller.call("op", hang))
+        await asyncio.sleep(0)
+        trial.cancel()
+        try:
+            await trial
+        except asyncio.CancelledError:
+            pass
+        # Still half-open, and the next call is let through as the new trial
+        assert caller.breaker.state == "half_open"
+        assert await caller.call("op", _ok) == "ok"
+        assert caller.breaker.state == "closed"
+    asyncio.run(run())
+
+
+def test_budget_exhausted_trial_releases_half_open():
+    async def run():
+        caller = _caller()
+        await _open(caller)
+        time.sleep(0.06)
+
+        async def over_budget():
+            raise BudgetExhaustedError("Turn latency budget exhausted")
+
+        with latency_budget(1):
+            try:
+                await caller.call("op", over_budget)
+            except BudgetExhaustedError:
+                pass
+        assert caller.breaker.state == "half_open"
+        assert await caller.call("op", _ok) == "ok"
+        assert caller.breaker.state == "closed"
+    asyncio.run(run())
+
+
+def test_rejections_do_not_open():
+    async def run():
+        caller = _caller()
+
+        async def reject():
+            raise RejectedError("slot taken")
+
+        for _ in range(5):
+            try:
+                await caller.call("op", reject)
+            except RejectedError:
+                pass
+        assert caller.breaker.state == "closed"
+        assert caller.counters["rejected"] == 5
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    for name, check in list(globals().items()):
+        if name.startswith("test_") and callable(check):
+            check()
+            print(f"✅ {name}")
@@ -0,0 +1,88 @@
+"""
+Compact, token-budgeted encoding of tool results for the LLM prompt
+"""
+import json
+import os
+from typing import Any, Dict, Iterable, List, Optional
+
+# Upper bound on the tokens one tool result may add to the prompt; larger
+# results are truncated with a note telling the model how to narrow the query
+TOOL_RESULT_TOKEN_BUDGET = int(os.getenv("TOOL_RESULT_TOKEN_BUDGET", "300"))
+
+# Fields of an appointment row the model actually needs
+_APPOINTMENT_FIELDS = (
+    ("id", "id"),
+    ("appointment_date", "date"),
+    ("appointment_time", "time"),
+    ("status", "status"),
+    ("notes", "notes"),
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for JSON-ish English)"""
+    return (len(text) + 3) // 4
+
+
+def group_slots(slots: Iterable[Dict[str, Any]]) -> Dict[str, List[str]]:
+    """[{"date", "time", "datetime"}, ...] -> {"YYYY-MM-DD": ["HH:MM", ...]}"""
+    grouped: Dict[str, List[str]] = {}
+    for slot in slots:
+        grouped.setdefault(slot["date"], []).append(slot["time"])
+    return grouped
+
+
+def project_appointment(row: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Keep only the fields the model needs, with short keys and HH:MM times"""
+    if not row:
+        return row
+    projected = {}
+    for source, target in _APPOINTMENT_FIELDS:
+        value = row.get(source)
+        if value is None:
+            continue
+        if target == "time":
+            value = str(value)[:5]
+        projected[target] = str(value) if target == "id" else value
+    return projected
+
+
+def _dumps(result: Dict[str, Any]) -> str:
+    return json.dumps(result, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def _truncatable_key(result: Dict[str, Any]) -> Optional[str]:
+    for key in ("slots", "appointments"):
+        if isinstance(result.get(key), (list, dict)) and result[key]:
+            return key
+    return None
+
+
+def encode_result(result: Any, budget: int = TOOL_RESULT_TOKEN_BUDGET) -> str:
+    """Serialize a tool result as compact JSON within ``budget`` tokens.
+
+    Slot days and appointments are dropped from the end until the result fits;
+    ``count`` keeps the full total and ``truncated`` says how many were left out.
+    """
+    if not isinstance(result, dict):
+        return _dumps(result)
+    encoded = _dumps(result)
+    key = _truncatable_key(result)
+    if key is None or budget <= 0 or estimate_tokens(encoded) <= budget:
+        return encoded
+
+    items = list(result[key].items()) if isinstance(result[key], dict) else list(result[key])
+    total = len(items)
+    kept = total
+    while kept > 1 and estimate_tokens(encoded) > budget:
+        kept -= 1
+        shown = dict(items[:kept]) if isinstance(result[key], dict) else items[:kept]
+        truncated = {
+            **result,
+            key: shown,
+            "truncated": total - kept,
+            "note": f"Only the first {kept} of {total} {'days' if key == 'slots' else key} are shown. "
+                    "Ask the user to narrow it down to see the rest.",
+        }
+        encoded = _dumps(truncated)
+    return encoded
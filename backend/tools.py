@@ -1,253 +1,516 @@
 """
 Tool definitions and execution for the appointment agent
 """
+import asyncio
+import contextvars
+import functools
+import hashlib
 import json
-from datetime import datetime
-from typing import Any, Dict, List, Optional
-from livekit.agents import llm
-from database import Database
+import os
+import time as time_module
+import uuid
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from livekit.agents import RunContext, llm
+from cache import TTLCache
+from database import Database, SlotConflictError
+from date_parsing import DateParseError, parse_weekdays, parse_when, resolve_date, resolve_range, resolve_time
+from filler_speech import FillerSpeech
+from resilience import latency_budget
+from slot_index import SLOT_TIMES, split_datetime
+from slot_ranking import SlotConstraints, rank_slots
+from tool_results import encode_result, group_slots, project_appointment
+from tracing import TurnTracer
 
+# After identify_user, slots and appointments are read in the background and
+# served to the next fetch_slots / retrieve_appointments if still this fresh
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "true").lower() == "true"
+PREFETCH_TTL = float(os.getenv("PREFETCH_TTL", "30"))
 
-class AppointmentTools:
-    def __init__(self, db: Database):
-        self.db = db
-        self.user_phone = None
+# Process-wide: how many prefetches were started, served a tool call, or went unused
+PREFETCH_STATS = {"started": 0, "used": 0, "wasted": 0}
 
-    def get_tool_definitions(self) -> List[llm.RawFunctionTool]:
-        """Define all available tools"""
-        # When using raw_schema, functions must accept raw_arguments: dict[str, object]
-        # This is the format LiveKit expects for raw function tools
-        async def identify_user(raw_arguments: dict[str, object]) -> Dict[str, Any]:
-            phone = raw_arguments.get("phone")
-            if not phone:
-                return {
-                    "error": "Phone number is required",
-                    "message": "Please ask the user for their phone number first, then call this tool again with the phone number they provide."
-                }
-            return await self._identify_user(str(phone))
-        
-        async def fetch_slots(raw_arguments: dict[str, object]) -> Dict[str, Any]:
-            date = raw_arguments.get("date")
-            return await self._fetch_slots(str(date) if date else None)
-        
-        async def book_appointment(raw_arguments: dict[str, object]) -> Dict[str, Any]:
-            date = raw_arguments.get("date")
-            time = raw_arguments.get("time")
-            notes = raw_arguments.get("notes")
-            return await self._book_appointment(
-                str(date) if date else "",
-                str(time) if time else "",
-                str(notes) if notes else None
-            )
-        
-        async def retrieve_appointments(raw_arguments: dict[str, object]) -> Dict[str, Any]:
-            status = raw_arguments.get("status")
-            return await self._retrieve_appointments(str(status) if status else None)
-        
-        async def cancel_appointment(raw_arguments: dict[str, object]) -> Dict[str, Any]:
-            appointment_id = raw_arguments.get("appointment_id")
-            if not appointment_id:
-                return {"error": "Appointment ID is required"}
-            return await self._cancel_appointment(str(appointment_id))
-        
-        async def modify_appointment(raw_arguments: dict[str, object]) -> Dict[str, Any]:
-            appointment_id = raw_arguments.get("appointment_id")
-            if not appointment_id:
-                return {"error": "Appointment ID is required"}
-            date = raw_arguments.get("date")
-            time = raw_arguments.get("time")
-            notes = raw_arguments.get("notes")
-            return await self._modify_appointment(
-                str(appointment_id),
-                str(date) if date else None,
-                str(time) if time else None,
-                str(notes) if notes else None
-            )
-        
-        async def end_conversation(raw_arguments: dict[str, object]) -> Dict[str, Any]:
-            return await self._end_conversation()
-        
-        return [
-            llm.function_tool(
-                identify_user,
-                raw_schema={
-                    "name": "identify_user",
-                    "description": "Ask for and store user's phone number to identify them. Use this first before booking appointments.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "phone": {
-                                "type": "string",
-                                "description": "User's phone number (e.g., +1234567890). IMPORTANT: You must first ask the user for their phone number in conversation, wait for their response, then call this tool with the phone number they provide. Do not call this tool without a phone number.",
-                            },
-                        },
-                        "required": ["phone"],
+# Seconds a mutating tool's result is replayed to an identical retry
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "120"))
+
+# Process-wide: retries answered from a finished result, or joined to one still running
+IDEMPOTENCY_STATS = {"replayed": 0, "joined": 0}
+
+
+def idempotency_key(session_id: str, tool: str, kwargs: Dict[str, Optional[str]]) -> str:
+    """sha256 of (session, tool, arguments) with empty arguments dropped and whitespace trimmed"""
+    normalized = {name: value.strip() for name, value in kwargs.items() if value and value.strip()}
+    payload = json.dumps([session_id, tool, normalized], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _within_latency_budget(method):
+    """Run a tool under one turn latency budget shared by all its database calls.
+
+    Only for read tools: a write cut off by the budget is abandoned, not rolled
+    back, so the MUTATING_TOOLS keep their per-call and per-tool timeouts instead.
+    """
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        with latency_budget():
+            return await method(self, *args, **kwargs)
+    return wrapper
+
+
+def _write_error(action: str, e: Exception) -> Dict[str, Any]:
+    """Error result for a failed write, flagging timeouts as possibly committed"""
+    error = {"error": f"Failed to {action}: {str(e)}"}
+    if isinstance(e, TimeoutError):
+        error["timeout"] = True
+        error["message"] = _UNCERTAIN_WRITE
+    return error
+
+
+class ToolSpec:
+    """A tool's schema plus its argument checks, compiled once per process"""
+
+    __slots__ = ("name", "schema", "handler", "params", "required", "enums", "missing_error", "timeout", "ordered", "normalize")
+
+    def __init__(
+        self,
+        schema: Dict[str, Any],
+        handler: str,
+        missing_error: Optional[Dict[str, str]] = None,
+        timeout: float = 5.0,
+        ordered: bool = False,
+        normalize: Optional[Callable[[Dict[str, Optional[str]]], Optional[Dict[str, str]]]] = None,
+    ):
+        parameters = schema["parameters"]
+        self.name: str = schema["name"]
+        self.schema = schema
+        # Name of the AppointmentTools coroutine; its parameters match the schema's properties
+        self.handler = handler
+        # Seconds the handler may run; override per tool with e.g. TOOL_TIMEOUT_BOOK_APPOINTMENT=8
+        self.timeout = float(os.getenv(f"TOOL_TIMEOUT_{self.name.upper()}", timeout))
+        # Ordered tools read or change the session user's appointments, so calls
+        # from one LLM turn run one at a time in the order they were emitted
+        self.ordered = ordered
+        # Rewrites validated arguments in place; returns an error result if it can't
+        self.normalize = normalize
+        self.params: Tuple[str, ...] = tuple(parameters.get("properties", {}))
+        self.required = frozenset(parameters.get("required", ()))
+        self.enums: Dict[str, frozenset] = {
+            name: frozenset(prop["enum"])
+            for name, prop in parameters.get("properties", {}).items()
+            if "enum" in prop
+        }
+        self.missing_error = missing_error
+
+    def validate(self, raw_arguments: Dict[str, Any]) -> Tuple[Dict[str, Optional[str]], Optional[Dict[str, str]]]:
+        """Coerce arguments to strings and check required/enum fields.
+
+        Returns (kwargs, None) or (partial kwargs, error result).
+        """
+        kwargs: Dict[str, Optional[str]] = {}
+        for name in self.params:
+            value = raw_arguments.get(name)
+            kwargs[name] = str(value) if value else None
+        missing = [name for name in self.required if not kwargs[name]]
+        if missing:
+            return kwargs, self.missing_error or {"error": f"Missing required argument(s): {', '.join(missing)}"}
+        for name, allowed in self.enums.items():
+            if kwargs[name] is not None and kwargs[name] not in allowed:
+                return kwargs, {"error": f"Invalid {name}: {kwargs[name]}. Expected one of: {', '.join(sorted(str(v) for v in allowed if v))}"}
+        if self.normalize:
+            return kwargs, self.normalize(kwargs)
+        return kwargs, None
+
+
+def _resolve_slot_arguments(kwargs: Dict[str, Optional[str]]) -> Optional[Dict[str, str]]:
+    """Turn spoken dates and times ("next Tuesday", "2pm") into YYYY-MM-DD and HH:MM"""
+    try:
+        if kwargs.get("date"):
+            kwargs["date"] = resolve_date(kwargs["date"]).isoformat()
+        if kwargs.get("time"):
+            kwargs["time"] = resolve_time(kwargs["time"])
+    except DateParseError as e:
+        return {
+            "error": str(e),
+            "message": "Ask the user to repeat the day or time, or pass YYYY-MM-DD and HH:MM.",
+        }
+    return None
+
+
+_APPOINTMENT_ID_REQUIRED = {"error": "Appointment ID is required"}
+
+# Tools with side effects on the appointments table
+MUTATING_TOOLS = frozenset({
+    "book_appointment", "book_recurring_appointments", "cancel_appointment", "modify_appointment",
+})
+# A timed-out write is abandoned, not rolled back, so it may have committed
+_UNCERTAIN_WRITE = "The change may still have gone through; check with retrieve_appointments before retrying."
+
+# Longest date range find_best_slots searches in one call
+MAX_SLOT_SEARCH_DAYS = 28
+
+# Longest series book_recurring_appointments will book in one call
+MAX_RECURRING_OCCURRENCES = 12
+_RECURRENCE_DAYS = {"daily": 1, "weekly": 7, "biweekly": 14}
+
+# Built and validated once per worker process, shared by every session
+TOOL_SPECS: Dict[str, ToolSpec] = {spec.name: spec for spec in (
+    ToolSpec(
+        {
+            "name": "identify_user",
+            "description": "Ask for and store user's phone number to identify them. Use this first before booking appointments.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "phone": {
+                        "type": "string",
+                        "description": "User's phone number (e.g., +1234567890). IMPORTANT: You must first ask the user for their phone number in conversation, wait for their response, then call this tool with the phone number they provide. Do not call this tool without a phone number.",
                     },
                 },
-            ),
-            llm.function_tool(
-                fetch_slots,
-                raw_schema={
-                    "name": "fetch_slots",
-                    "description": "Fetch available appointment slots. Returns ONLY slots that are not already booked. Slots are available at 9 AM, 11 AM, 2 PM, and 4 PM for the next 7 days. When booking, you can book the first available slot from the results.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "date": {
-                                "type": "string",
-                                "description": "Optional date to fetch slots for (YYYY-MM-DD). If not provided, returns available slots for next 7 days.",
-                            },
-                        },
+                "required": ["phone"],
+            },
+        },
+        handler="_identify_user",
+        timeout=4.0,
+        # Later calls in the same turn need the user it sets
+        ordered=True,
+        missing_error={
+            "error": "Phone number is required",
+            "message": "Please ask the user for their phone number first, then call this tool again with the phone number they provide.",
+        },
+    ),
+    ToolSpec(
+        {
+            "name": "fetch_slots",
+            "description": "Fetch available appointment slots. Returns ONLY slots that are not already booked. Slots are available at 9 AM, 11 AM, 2 PM, and 4 PM for the next 7 days, returned grouped by date as {date: [times]}. When booking, you can book the first available slot from the results.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "date": {
+                        "type": "string",
+                        "description": "Optional day and/or time of day, as YYYY-MM-DD or in the user's words (e.g. 'tomorrow', 'next Tuesday afternoon', 'Friday at 2pm'). Returns only matching slots. If not provided, returns available slots for next 7 days.",
                     },
                 },
-            ),
-            llm.function_tool(
-                book_appointment,
-                raw_schema={
-                    "name": "book_appointment",
-                    "description": "Book an appointment for the user. Requires user to be identified first. IMPORTANT: Only book slots that were returned by fetch_slots - those are guaranteed to be available. When user wants to book, first call fetch_slots to get available slots, then book the first available slot from the results.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "date": {
-                                "type": "string",
-                                "description": "Appointment date in YYYY-MM-DD format. Must be from available slots returned by fetch_slots.",
-                            },
-                            "time": {
-                                "type": "string",
-                                "description": "Appointment time in HH:MM format (24-hour). Must be from available slots returned by fetch_slots (09:00, 11:00, 14:00, or 16:00).",
-                            },
-                            "notes": {
-                                "type": "string",
-                                "description": "Optional notes about the appointment",
-                            },
-                        },
-                        "required": ["date", "time"],
+            },
+        },
+        handler="_fetch_slots",
+        timeout=4.0,
+    ),
+    ToolSpec(
+        {
+            "name": "find_best_slots",
+            "description": "Find the best few free slots for the user's constraints instead of listing every open slot. Use this when the user has preferences (days of the week, time of day, a date range, or close to an existing appointment). Returns the top slots, best first.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "earliest": {
+                        "type": "string",
+                        "description": "Optional first acceptable day, as YYYY-MM-DD or a phrase like 'next Monday'. Defaults to today.",
+                    },
+                    "latest": {
+                        "type": "string",
+                        "description": "Optional last acceptable day, as YYYY-MM-DD or a phrase like 'end of next week' / 'Friday'. Defaults to 6 days after earliest.",
+                    },
+                    "weekdays": {
+                        "type": "string",
+                        "description": "Optional acceptable days of the week, comma-separated (e.g. 'tuesday, thursday' or 'weekdays')",
+                    },
+                    "daypart": {
+                        "type": "string",
+                        "description": "Optional time of day the user prefers",
+                        "enum": ["morning", "afternoon", "evening"],
+                    },
+                    "near_appointment_id": {
+                        "type": "string",
+                        "description": "Optional ID of one of the user's appointments; slots closest to it are ranked first",
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "How many slots to return (default 3)",
                     },
                 },
-            ),
-            llm.function_tool(
-                retrieve_appointments,
-                raw_schema={
-                    "name": "retrieve_appointments",
-                    "description": "Retrieve all appointments for the identified user.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "status": {
-                                "type": "string",
-                                "description": "Optional filter by status: 'confirmed', 'cancelled', or None for all",
-                                "enum": ["confirmed", "cancelled", None],
-                            },
-                        },
+            },
+        },
+        handler="_find_best_slots",
+        timeout=4.0,
+    ),
+    ToolSpec(
+        {
+            "name": "book_appointment",
+            "description": "Book an appointment for the user. Requires user to be identified first. IMPORTANT: Only book slots that were returned by fetch_slots - those are guaranteed to be available. When user wants to book, first call fetch_slots to get available slots, then book the first available slot from the results.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "date": {
+                        "type": "string",
+                        "description": "Appointment date in YYYY-MM-DD format (phrases like 'next Tuesday' are also accepted). Must be from available slots returned by fetch_slots.",
+                    },
+                    "time": {
+                        "type": "string",
+                        "description": "Appointment time in HH:MM format (24-hour; '2pm' is also accepted). Must be from available slots returned by fetch_slots (09:00, 11:00, 14:00, or 16:00).",
+                    },
+                    "notes": {
+                        "type": "string",
+                        "description": "Optional notes about the appointment",
                     },
                 },
-            ),
-            llm.function_tool(
-                cancel_appointment,
-                raw_schema={
-                    "name": "cancel_appointment",
-                    "description": "Cancel a specific appointment by ID.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "appointment_id": {
-                                "type": "string",
-                                "description": "The ID of the appointment to cancel",
-                            },
-                        },
-                        "required": ["appointment_id"],
+                "required": ["date", "time"],
+            },
+        },
+        handler="_book_appointment",
+        timeout=6.0,
+        ordered=True,
+        normalize=_resolve_slot_arguments,
+        missing_error={"error": "Date and time are required"},
+    ),
+    ToolSpec(
+        {
+            "name": "book_recurring_appointments",
+            "description": "Book a series of appointments at the same time in one call, e.g. weekly for 6 weeks. Requires user to be identified first. Returns which occurrences were booked and which slots were already taken.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "date": {
+                        "type": "string",
+                        "description": "Date of the first appointment in YYYY-MM-DD format (phrases like 'next Tuesday' are also accepted)",
+                    },
+                    "time": {
+                        "type": "string",
+                        "description": "Time of every appointment in HH:MM format (24-hour): 09:00, 11:00, 14:00, or 16:00",
+                    },
+                    "frequency": {
+                        "type": "string",
+                        "description": "How often the appointment repeats",
+                        "enum": ["daily", "weekly", "biweekly"],
+                    },
+                    "occurrences": {
+                        "type": "integer",
+                        "description": f"Total number of appointments to book, including the first (max {MAX_RECURRING_OCCURRENCES})",
+                    },
+                    "notes": {
+                        "type": "string",
+                        "description": "Optional notes for every appointment in the series",
                     },
                 },
-            ),
-            llm.function_tool(
-                modify_appointment,
-                raw_schema={
-                    "name": "modify_appointment",
-                    "description": "Modify an existing appointment's date, time, or notes.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "appointment_id": {
-                                "type": "string",
-                                "description": "The ID of the appointment to modify",
-                            },
-                            "date": {
-                                "type": "string",
-                                "description": "New appointment date in YYYY-MM-DD format",
-                            },
-                            "time": {
-                                "type": "string",
-                                "description": "New appointment time in HH:MM format (24-hour)",
-                            },
-                            "notes": {
-                                "type": "string",
-                                "description": "Updated notes for the appointment",
-                            },
-                        },
-                        "required": ["appointment_id"],
+                "required": ["date", "time", "frequency", "occurrences"],
+            },
+        },
+        handler="_book_recurring_appointments",
+        timeout=8.0,
+        ordered=True,
+        normalize=_resolve_slot_arguments,
+    ),
+    ToolSpec(
+        {
+            "name": "retrieve_appointments",
+            "description": "Retrieve all appointments for the identified user.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "status": {
+                        "type": "string",
+                        "description": "Optional filter by status: 'confirmed', 'cancelled', or None for all",
+                        "enum": ["confirmed", "cancelled", None],
                     },
                 },
-            ),
-            llm.function_tool(
-                end_conversation,
-                raw_schema={
-                    "name": "end_conversation",
-                    "description": "End the conversation and generate a summary. Use this when the user wants to end the call.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {},
+            },
+        },
+        handler="_retrieve_appointments",
+        timeout=4.0,
+        ordered=True,
+    ),
+    ToolSpec(
+        {
+            "name": "cancel_appointment",
+            "description": "Cancel a specific appointment by ID.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "appointment_id": {
+                        "type": "string",
+                        "description": "The ID of the appointment to cancel",
                     },
                 },
-            ),
+                "required": ["appointment_id"],
+            },
+        },
+        handler="_cancel_appointment",
+        timeout=6.0,
+        ordered=True,
+        missing_error=_APPOINTMENT_ID_REQUIRED,
+    ),
+    ToolSpec(
+        {
+            "name": "modify_appointment",
+            "description": "Modify an existing appointment's date, time, or notes.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "appointment_id": {
+                        "type": "string",
+                        "description": "The ID of the appointment to modify",
+                    },
+                    "date": {
+                        "type": "string",
+                        "description": "New appointment date in YYYY-MM-DD format",
+                    },
+                    "time": {
+                        "type": "string",
+                        "description": "New appointment time in HH:MM format (24-hour)",
+                    },
+                    "notes": {
+                        "type": "string",
+                        "description": "Updated notes for the appointment",
+                    },
+                },
+                "required": ["appointment_id"],
+            },
+        },
+        handler="_modify_appointment",
+        timeout=6.0,
+        ordered=True,
+        normalize=_resolve_slot_arguments,
+        missing_error=_APPOINTMENT_ID_REQUIRED,
+    ),
+    ToolSpec(
+        {
+            "name": "end_conversation",
+            "description": "End the conversation and generate a summary. Use this when the user wants to end the call.",
+            "parameters": {
+                "type": "object",
+                "properties": {},
+            },
+        },
+        handler="_end_conversation",
+        timeout=2.0,
+    ),
+)}
+
+
+class AppointmentTools:
+    def __init__(self, db: Database, session_id: Optional[str] = None):
+        self.db = db
+        self.session_id = session_id or uuid.uuid4().hex
+        self.user_phone = None
+        # kind ("slots" / "appointments") -> (started_at, task)
+        self._prefetched: Dict[str, Tuple[float, asyncio.Task]] = {}
+        # FIFO: ordered tools acquire it in the order the LLM emitted them
+        self._ordered_lock = asyncio.Lock()
+        # Idempotency key -> result of a mutating tool, and calls still running
+        self._mutation_results = TTLCache(maxsize=64, ttl=IDEMPOTENCY_TTL)
+        self._mutations_in_flight: Dict[str, asyncio.Future] = {}
+        # Set by the agent once the AgentSession exists
+        self.filler: Optional[FillerSpeech] = None
+        self.tracer: Optional[TurnTracer] = None
+
+    def get_tool_definitions(self) -> List[llm.RawFunctionTool]:
+        """Bind the process-wide tool specs to this session"""
+        return [
+            llm.function_tool(self._bind(spec), raw_schema=spec.schema)
+            for spec in TOOL_SPECS.values()
         ]
 
+    def _bind(self, spec: ToolSpec):
+        # When using raw_schema, functions must accept raw_arguments: dict[str, object]
+        # This is the format LiveKit expects for raw function tools
+        # The result goes into the prompt as compact, token-budgeted JSON
+        async def call(raw_arguments: dict[str, object], context: RunContext = None) -> str:
+            traced = self.tracer.tool_span(spec.name) if self.tracer else nullcontext()
+            masked = self.filler.masking(context) if self.filler else nullcontext()
+            async with traced, masked:
+                result = await self._dispatch(spec, raw_arguments)
+            return encode_result(result)
+        return call
+
+    async def _dispatch(self, spec: ToolSpec, raw_arguments: Dict[str, Any]) -> Dict[str, Any]:
+        kwargs, error = spec.validate(raw_arguments)
+        if error:
+            return error
+        if spec.name in MUTATING_TOOLS:
+            return await self._dispatch_once(spec, kwargs)
+        return await self._run_ordered(spec, kwargs)
+
+    async def _dispatch_once(self, spec: ToolSpec, kwargs: Dict[str, Optional[str]]) -> Dict[str, Any]:
+        """Run a mutating tool at most once per idempotency key.
+
+        A retry with the same arguments gets the original result without
+        touching the database, or waits for the original call if it is still running.
+        """
+        key = idempotency_key(self.session_id, spec.name, kwargs)
+        result = self._mutation_results.get(key)
+        if result is not None:
+            IDEMPOTENCY_STATS["replayed"] += 1
+            return result
+        in_flight = self._mutations_in_flight.get(key)
+        if in_flight is not None:
+            IDEMPOTENCY_STATS["joined"] += 1
+            return await asyncio.shield(in_flight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._mutations_in_flight[key] = future
+        try:
+            result = await self._run_ordered(spec, kwargs)
+        except BaseException:
+            future.set_result({
+                "error": f"{spec.name} was interrupted",
+                "message": "Check with retrieve_appointments before retrying.",
+            })
+            raise
+        finally:
+            self._mutations_in_flight.pop(key, None)
+        # Timeouts and transient failures stay retryable; outcomes don't
+        if result.get("success") or result.get("conflict"):
+            # Any new change makes earlier results stale (book, cancel, book again)
+            self._mutation_results.clear()
+            self._mutation_results.set(key, result)
+        future.set_result(result)
+        return result
+
+    async def _run_ordered(self, spec: ToolSpec, kwargs: Dict[str, Optional[str]]) -> Dict[str, Any]:
+        if spec.ordered:
+            async with self._ordered_lock:
+                return await self._run_handler(spec, kwargs)
+        # Everything else runs alongside the other calls of the turn
+        return await self._run_handler(spec, kwargs)
+
+    async def _run_handler(self, spec: ToolSpec, kwargs: Dict[str, Optional[str]]) -> Dict[str, Any]:
+        try:
+            return await asyncio.wait_for(getattr(self, spec.handler)(**kwargs), spec.timeout)
+        except asyncio.TimeoutError:
+            error = {"error": f"{spec.name} timed out after {spec.timeout:g}s", "timeout": True}
+            if spec.name in MUTATING_TOOLS:
+                error["message"] = _UNCERTAIN_WRITE
+            return error
+
     async def execute_tool(self, tool_call: llm.FunctionToolCall) -> Dict[str, Any]:
         """Execute a tool call"""
         function_name = tool_call.name
+        spec = TOOL_SPECS.get(function_name)
+        if spec is None:
+            return {"error": f"Unknown tool: {function_name}"}
         args = json.loads(tool_call.arguments) if isinstance(
             tool_call.arguments, str
         ) else tool_call.arguments
 
         try:
-            if function_name == "identify_user":
-                return await self._identify_user(args.get("phone"))
-            elif function_name == "fetch_slots":
-                return await self._fetch_slots(args.get("date"))
-            elif function_name == "book_appointment":
-                return await self._book_appointment(
-                    args.get("date"),
-                    args.get("time"),
-                    args.get("notes"),
-                )
-            elif function_name == "retrieve_appointments":
-                return await self._retrieve_appointments(args.get("status"))
-            elif function_name == "cancel_appointment":
-                return await self._cancel_appointment(args.get("appointment_id"))
-            elif function_name == "modify_appointment":
-                return await self._modify_appointment(
-                    args.get("appointment_id"),
-                    args.get("date"),
-                    args.get("time"),
-                    args.get("notes"),
-                )
-            elif function_name == "end_conversation":
-                return await self._end_conversation()
-            else:
-                return {"error": f"Unknown tool: {function_name}"}
+            return await self._dispatch(spec, args or {})
         except Exception as e:
             return {"error": str(e), "tool": function_name}
 
+    async def execute_tools(self, tool_calls: List[llm.FunctionToolCall]) -> List[Dict[str, Any]]:
+        """Execute all tool calls from one LLM turn concurrently, results in call order"""
+        return await asyncio.gather(*(self.execute_tool(tool_call) for tool_call in tool_calls))
+
+
+    @_within_latency_budget
     async def _identify_user(self, phone: str) -> Dict[str, Any]:
         """Identify user by phone number"""
         if not phone:
             return {"error": "Phone number is required"}
         
         self.user_phone = phone
-        user = await self.db.get_user_by_phone(phone)
-        
-        if not user:
-            user = await self.db.create_user(phone)
+        user = await self.db.get_or_create_user(phone)
+        self._start_prefetch(phone)
         
         return {
             "success": True,
@@ -258,14 +521,169 @@ class AppointmentTools:
             "message": f"User identified: {phone}",
         }
 
+    def _start_prefetch(self, phone: str) -> None:
+        """Warm the reads the LLM almost always makes right after identify_user"""
+        if not PREFETCH_ENABLED:
+            return
+        self._discard_prefetch()
+        started_at = time_module.monotonic()
+        # Run outside the identify_user latency budget, which is about to end
+        context = contextvars.Context()
+        for kind, coro in (
+            ("slots", self.db.get_available_slots(None)),
+            ("appointments", self.db.get_user_appointments(phone, None)),
+        ):
+            self._prefetched[kind] = (started_at, context.run(asyncio.create_task, coro))
+            PREFETCH_STATS["started"] += 1
+
+    async def _take_prefetch(self, kind: str) -> Optional[Any]:
+        """Prefetched result for ``kind`` if fresh, else None"""
+        entry = self._prefetched.pop(kind, None)
+        if entry is None:
+            return None
+        started_at, task = entry
+        if time_module.monotonic() - started_at > PREFETCH_TTL:
+            task.cancel()
+            PREFETCH_STATS["wasted"] += 1
+            return None
+        try:
+            result = await task
+        except Exception:
+            PREFETCH_STATS["wasted"] += 1
+            return None
+        PREFETCH_STATS["used"] += 1
+        return result
+
+    def _discard_prefetch(self) -> None:
+        """Drop prefetched reads, e.g. because a mutation made them stale"""
+        for _, task in self._prefetched.values():
+            task.cancel()
+            PREFETCH_STATS["wasted"] += 1
+        self._prefetched.clear()
+
+    def close(self) -> None:
+        """End of session: anything still prefetched was never used"""
+        self._discard_prefetch()
+
+    @_within_latency_budget
     async def _fetch_slots(self, date: Optional[str] = None) -> Dict[str, Any]:
-        """Fetch available appointment slots"""
-        slots = await self.db.get_available_slots(date)
-        return {
+        """Fetch available appointment slots, narrowed to a phrase like "next Tuesday afternoon" """
+        try:
+            when = parse_when(date)
+        except DateParseError as e:
+            return {
+                "error": str(e),
+                "message": "Ask the user which day they mean, or pass YYYY-MM-DD.",
+            }
+        today = datetime.now().date()
+        if when.date and when.date < today:
+            return {"error": f"{when.date.isoformat()} is in the past. Ask the user for a future day."}
+
+        day = when.date.isoformat() if when.date else None
+        slots = None
+        if not day or when.date == today:
+            slots = await self._take_prefetch("slots")
+        if slots is None:
+            slots = await self.db.get_available_slots(day)
+
+        result: Dict[str, Any] = {"success": True}
+        if when.times is not None:
+            slots = [slot for slot in slots if slot["time"] in when.times]
+            if when.daypart:
+                result["daypart"] = when.daypart
+        if when.end:
+            # A week or weekend; the 7-day window from its first day covers all of it
+            last = when.end.isoformat()
+            result["date"] = f"{day} ({when.date:%A}) to {last} ({when.end:%A})"
+            in_range = [slot for slot in slots if day <= slot["date"] <= last]
+            if not in_range:
+                result["message"] = f"No matching free slots from {day} to {last}. These are the next ones."
+                in_range = slots[:len(SLOT_TIMES)]
+            slots = in_range
+        elif when.date:
+            result["date"] = f"{day} ({when.date:%A})"
+            on_day = [slot for slot in slots if slot["date"] == day]
+            if not on_day:
+                # The window is already loaded, so offer the nearest alternatives
+                result["message"] = f"No matching free slots on {when.date:%A} {day}. These are the next ones."
+                on_day = slots[:len(SLOT_TIMES)]
+            slots = on_day
+        if not slots and when.times is not None:
+            # Nothing left after the time filter; say why rather than return an empty list
+            wanted = f"at {when.times[0]}" if len(when.times) == 1 else f"in the {when.daypart}"
+            result["message"] = (
+                f"No free slots {wanted} in the days searched. Appointments start at "
+                f"{', '.join(SLOT_TIMES)}; offer one of those times or another day."
+            )
+        result["slots"] = group_slots(slots)
+        result["count"] = len(slots)
+        return result
+
+    @_within_latency_budget
+    async def _find_best_slots(
+        self,
+        earliest: Optional[str] = None,
+        latest: Optional[str] = None,
+        weekdays: Optional[str] = None,
+        daypart: Optional[str] = None,
+        near_appointment_id: Optional[str] = None,
+        limit: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Rank free slots against the user's constraints and return the top few"""
+        today = datetime.now().date()
+        near = None
+        if near_appointment_id:
+            if not self.user_phone:
+                return {
+                    "error": "User must be identified first. Please use identify_user tool.",
+                }
+            appointments = await self.db.get_user_appointments(self.user_phone)
+            anchor = next((a for a in appointments if str(a.get("id")) == near_appointment_id), None)
+            parts = split_datetime(str(anchor.get("appointment_datetime"))) if anchor else None
+            if not parts:
+                return {"error": f"Appointment {near_appointment_id} not found for this user"}
+            near = datetime.fromisoformat(f"{parts[0]}T{parts[1]}")
+
+        try:
+            start = resolve_range(earliest)[0] if earliest else max(today, (near.date() if near else today) - timedelta(days=7))
+            if latest:
+                # "latest: next week" means up to the end of that week
+                end = resolve_range(latest)[1]
+            else:
+                end = (near.date() + timedelta(days=7)) if near else start + timedelta(days=6)
+            allowed_weekdays = parse_weekdays(weekdays) if weekdays else None
+        except ValueError as e:
+            return {"error": str(e)}
+        try:
+            count = int(float(limit)) if limit else 3
+        except (ValueError, OverflowError):
+            return {"error": f"Invalid limit: {limit}. Expected a number."}
+        if count < 1:
+            return {"error": f"Limit must be at least 1, got {limit}"}
+        start = max(start, today)
+        if end < start:
+            return {"error": f"The latest day ({end.isoformat()}) is before the earliest ({start.isoformat()})"}
+        end = min(end, start + timedelta(days=MAX_SLOT_SEARCH_DAYS - 1))
+
+        slots = await self.db.get_available_slots_between(start.isoformat(), end.isoformat())
+        ranked = rank_slots(
+            slots,
+            SlotConstraints(
+                weekdays=allowed_weekdays,
+                dayparts=frozenset({daypart}) if daypart else None,
+                near=near,
+            ),
+            k=count,
+        )
+        result: Dict[str, Any] = {
             "success": True,
-            "slots": slots,
-            "count": len(slots),
+            "slots": ranked,
+            "count": len(ranked),
+            "searched": f"{start.isoformat()} to {end.isoformat()}",
         }
+        if not ranked:
+            result["message"] = "No free slots match. Suggest widening the days, time of day or date range."
+        return result
 
     async def _book_appointment(
         self,
@@ -282,6 +700,7 @@ class AppointmentTools:
         if not date or not time:
             return {"error": "Date and time are required"}
         
+        self._discard_prefetch()
         try:
             appointment = await self.db.book_appointment(
                 user_phone=self.user_phone,
@@ -291,14 +710,65 @@ class AppointmentTools:
             )
             return {
                 "success": True,
-                "appointment": appointment,
+                "appointment": project_appointment(appointment),
                 "message": f"Appointment booked for {date} at {time}",
             }
+        except SlotConflictError as e:
+            return {"error": str(e), "conflict": True}
         except ValueError as e:
             return {"error": str(e)}
         except Exception as e:
-            return {"error": f"Failed to book appointment: {str(e)}"}
+            return _write_error("book appointment", e)
 
+    async def _book_recurring_appointments(
+        self,
+        date: str,
+        time: str,
+        frequency: str,
+        occurrences: str,
+        notes: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Book a recurring series with one bulk insert"""
+        if not self.user_phone:
+            return {
+                "error": "User must be identified first. Please use identify_user tool.",
+            }
+        try:
+            count = int(float(occurrences))
+        except (ValueError, OverflowError):
+            return {"error": f"Invalid occurrences: {occurrences}. Expected a number."}
+        if not 1 <= count <= MAX_RECURRING_OCCURRENCES:
+            return {"error": f"Occurrences must be between 1 and {MAX_RECURRING_OCCURRENCES}"}
+
+        first = datetime.strptime(date, "%Y-%m-%d")
+        step = timedelta(days=_RECURRENCE_DAYS[frequency])
+        dates = [(first + step * i).strftime("%Y-%m-%d") for i in range(count)]
+
+        self._discard_prefetch()
+        try:
+            results = await self.db.book_appointments(
+                user_phone=self.user_phone,
+                occurrences=[(day, time) for day in dates],
+                notes=notes,
+            )
+        except Exception as e:
+            return _write_error("book appointments", e)
+
+        booked = [project_appointment(r["appointment"]) for r in results if r["status"] == "booked"]
+        unavailable = [
+            {key: r[key] for key in ("date", "time", "status", "error") if key in r}
+            for r in results if r["status"] != "booked"
+        ]
+        result: Dict[str, Any] = {
+            "success": bool(booked),
+            "booked": booked,
+            "message": f"Booked {len(booked)} of {count} {frequency} appointments at {time}",
+        }
+        if unavailable:
+            result["unavailable"] = unavailable
+        return result
+
+    @_within_latency_budget
     async def _retrieve_appointments(self, status: Optional[str] = None) -> Dict[str, Any]:
         """Retrieve user's appointments"""
         if not self.user_phone:
@@ -306,13 +776,17 @@ class AppointmentTools:
                 "error": "User must be identified first. Please use identify_user tool.",
             }
         
-        appointments = await self.db.get_user_appointments(
-            user_phone=self.user_phone,
-            status=status,
-        )
+        appointments = await self._take_prefetch("appointments")
+        if appointments is None:
+            appointments = await self.db.get_user_appointments(
+                user_phone=self.user_phone,
+                status=status,
+            )
+        elif status:
+            appointments = [a for a in appointments if a.get("status") == status]
         return {
             "success": True,
-            "appointments": appointments,
+            "appointments": [project_appointment(a) for a in appointments],
             "count": len(appointments),
         }
 
@@ -321,15 +795,16 @@ class AppointmentTools:
         if not appointment_id:
             return {"error": "Appointment ID is required"}
         
+        self._discard_prefetch()
         try:
             appointment = await self.db.cancel_appointment(appointment_id)
             return {
                 "success": True,
-                "appointment": appointment,
+                "appointment": project_appointment(appointment),
                 "message": "Appointment cancelled successfully",
             }
         except Exception as e:
-            return {"error": f"Failed to cancel appointment: {str(e)}"}
+            return _write_error("cancel appointment", e)
 
     async def _modify_appointment(
         self,
@@ -342,6 +817,7 @@ class AppointmentTools:
         if not appointment_id:
             return {"error": "Appointment ID is required"}
         
+        self._discard_prefetch()
         try:
             appointment = await self.db.modify_appointment(
                 appointment_id=appointment_id,
@@ -351,11 +827,15 @@ class AppointmentTools:
             )
             return {
                 "success": True,
-                "appointment": appointment,
+                "appointment": project_appointment(appointment),
                 "message": "Appointment modified successfully",
             }
+        except SlotConflictError as e:
+            return {"error": str(e), "conflict": True}
+        except ValueError as e:
+            return {"error": str(e)}
         except Exception as e:
-            return {"error": f"Failed to modify appointment: {str(e)}"}
+            return _write_error("modify appointment", e)
 
     async def _end_conversation(self) -> Dict[str, Any]:
         """End conversation"""
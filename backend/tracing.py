@@ -0,0 +1,316 @@
+"""
+Per-turn voice latency tracing
+
+A turn starts when the user stops speaking and ends when the agent is audible.
+Stage boundaries are monotonic timestamps taken from the AgentSession events
+(user/agent state, final transcripts) and from the LLM/TTS metrics, whose
+wall-clock times are mapped onto the monotonic clock. Durations go into
+per-session and per-process histograms; finished turns can be appended to a
+JSONL file and/or sent as spans to an OTLP collector.
+"""
+import json
+import logging
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, List, Optional
+
+from livekit.agents.metrics import LLMMetrics, TTSMetrics
+from livekit.agents.voice import AgentSession
+
+logger = logging.getLogger(__name__)
+
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "true").lower() == "true"
+# One JSON line per turn; empty = no file
+TRACE_FILE = os.getenv("TRACE_FILE", "")
+# OTLP/HTTP traces endpoint, e.g. http://localhost:4318/v1/traces; empty = no export
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "")
+
+# Upper bounds (ms) of the histogram buckets; anything slower lands in +Inf
+LATENCY_BUCKETS_MS = (100, 200, 300, 500, 750, 1000, 1500, 2000, 3000, 5000)
+
+# Stage -> (start mark, end mark). "turn" is what the user experiences.
+STAGES = {
+    "stt": ("end_of_speech", "stt_final"),
+    "llm_ttft": ("llm_start", "llm_first_token"),
+    "tools": ("tool_start", "tool_end"),
+    "tts_ttfb": ("tts_start", "tts_first_byte"),
+    "turn": ("end_of_speech", "first_audio"),
+}
+
+
+def _percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[round((len(ordered) - 1) * pct)]
+
+
+class LatencyHistogram:
+    """Bucketed counts for export, plus a window of samples for exact percentiles"""
+
+    def __init__(self, window: int = 1000):
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def record(self, ms: float) -> None:
+        self.count += 1
+        self._samples.append(ms)
+        for index, bound in enumerate(LATENCY_BUCKETS_MS):
+            if ms <= bound:
+                self.buckets[index] += 1
+                return
+        self.buckets[-1] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        if not self.count:
+            return {"count": 0}
+        labels = [f"le_{bound}" for bound in LATENCY_BUCKETS_MS] + ["inf"]
+        return {
+            "count": self.count,
+            "p50_ms": round(_percentile(self._samples, 0.5)),
+            "p95_ms": round(_percentile(self._samples, 0.95)),
+            "max_ms": round(max(self._samples)),
+            "buckets": dict(zip(labels, self.buckets)),
+        }
+
+
+class TurnStats:
+    """One histogram per stage, plus how many turns were cut short"""
+
+    def __init__(self):
+        self.stages = {stage: LatencyHistogram() for stage in STAGES}
+        self.interrupted = 0
+
+    def record(self, durations: Dict[str, float], interrupted: bool) -> None:
+        if interrupted:
+            self.interrupted += 1
+        for stage, ms in durations.items():
+            self.stages[stage].record(ms)
+
+    def turn_latency(self) -> Dict[str, Any]:
+        """p50/p95 from end of user speech to first agent audio"""
+        snapshot = self.stages["turn"].snapshot()
+        return {key: snapshot[key] for key in ("count", "p50_ms", "p95_ms", "max_ms") if key in snapshot}
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "turn": self.turn_latency(),
+            "stages": {stage: histogram.snapshot() for stage, histogram in self.stages.items()},
+            "interrupted": self.interrupted,
+        }
+
+
+# Every session in this process
+TRACE_STATS = TurnStats()
+
+
+class _Turn:
+    def __init__(self, index: int, end_of_speech: float):
+        self.index = index
+        self.marks: Dict[str, float] = {"end_of_speech": end_of_speech}
+        self.tools: List[Dict[str, Any]] = []
+
+    def mark(self, name: str, at: float, first: bool = True) -> None:
+        """Record a boundary; by default the first occurrence in the turn wins"""
+        if not first or name not in self.marks:
+            self.marks[name] = at
+
+    def durations(self) -> Dict[str, float]:
+        durations = {}
+        for stage, (start, end) in STAGES.items():
+            if start in self.marks and end in self.marks:
+                durations[stage] = max(0.0, (self.marks[end] - self.marks[start]) * 1000)
+        return durations
+
+
+class _OtlpExporter:
+    """Sends each turn as a span with one child span per stage (needs opentelemetry-sdk)"""
+
+    def __init__(self, endpoint: str):
+        from opentelemetry import trace
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+        # A private provider so the framework's own telemetry setup is left alone
+        self._provider = TracerProvider(resource=Resource.create({"service.name": "voice-agent"}))
+        self._provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=endpoint)))
+        self._tracer = self._provider.get_tracer(__name__)
+        self._in_span = trace.set_span_in_context
+
+    def export(self, record: Dict[str, Any], to_wall_ns) -> None:
+        marks = record["marks_monotonic"]
+        start = to_wall_ns(marks["end_of_speech"])
+        end = to_wall_ns(max(marks.values()))
+        span = self._tracer.start_span("voice.turn", start_time=start, attributes={
+            "session.id": record["session"],
+            "turn.index": record["turn"],
+            "turn.interrupted": record["interrupted"],
+        })
+        for stage, (first, last) in STAGES.items():
+            if stage != "turn" and first in marks and last in marks:
+                child = self._tracer.start_span(
+                    f"voice.{stage}",
+                    context=self._in_span(span),
+                    start_time=to_wall_ns(marks[first]),
+                )
+                child.end(end_time=to_wall_ns(max(marks[first], marks[last])))
+        span.end(end_time=end)
+
+
+_otlp_exporter: Optional[_OtlpExporter] = None
+
+
+def _get_otlp_exporter() -> Optional[_OtlpExporter]:
+    """Process-wide OTLP exporter, created on first use; None if not configured"""
+    global _otlp_exporter
+    if _otlp_exporter is None and TRACE_OTLP_ENDPOINT:
+        try:
+            _otlp_exporter = _OtlpExporter(TRACE_OTLP_ENDPOINT)
+        except ImportError as e:
+            logger.warning(f"TRACE_OTLP_ENDPOINT is set but OTLP export is unavailable: {e}")
+    return _otlp_exporter
+
+
+class TurnTracer:
+    """Follows one AgentSession and records the latency of every user turn.
+
+    Marks per turn: end_of_speech (user stopped talking), stt_final (last final
+    transcript), llm_start / llm_first_token (first LLM request of the turn),
+    tool_start / tool_end (first tool in, last tool out), tts_start /
+    tts_first_byte (first synthesis of the turn) and first_audio (agent audible).
+    A turn is recorded once the agent is back to listening.
+    """
+
+    def __init__(self, session: AgentSession, session_id: Optional[str] = None):
+        self.session_id = session_id
+        self.stats = TurnStats()
+        self._turn: Optional[_Turn] = None
+        self._turns = 0
+        self._speech_started: Optional[float] = None
+        self._last_final: Optional[float] = None
+        # Metrics carry time.time(); shift them onto the monotonic clock
+        self._wall_to_monotonic = time.monotonic() - time.time()
+        self._otlp = _get_otlp_exporter()
+        if not TRACE_ENABLED:
+            return
+        session.on("user_state_changed", self._on_user_state)
+        session.on("user_input_transcribed", self._on_transcript)
+        session.on("agent_state_changed", self._on_agent_state)
+        session.on("metrics_collected", self._on_metrics)
+
+    def _on_user_state(self, ev) -> None:
+        now = time.monotonic()
+        if ev.new_state == "speaking":
+            self._speech_started = now
+        elif ev.old_state == "speaking":
+            self._start_turn(now)
+
+    def _start_turn(self, end_of_speech: float) -> None:
+        turn = self._turn
+        if turn is not None and "llm_start" not in turn.marks:
+            # The user kept talking before the agent replied; same turn, later end
+            turn.marks["end_of_speech"] = end_of_speech
+            turn.marks.pop("stt_final", None)
+        else:
+            if turn is not None:
+                self._finish(interrupted="first_audio" not in turn.marks)
+            self._turns += 1
+            self._turn = _Turn(self._turns, end_of_speech)
+        if self._last_final is not None and self._speech_started is not None and self._last_final >= self._speech_started:
+            # The final transcript was already in when speech ended
+            self._turn.mark("stt_final", end_of_speech)
+
+    def _on_transcript(self, ev) -> None:
+        if not ev.is_final:
+            return
+        now = time.monotonic()
+        self._last_final = now
+        if self._turn is not None and "llm_start" not in self._turn.marks:
+            self._turn.mark("stt_final", now, first=False)
+
+    def _on_agent_state(self, ev) -> None:
+        turn = self._turn
+        if turn is None:
+            return
+        if ev.new_state == "speaking":
+            turn.mark("first_audio", time.monotonic())
+        elif ev.new_state == "listening" and "first_audio" in turn.marks:
+            # Reply finished: the LLM and TTS metrics for it have arrived
+            self._finish(interrupted=False)
+
+    def _on_metrics(self, ev) -> None:
+        turn = self._turn
+        metrics = ev.metrics
+        if turn is None or not isinstance(metrics, (LLMMetrics, TTSMetrics)):
+            return
+        started = metrics.timestamp + self._wall_to_monotonic - metrics.duration
+        if started < turn.marks["end_of_speech"]:
+            return  # belongs to an earlier turn
+        if isinstance(metrics, LLMMetrics) and "llm_start" not in turn.marks:
+            turn.mark("llm_start", started)
+            turn.mark("llm_first_token", started + metrics.ttft)
+        elif isinstance(metrics, TTSMetrics) and "tts_start" not in turn.marks:
+            turn.mark("tts_start", started)
+            turn.mark("tts_first_byte", started + metrics.ttfb)
+
+    @asynccontextmanager
+    async def tool_span(self, name: str):
+        """Wrap a tool call so the turn gets tool_start/tool_end and per-tool timings"""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            finished = time.monotonic()
+            turn = self._turn
+            if TRACE_ENABLED and turn is not None:
+                turn.mark("tool_start", started)
+                turn.mark("tool_end", finished, first=False)
+                turn.tools.append({"name": name, "ms": round((finished - started) * 1000)})
+
+    def _finish(self, interrupted: bool) -> None:
+        turn, self._turn = self._turn, None
+        if turn is None:
+            return
+        durations = turn.durations()
+        if interrupted:
+            # No audio reached the user, so there is no turn latency to count
+            durations.pop("turn", None)
+        self.stats.record(durations, interrupted)
+        TRACE_STATS.record(durations, interrupted)
+        record = {
+            "session": self.session_id,
+            "turn": turn.index,
+            "timestamp": time.time(),
+            "interrupted": interrupted,
+            "stages_ms": {stage: round(ms) for stage, ms in durations.items()},
+            "marks_ms": {
+                name: round((at - turn.marks["end_of_speech"]) * 1000)
+                for name, at in sorted(turn.marks.items(), key=lambda item: item[1])
+            },
+            "tools": turn.tools,
+        }
+        if "turn" in durations:
+            logger.info(f"Turn {turn.index} latency: {record['stages_ms']}")
+        if TRACE_FILE:
+            try:
+                with open(TRACE_FILE, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record) + "\n")
+            except OSError as e:
+                logger.warning(f"Could not write turn trace to {TRACE_FILE}: {e}")
+        if self._otlp is not None:
+            try:
+                self._otlp.export({**record, "marks_monotonic": turn.marks}, self._to_wall_ns)
+            except Exception as e:
+                logger.warning(f"OTLP turn export failed: {e}")
+
+    def _to_wall_ns(self, monotonic: float) -> int:
+        return int((monotonic - self._wall_to_monotonic) * 1e9)
+
+    def close(self) -> None:
+        """Record the turn in progress, if the agent already answered it"""
+        if self._turn is not None and "first_audio" in self._turn.marks:
+            self._finish(interrupted=False)
+        self._turn = None
@@ -0,0 +1,303 @@
+"""
+Content-addressed TTS audio cache for phrases the agent says in every session
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+from livekit.agents import APIConnectOptions, tts
+from livekit.agents.types import DEFAULT_API_CONNECT_OPTIONS
+from livekit.agents.utils import shortuuid
+
+logger = logging.getLogger(__name__)
+
+TTS_CACHE_ENABLED = os.getenv("TTS_CACHE_ENABLED", "true").lower() == "true"
+# Shared by every job process on the machine; empty = memory only
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", ".tts_cache")
+TTS_CACHE_MEMORY_MB = float(os.getenv("TTS_CACHE_MEMORY_MB", "32"))
+TTS_CACHE_DISK_MB = float(os.getenv("TTS_CACHE_DISK_MB", "256"))
+# Fixed phrases to cache besides the greeting and fillers (e.g. confirmations), "|"-separated
+TTS_CACHE_PHRASES = [phrase.strip() for phrase in os.getenv("TTS_CACHE_PHRASES", "").split("|") if phrase.strip()]
+
+# Voice options that change the audio, besides the model and sample rate
+_VOICE_FIELDS = ("voice", "language", "speed", "emotion", "volume", "pronunciation_dict_id", "encoding")
+
+# Process-wide: where each synthesis was served from
+TTS_CACHE_STATS = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "uncached": 0, "evicted": 0}
+
+
+def tts_cache_summary() -> dict:
+    """TTS_CACHE_STATS with the hit rate over registered phrases"""
+    hits = TTS_CACHE_STATS["memory_hits"] + TTS_CACHE_STATS["disk_hits"]
+    lookups = hits + TTS_CACHE_STATS["misses"]
+    return {**TTS_CACHE_STATS, "hit_rate": round(hits / lookups, 3) if lookups else 0.0}
+
+
+def normalize_text(text: str) -> str:
+    """Spacing and Unicode form don't change the audio; case and punctuation do"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+# Normalized texts that are cached; anything else (i.e. LLM output) is synthesized as-is
+_phrases = {normalize_text(phrase) for phrase in TTS_CACHE_PHRASES}
+
+
+def register_phrases(phrases: Iterable[str]) -> None:
+    """Mark phrases the agent says in every session (greeting, fillers) as cacheable"""
+    _phrases.update(normalize_text(phrase) for phrase in phrases)
+
+
+def _voice_of(engine: tts.TTS) -> str:
+    # Plugins keep their voice settings in _opts; read them per request since update_options() can change them
+    opts = getattr(engine, "_opts", None)
+    return repr(tuple(getattr(opts, name, None) for name in _VOICE_FIELDS))
+
+
+def cache_key(engine: tts.TTS, text: str) -> str:
+    """sha256 over (provider, model, voice, audio format, normalized text)"""
+    parts = (engine.provider, engine.model, _voice_of(engine), str(engine.sample_rate), str(engine.num_channels), text)
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class TTSAudioCache:
+    """In-memory LRU of PCM audio in front of a directory of <key>.pcm files.
+
+    Both levels are bounded in bytes. The disk level is shared by the job
+    processes on a machine; each process tracks the files it knows about and
+    evicts the least recently used ones (by mtime) when over budget. Disk I/O
+    runs in a thread so the event loop never waits on it.
+    """
+
+    def __init__(self, directory: str = TTS_CACHE_DIR, memory_bytes: int = 0, disk_bytes: int = 0):
+        self.directory = directory
+        self.memory_bytes = memory_bytes or int(TTS_CACHE_MEMORY_MB * 1024 * 1024)
+        self.disk_bytes = disk_bytes or int(TTS_CACHE_DISK_MB * 1024 * 1024)
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_used = 0
+        # key -> size, oldest first; filled from the directory on first use
+        self._disk: Optional["OrderedDict[str, int]"] = None
+        self._disk_used = 0
+        self._disk_lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pcm")
+
+    def _remember(self, key: str, pcm: bytes) -> None:
+        if len(pcm) > self.memory_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_used -= len(old)
+        self._memory[key] = pcm
+        self._memory_used += len(pcm)
+        while self._memory_used > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_used -= len(evicted)
+
+    def _load_index(self) -> "OrderedDict[str, int]":
+        if self._disk is None:
+            entries = []
+            os.makedirs(self.directory, exist_ok=True)
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.endswith(".pcm"):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, entry.name[:-4], stat.st_size))
+            self._disk = OrderedDict((key, size) for _, key, size in sorted(entries))
+            self._disk_used = sum(self._disk.values())
+        return self._disk
+
+    def _read(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                pcm = f.read()
+            os.utime(path)  # mark as recently used for every process's eviction
+        except FileNotFoundError:
+            return None
+        with self._disk_lock:
+            index = self._load_index()
+            self._disk_used += len(pcm) - index.pop(key, 0)
+            index[key] = len(pcm)
+        return pcm
+
+    def _write(self, key: str, pcm: bytes) -> None:
+        path = self._path(key)
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = f"{path}.{shortuuid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(pcm)
+        # Atomic, so a concurrent reader in another process never sees half a file
+        os.replace(tmp, path)
+        with self._disk_lock:
+            self._evict_disk(key, len(pcm))
+
+    def _evict_disk(self, key: str, size: int) -> None:
+        index = self._load_index()
+        self._disk_used += size - index.pop(key, 0)
+        index[key] = size
+        while self._disk_used > self.disk_bytes and len(index) > 1:
+            evicted, size = index.popitem(last=False)
+            self._disk_used -= size
+            TTS_CACHE_STATS["evicted"] += 1
+            try:
+                os.remove(self._path(evicted))
+            except FileNotFoundError:
+                pass  # another process got there first
+
+    async def get(self, key: str) -> Optional[bytes]:
+        pcm = self._memory.get(key)
+        if pcm is not None:
+            self._memory.move_to_end(key)
+            TTS_CACHE_STATS["memory_hits"] += 1
+            return pcm
+        if self.directory:
+            try:
+                pcm = await asyncio.to_thread(self._read, key)
+            except OSError as e:
+                logger.warning(f"TTS cache read failed: {e}")
+            if pcm is not None:
+                self._remember(key, pcm)
+                TTS_CACHE_STATS["disk_hits"] += 1
+                return pcm
+        TTS_CACHE_STATS["misses"] += 1
+        return None
+
+    def load(self, key: str) -> Optional[bytes]:
+        """Blocking lookup for code that runs without an event loop (process prewarm)"""
+        pcm = self._memory.get(key)
+        if pcm is None and self.directory:
+            try:
+                pcm = self._read(key)
+            except OSError as e:
+                logger.warning(f"TTS cache read failed: {e}")
+            if pcm is not None:
+                self._remember(key, pcm)
+        return pcm
+
+    async def put(self, key: str, pcm: bytes) -> None:
+        self._remember(key, pcm)
+        if self.directory:
+            try:
+                await asyncio.to_thread(self._write, key, pcm)
+            except OSError as e:
+                logger.warning(f"TTS cache write failed: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "memory_items": len(self._memory),
+            "memory_bytes": self._memory_used,
+            "disk_items": len(self._disk or ()),
+            "disk_bytes": self._disk_used,
+        }
+
+
+_cache: Optional[TTSAudioCache] = None
+
+
+def get_tts_cache() -> TTSAudioCache:
+    """The process-wide cache, shared by every CachedTTS in the process"""
+    global _cache
+    if _cache is None:
+        _cache = TTSAudioCache()
+    return _cache
+
+
+class CachedTTS(tts.TTS):
+    """Wraps a TTS so the registered recurring phrases are served from TTSAudioCache.
+
+    synthesize() of a registered phrase (see register_phrases) is pushed
+    straight from memory (or disk) without a provider request, so it starts
+    playing immediately and doesn't use one of the provider's concurrent
+    connections; a miss streams through from the wrapped TTS and is stored
+    once complete. Any other text is passed through uncached.
+
+    stream(), which the session uses for LLM replies, is the wrapped TTS's
+    own stream, so replies keep its streaming latency and are never stored.
+    """
+
+    def __init__(self, wrapped: tts.TTS, cache: Optional[TTSAudioCache] = None):
+        super().__init__(
+            capabilities=tts.TTSCapabilities(
+                streaming=wrapped.capabilities.streaming,
+                aligned_transcript=wrapped.capabilities.aligned_transcript,
+            ),
+            sample_rate=wrapped.sample_rate,
+            num_channels=wrapped.num_channels,
+        )
+        self.wrapped = wrapped
+        self.cache = cache or get_tts_cache()
+        self._markup = wrapped.markup
+        # Streams come from the wrapped TTS, so its metrics are the session's
+        self.wrapped.on("metrics_collected", self._on_metrics_collected)
+
+    @property
+    def model(self) -> str:
+        return self.wrapped.model
+
+    @property
+    def provider(self) -> str:
+        return self.wrapped.provider
+
+    def _set_expressive(self, enabled: bool) -> None:
+        super()._set_expressive(enabled)
+        self.wrapped._set_expressive(enabled)
+
+    def synthesize(
+        self, text: str, *, conn_options: APIConnectOptions = DEFAULT_API_CONNECT_OPTIONS
+    ) -> "_CachedChunkedStream":
+        return _CachedChunkedStream(tts=self, input_text=text, conn_options=conn_options)
+
+    def stream(self, *, conn_options: APIConnectOptions = DEFAULT_API_CONNECT_OPTIONS) -> tts.SynthesizeStream:
+        return self.wrapped.stream(conn_options=conn_options)
+
+    def prewarm(self) -> None:
+        self.wrapped.prewarm()
+
+    def _on_metrics_collected(self, *args: Any, **kwargs: Any) -> None:
+        self.emit("metrics_collected", *args, **kwargs)
+
+    async def aclose(self) -> None:
+        self.wrapped.off("metrics_collected", self._on_metrics_collected)
+        await self.wrapped.aclose()
+
+
+class _CachedChunkedStream(tts.ChunkedStream):
+    def __init__(self, *, tts: CachedTTS, input_text: str, conn_options: APIConnectOptions):
+        super().__init__(tts=tts, input_text=input_text, conn_options=conn_options)
+        self._cached_tts = tts
+
+    async def _run(self, output_emitter: tts.AudioEmitter) -> None:
+        engine = self._cached_tts
+        output_emitter.initialize(
+            request_id=shortuuid(),
+            sample_rate=engine.sample_rate,
+            num_channels=engine.num_channels,
+            mime_type="audio/pcm",
+        )
+        text = normalize_text(self.input_text)
+        if text not in _phrases:
+            TTS_CACHE_STATS["uncached"] += 1
+            key = None
+        else:
+            key = cache_key(engine.wrapped, text)
+            pcm = await engine.cache.get(key)
+            if pcm is not None:
+                output_emitter.push(pcm)
+                output_emitter.flush()
+                return
+
+        chunks = []
+        async with engine.wrapped.synthesize(self.input_text, conn_options=self._conn_options) as stream:
+            async for audio in stream:
+                data = audio.frame.data.tobytes()
+                chunks.append(data)
+                output_emitter.push(data)
+        output_emitter.flush()
+        if key is not None and chunks:
+            await engine.cache.put(key, b"".join(chunks))
@@ -0,0 +1,169 @@
+"""
+Write-behind queue for inserts nobody waits on (summaries, tool-call logs)
+"""
+import asyncio
+import json
+import os
+import uuid
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+InsertMany = Callable[[str, List[Dict[str, Any]]], Awaitable[Any]]
+
+
+class WriteBehindQueue:
+    """Buffers rows in memory and writes them as bulk inserts per table.
+
+    A flush happens when ``max_batch`` rows are pending or ``flush_interval``
+    seconds have passed, whichever comes first. At most ``max_pending`` rows are
+    held in memory; overflow, and any batch the backend rejects, is appended to
+    ``spill_path`` as JSON lines and replayed after the next successful flush.
+    """
+
+    def __init__(
+        self,
+        insert_many: InsertMany,
+        max_batch: int = 50,
+        flush_interval: float = 2.0,
+        max_pending: int = 1000,
+        spill_path: Optional[str] = None,
+    ):
+        self._insert_many = insert_many
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.spill_path = spill_path
+        self._pending: Deque[Tuple[str, Dict[str, Any]]] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self.stats = {"queued": 0, "written": 0, "spilled": 0, "replayed": 0, "flushes": 0}
+
+    def enqueue(self, table: str, row: Dict[str, Any]) -> None:
+        """Queue a row for insertion. Never blocks and never raises."""
+        if len(self._pending) >= self.max_pending:
+            self._spill([self._pending.popleft()])
+        self._pending.append((table, row))
+        self.stats["queued"] += 1
+        self._ensure_started()
+        if len(self._pending) >= self.max_batch and self._wakeup is not None:
+            self._wakeup.set()
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def _ensure_started(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # No loop yet (e.g. enqueued at import time); the next enqueue or flush starts it
+            return
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Write everything pending now; failed batches go to the spill file"""
+        if self._flush_lock is None:
+            self._ensure_started()
+        if self._flush_lock is None:
+            return
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            batch = list(self._pending)
+            self._pending.clear()
+            self.stats["flushes"] += 1
+
+            by_table: Dict[str, List[Dict[str, Any]]] = {}
+            for table, row in batch:
+                by_table.setdefault(table, []).append(row)
+
+            all_written = True
+            for table, rows in by_table.items():
+                try:
+                    await self._insert_many(table, rows)
+                    self.stats["written"] += len(rows)
+                except Exception as e:
+                    print(f"Error writing {len(rows)} row(s) to {table}, spilling to disk: {e}")
+                    self._spill([(table, row) for row in rows])
+                    all_written = False
+
+            if all_written:
+                await self._replay_spill()
+
+    async def aclose(self) -> None:
+        """Stop the background flusher and write out anything still pending.
+
+        Rows enqueued after this starts (or after an earlier aclose) are
+        written too, so it can be awaited again at the very end of a job.
+        """
+        if self._task is not None:
+            # Let an in-flight flush finish; cancelling it would lose its batch
+            async with self._flush_lock:
+                self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def spill_pending(self) -> None:
+        """Synchronously move pending rows to the spill file (for interpreter exit)"""
+        if self._pending:
+            self._spill(list(self._pending))
+            self._pending.clear()
+
+    def _spill(self, entries: List[Tuple[str, Dict[str, Any]]]) -> None:
+        if not self.spill_path:
+            print(f"Dropping {len(entries)} queued row(s): no spill file configured")
+            return
+        try:
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                for table, row in entries:
+                    f.write(json.dumps({"table": table, "row": row}, default=str) + "\n")
+            self.stats["spilled"] += len(entries)
+        except OSError as e:
+            print(f"Error spilling {len(entries)} row(s) to {self.spill_path}: {e}")
+
+    async def _replay_spill(self) -> None:
+        if not self.spill_path or not os.path.exists(self.spill_path):
+            return
+        # Claim the file atomically so only one worker process replays it
+        claimed = f"{self.spill_path}.{uuid.uuid4().hex}.replay"
+        try:
+            os.replace(self.spill_path, claimed)
+        except OSError:
+            return
+
+        by_table: Dict[str, List[Dict[str, Any]]] = {}
+        with open(claimed, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    by_table.setdefault(entry["table"], []).append(entry["row"])
+                except (json.JSONDecodeError, KeyError):
+                    continue
+        os.remove(claimed)
+
+        for table, rows in by_table.items():
+            for start in range(0, len(rows), self.max_batch):
+                chunk = rows[start:start + self.max_batch]
+                try:
+                    await self._insert_many(table, chunk)
+                    self.stats["replayed"] += len(chunk)
+                except Exception as e:
+                    print(f"Error replaying spilled rows for {table}: {e}")
+                    self._spill([(table, row) for row in chunk])
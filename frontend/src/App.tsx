@@ -157,92 +157,95 @@ function App() {
         // Accept both RELIABLE and LOSSY data packets
         if (kind === DataPacket_Kind.RELIABLE || kind === DataPacket_Kind.LOSSY) {
           try {
-            const data = JSON.parse(payloadStr)
-            
-            if (data.type === 'tool_call') {
-              console.log('🔧 Tool call received:', data.name, data.id)
+            const parsed = JSON.parse(payloadStr)
+            // The agent sends a burst of messages on one topic as a single JSON array
+            const messages = Array.isArray(parsed) ? parsed : [parsed]
+            for (const data of messages) {
+              if (data.type === 'tool_call') {
+                console.log('🔧 Tool call received:', data.name, data.id)
               
-              // Parse args if it's a string
-              let parsedArgs = data.args
-              if (typeof data.args === 'string') {
-                try {
-                  parsedArgs = JSON.parse(data.args)
-                } catch {
-                  parsedArgs = data.args
+                // Parse args if it's a string
+                let parsedArgs = data.args
+                if (typeof data.args === 'string') {
+                  try {
+                    parsedArgs = JSON.parse(data.args)
+                  } catch {
+                    parsedArgs = data.args
+                  }
                 }
-              }
               
-              // Generate unique ID for this tool call
-              const toolCallId = data.id || `${data.name}-${Date.now()}-${Math.random().toString(36).substr(2, 9)}`
+                // Generate unique ID for this tool call
+                const toolCallId = data.id || `${data.name}-${Date.now()}-${Math.random().toString(36).substr(2, 9)}`
               
-              setToolCalls(prev => {
-                // Check if a tool call with this ID already exists (prevent duplicates)
-                const existingIndex = prev.findIndex(tc => tc.id === toolCallId)
-                if (existingIndex !== -1) {
-                  console.log(`⚠️ Duplicate tool call with ID ${toolCallId} ignored`)
-                  return prev // Don't add duplicate
-                }
+                setToolCalls(prev => {
+                  // Check if a tool call with this ID already exists (prevent duplicates)
+                  const existingIndex = prev.findIndex(tc => tc.id === toolCallId)
+                  if (existingIndex !== -1) {
+                    console.log(`⚠️ Duplicate tool call with ID ${toolCallId} ignored`)
+                    return prev // Don't add duplicate
+                  }
                 
-                const newCall: ToolCall = {
-                  id: toolCallId,
-                  name: data.name,
-                  args: parsedArgs,
-                  timestamp: new Date().toISOString(),
+                  const newCall: ToolCall = {
+                    id: toolCallId,
+                    name: data.name,
+                    args: parsedArgs,
+                    timestamp: new Date().toISOString(),
+                  }
+                  console.log(`✅ Tool call added: ${data.name} (Total: ${prev.length + 1})`)
+                  return [...prev, newCall]
+                })
+              } else if (data.type === 'tool_result') {
+                console.log('✅ Tool result received:', data.name)
+              
+                // Check if this is end_conversation - disconnect the call
+                if (data.name === 'end_conversation') {
+                  console.log('👋 End conversation tool called - disconnecting...')
+                  // Small delay to ensure summary is received first
+                  setTimeout(() => {
+                    const currentRoom = roomRef.current
+                    if (currentRoom) {
+                      currentRoom.disconnect()
+                      setRoom(null)
+                      setIsConnected(false)
+                      setToolCalls([])
+                      setSummary(null)
+                      roomRef.current = null
+                      console.log('✅ Call disconnected after end_conversation')
+                    }
+                  }, 1000) // 1 second delay to allow summary to arrive
                 }
-                console.log(`✅ Tool call added: ${data.name} (Total: ${prev.length + 1})`)
-                return [...prev, newCall]
-              })
-            } else if (data.type === 'tool_result') {
-              console.log('✅ Tool result received:', data.name)
               
-              // Check if this is end_conversation - disconnect the call
-              if (data.name === 'end_conversation') {
-                console.log('👋 End conversation tool called - disconnecting...')
-                // Small delay to ensure summary is received first
-                setTimeout(() => {
-                  const currentRoom = roomRef.current
-                  if (currentRoom) {
-                    currentRoom.disconnect()
-                    setRoom(null)
-                    setIsConnected(false)
-                    setToolCalls([])
-                    setSummary(null)
-                    roomRef.current = null
-                    console.log('✅ Call disconnected after end_conversation')
+                setToolCalls(prev => {
+                  const updated = [...prev]
+                
+                  // Match by ID first (most reliable) - only update ONE entry
+                  if (data.id) {
+                    const index = updated.findIndex(tc => tc.id === data.id && !tc.result)
+                    if (index !== -1) {
+                      updated[index].result = data.result
+                      console.log(`✅ Tool result updated: ${data.name}`)
+                      return [...updated] // Return immediately after first match
+                    }
                   }
-                }, 1000) // 1 second delay to allow summary to arrive
-              }
-              
-              setToolCalls(prev => {
-                const updated = [...prev]
                 
-                // Match by ID first (most reliable) - only update ONE entry
-                if (data.id) {
-                  const index = updated.findIndex(tc => tc.id === data.id && !tc.result)
-                  if (index !== -1) {
-                    updated[index].result = data.result
-                    console.log(`✅ Tool result updated: ${data.name}`)
+                  // Fallback: match by name (find the FIRST pending call with this name)
+                  const pendingIndex = updated.findIndex(tc => tc.name === data.name && !tc.result)
+                  if (pendingIndex !== -1) {
+                    updated[pendingIndex].result = data.result
+                    console.log(`✅ Tool result updated by name: ${data.name}`)
                     return [...updated] // Return immediately after first match
                   }
-                }
                 
-                // Fallback: match by name (find the FIRST pending call with this name)
-                const pendingIndex = updated.findIndex(tc => tc.name === data.name && !tc.result)
-                if (pendingIndex !== -1) {
-                  updated[pendingIndex].result = data.result
-                  console.log(`✅ Tool result updated by name: ${data.name}`)
-                  return [...updated] // Return immediately after first match
-                }
-                
-                // If still not found, don't create a new entry - just log a warning
-                console.warn(`⚠️ No matching pending tool call found for result: ${data.name}`)
-                return updated // Don't modify if no match found
-              })
-            } else if (data.type === 'conversation_summary') {
-              console.log('📝 Conversation summary received')
-              setSummary(data.summary)
-            } else {
-              console.log('⚠️ Unknown data type:', data.type, data)
+                  // If still not found, don't create a new entry - just log a warning
+                  console.warn(`⚠️ No matching pending tool call found for result: ${data.name}`)
+                  return updated // Don't modify if no match found
+                })
+              } else if (data.type === 'conversation_summary') {
+                console.log('📝 Conversation summary received')
+                setSummary(data.summary)
+              } else {
+                console.log('⚠️ Unknown data type:', data.type, data)
+              }
             }
           } catch (e: any) {
             console.error('❌❌❌ Error parsing data message:', e)
@@ -126,12 +126,16 @@ const ToolCallDisplay: React.FC<ToolCallDisplayProps> = ({ toolCalls }) => {
       if (formatted.error) return `Error: ${formatted.error}`
       if (formatted.success) {
         if (formatted.message) return formatted.message
-        if (formatted.appointment) return `Appointment: ${formatted.appointment.appointment_date || ''} ${formatted.appointment.appointment_time || ''}`
+        if (formatted.appointment) return `Appointment: ${formatted.appointment.date || formatted.appointment.appointment_date || ''} ${formatted.appointment.time || formatted.appointment.appointment_time || ''}`
         if (formatted.appointments && Array.isArray(formatted.appointments)) {
-          return `${formatted.appointments.length} appointment(s) found`
+          return `${formatted.count ?? formatted.appointments.length} appointment(s) found`
         }
-        if (formatted.slots && Array.isArray(formatted.slots)) {
-          return `${formatted.slots.length} slot(s) available`
+        // Slots arrive grouped by date: { "YYYY-MM-DD": ["HH:MM", ...] }
+        if (formatted.slots && typeof formatted.slots === 'object') {
+          const slotCount = Array.isArray(formatted.slots)
+            ? formatted.slots.length
+            : Object.values(formatted.slots).reduce((total: number, times: any) => total + (Array.isArray(times) ? times.length : 0), 0)
+          return `${formatted.count ?? slotCount} slot(s) available`
         }
         if (formatted.user) return `User: ${formatted.user.phone || ''}`
       }